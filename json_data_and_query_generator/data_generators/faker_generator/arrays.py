@@ -0,0 +1,208 @@
+"""
+Arrays of the schema config.
+
+A key "name[length]" of a forced path makes name an array whose elements hold the
+rest of the path, or the value of the path if the key is the last one. The
+length is
+
+    n: exactly n elements
+    min..max: uniformly between min and max elements, both inclusive
+    poisson(mean): a Poisson distributed number of elements
+
+Several lengths make nested arrays, eg "matrix[2][1..3]" is an array of two
+arrays of one to three elements each.
+
+In the compiled schema, arrays of fixed length are lists of their elements and
+arrays of variable length are objects {"$array": length, "$items": element}. The
+lengths of a chunk are drawn in NumPy batches, one stream per length seeded by
+the chunk seed, and the faker generates the elements from the element schema.
+"""
+import functools
+import re
+import zlib
+
+import numpy as np
+
+ARRAY_KEY = "$array"
+ITEMS_KEY = "$items"
+# Seeds the array lengths of a chunk apart from its other random values
+ARRAY_SEED_KEY = 0x61727261
+
+
+def split_array_key(key):
+    """
+    Returns the field name and the lengths of a key, eg
+    "matrix[2][1..3]" -> ("matrix", ["2", "1..3"]), "a1" -> ("a1", [])
+    """
+    match = re.fullmatch(r"([^\[\]]*)((?:\[[^\[\]]*\])*)", key)
+    if match is None:
+        raise ValueError("Invalid key {}".format(key))
+    return match.group(1), re.findall(r"\[([^\[\]]*)\]", match.group(2))
+
+
+@functools.lru_cache(maxsize=None)
+def parse_length(length):
+    """
+    Returns the distribution of an array length as ("fixed", n),
+    ("uniform", min, max) or ("poisson", mean)
+    """
+    s = length.replace(" ", "")
+    if re.fullmatch(r"\d+", s):
+        return ("fixed", int(s))
+    match = re.fullmatch(r"(\d+)\.\.(\d+)", s)
+    if match is not None and int(match.group(1)) <= int(match.group(2)):
+        return ("uniform", int(match.group(1)), int(match.group(2)))
+    match = re.fullmatch(r"poisson\((\d+(?:\.\d*)?)\)", s)
+    if match is not None:
+        return ("poisson", float(match.group(1)))
+    raise ValueError(
+        "Invalid array length [{}], supported are [n], [min..max] and [poisson(mean)]".format(
+            length
+        )
+    )
+
+
+def length_bounds(length):
+    """
+    Returns the (min, max) number of elements of an array, max None if unbounded
+    """
+    distribution = parse_length(length)
+    if distribution[0] == "fixed":
+        return distribution[1], distribution[1]
+    if distribution[0] == "uniform":
+        return distribution[1], distribution[2]
+    return 0, None
+
+
+def array_schema(lengths, element):
+    """
+    Returns the compiled schema of nested arrays of the given lengths, outermost
+    first
+    """
+    for length in reversed(lengths):
+        distribution = parse_length(length)
+        if distribution[0] == "fixed":
+            element = [element for _ in range(distribution[1])]
+        else:
+            element = {ARRAY_KEY: length, ITEMS_KEY: element}
+    return element
+
+
+def is_variable_array(schema):
+    return isinstance(schema, dict) and ARRAY_KEY in schema
+
+
+def is_array(schema):
+    return isinstance(schema, list) or is_variable_array(schema)
+
+
+def unwrap_array(schema):
+    """
+    Returns the lengths and the element schema of nested arrays of the compiled
+    schema, eg [[e, e], [e, e]] -> (["2", "2"], e). The element is None for empty
+    arrays of fixed length.
+    """
+    lengths = []
+    while is_array(schema):
+        if is_variable_array(schema):
+            lengths.append(schema[ARRAY_KEY])
+            schema = schema[ITEMS_KEY]
+        else:
+            lengths.append(str(len(schema)))
+            if len(schema) == 0:
+                return lengths, None
+            schema = schema[0]
+    return lengths, schema
+
+
+def elements(containers, key, depth=None):
+    """
+    Returns the values of a key of the containers, the elements if the key is an
+    array. Containers that lack the key are skipped.
+
+    Args:
+        depth: Number of nested arrays of the key to unwrap, all if None, all
+            but the innermost one if -1
+    """
+    name, lengths = split_array_key(key)
+    values = [c[name] for c in containers if name in c]
+    for _ in lengths[:depth]:
+        values = [item for value in values for item in value]
+    return values
+
+
+def path_slots(documents, path):
+    """
+    Returns the slots (container, key or position) that hold the values of a
+    path in the documents and the position of the document of each slot. A path
+    through arrays has a slot per element, a path ending in an array a slot per
+    element of the innermost arrays. Documents that lack the path have no slot.
+    """
+    slots, owners = [], []
+    name, lengths = split_array_key(path[-1])
+    for i, document in enumerate(documents):
+        containers = [document]
+        for key in path[:-1]:
+            containers = elements(containers, key)
+        if len(lengths) == 0:
+            found = [(c, name) for c in containers if name in c]
+        else:
+            arrays = elements(containers, path[-1], -1)
+            found = [(a, j) for a in arrays for j in range(len(a))]
+        slots.extend(found)
+        owners.extend([i] * len(found))
+    return slots, owners
+
+
+def min_elements(path):
+    """
+    Returns the least number of slots of a path in a document (see path_slots)
+    """
+    n = 1
+    for key in path:
+        for length in split_array_key(key)[1]:
+            n *= length_bounds(length)[0]
+    return n
+
+
+class ArrayLengths:
+    """
+    Lengths of the arrays of variable length of a chunk
+    """
+
+    def __init__(self, seed, batch_size=1000):
+        """
+        Args:
+            seed: Seed of the chunk, None for unseeded lengths
+            batch_size: Number of lengths drawn at once per length
+        """
+        self.seed = seed
+        self.batch_size = batch_size
+        self._streams = {}
+
+    def draw(self, length):
+        """
+        Returns the next number of elements of an array of the given length
+        """
+        stream = self._streams.get(length)
+        if stream is None:
+            rng = np.random.default_rng(
+                None
+                if self.seed is None
+                else [self.seed, ARRAY_SEED_KEY, zlib.crc32(length.encode("utf8"))]
+            )
+            stream = self._streams[length] = [rng, [], 0]
+        rng, batch, position = stream
+        if position == len(batch):
+            batch = stream[1] = self._sample(rng, length).tolist()
+            position = 0
+        stream[2] = position + 1
+        return batch[position]
+
+    def _sample(self, rng, length):
+        distribution = parse_length(length)
+        if distribution[0] == "fixed":
+            return np.full(self.batch_size, distribution[1])
+        if distribution[0] == "uniform":
+            return rng.integers(distribution[1], distribution[2] + 1, self.batch_size)
+        return rng.poisson(distribution[1], self.batch_size)
@@ -0,0 +1,393 @@
+"""
+Forced values of the schema config, planted while the documents are generated.
+
+A forced path with "operator", "value" and "num" gets values such that exactly
+num documents match the predicate 'path operator value':
+
+    eq, ne, lt, le, gt, ge: "value" is a single value
+    between: "value" is [low, high], both inclusive
+
+Which documents match is decided per chunk. The matches of a path are split over
+the chunks of the dataset with a multivariate hypergeometric draw seeded by the
+data seed, so every worker computes the same split and the matches are spread
+uniformly over the documents. Within a chunk the chunk seed picks the matching
+documents. Numbers are drawn in vectorized batches from disjoint intervals of
+matching and non matching values. Strings only support eq and ne, and the eq value
+keeps its JSON type.
+
+A forced path through arrays (see arrays) matches a document if any of its
+elements matches. "numArr" elements of each matching document, 1 by default and
+chosen by the chunk seed, get a matching value and all other elements a non
+matching one. The arrays of the path must have at least numArr elements.
+
+Paths with value type "unique_number" get a random permutation of the document
+numbers instead, so 'path BETWEEN a AND b' matches exactly b - a + 1 documents for
+any range within the dataset. The query generator uses them for queries of a
+given selectivity.
+"""
+import re
+
+import numpy as np
+
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    min_elements,
+    path_slots,
+)
+
+FORCED_OPERATORS = ["eq", "ne", "lt", "le", "gt", "ge", "between"]
+UNIQUE_VALUE_TYPE = "unique_number"
+
+# Multipliers of the Feistel round function of permute, which alternates them
+# with xor shifts: the 64 bit golden ratio and the first multiplier of splitmix64
+FEISTEL_ROUND_MULTIPLIERS = (
+    np.uint64(0x9E3779B97F4A7C15),
+    np.uint64(0xBF58476D1CE4E5B9),
+)
+
+
+def number_domain(valueType):
+    """
+    Returns the (first, last) integer faked for a "random_number" value type or
+    None if the value type is not a number
+    """
+    match = re.fullmatch(r"random_number(\((\d+)\))?", valueType)
+    if match is None:
+        return None
+    digits = int(match.group(2)) if match.group(2) is not None else 9
+    return 0, 10**digits - 1
+
+
+def predicate_intervals(operator, value, domain):
+    """
+    Returns the integer intervals (first, last) of the values that match and of
+    the values that do not match 'operator value'. The intervals stay within the
+    domain (first, last) unless the domain holds no such value.
+    """
+    lo, hi = domain
+
+    def clip(first, last, fallback):
+        first, last = max(first, lo), min(last, hi)
+        return [(first, last)] if first <= last else [fallback]
+
+    def both_sides(first, last, fallback):
+        intervals = [(lo, min(hi, first - 1)), (max(lo, last + 1), hi)]
+        intervals = [(a, b) for a, b in intervals if a <= b]
+        return intervals if len(intervals) > 0 else [fallback]
+
+    if operator == "eq":
+        return [(value, value)], both_sides(value, value, (value + 1, value + 1))
+    if operator == "ne":
+        return both_sides(value, value, (value + 1, value + 1)), [(value, value)]
+    if operator in ["lt", "le"]:
+        last = value - 1 if operator == "lt" else value
+        return clip(lo, last, (last, last)), clip(last + 1, hi, (last + 1, last + 1))
+    if operator in ["gt", "ge"]:
+        first = value + 1 if operator == "gt" else value
+        return clip(first, hi, (first, first)), clip(
+            lo, first - 1, (first - 1, first - 1)
+        )
+    if operator == "between":
+        low, high = value
+        return [(low, high)], both_sides(low, high, (low - 1, low - 1))
+    raise ValueError("Unknown operator {}".format(operator))
+
+
+def draw_from_intervals(rng, intervals, n):
+    """
+    Draws n integers uniformly from the union of disjoint intervals (first, last)
+    """
+    firsts = np.array([first for first, _ in intervals], dtype=np.int64)
+    sizes = np.array([last - first + 1 for first, last in intervals], dtype=np.int64)
+    ends = np.cumsum(sizes)
+    offsets = rng.integers(0, ends[-1], size=n)
+    which = np.searchsorted(ends, offsets, side="right")
+    return firsts[which] + offsets - (ends[which] - sizes[which])
+
+
+def permute(indices, n, seed):
+    """
+    Maps the numbers 0..n-1 to a random permutation of 0..n-1 given by the seed,
+    without materializing the permutation.
+
+    A four round Feistel network is a bijection of the numbers with an even
+    number of bits; numbers mapped beyond n are mapped again until they are
+    below n (cycle walking), which keeps the mapping a bijection of 0..n-1.
+    """
+    half_bits = max(1, ((int(n) - 1).bit_length() + 1) // 2)
+    mask = np.uint64((1 << half_bits) - 1)
+    shift = np.uint64(half_bits)
+    keys = np.random.SeedSequence(seed).generate_state(4, dtype=np.uint64)
+
+    def feistel(x):
+        left, right = x >> shift, x & mask
+        for key in keys:
+            z = (right + key) * FEISTEL_ROUND_MULTIPLIERS[0]
+            z = (z ^ (z >> np.uint64(29))) * FEISTEL_ROUND_MULTIPLIERS[1]
+            z ^= z >> np.uint64(32)
+            left, right = right, left ^ (z & mask)
+        return (left << shift) | right
+
+    values = np.asarray(indices, dtype=np.uint64)
+    pending = np.arange(len(values))
+    while len(pending) > 0:
+        values[pending] = feistel(values[pending])
+        pending = pending[values[pending] >= np.uint64(n)]
+    return values.astype(np.int64)
+
+
+class UniquePath:
+    """
+    A path with value type "unique_number" of the schema config
+    """
+
+    def __init__(self, index, pathDict):
+        """
+        Args:
+            index: Position of the path in the forcedPaths of the schema config
+            pathDict: The forced path of the schema config
+        """
+        self.index = index
+        self.path = pathDict["path"]
+        if "operator" in pathDict.keys():
+            raise ValueError(
+                "Forced path {} of value type {} must not have an operator".format(
+                    self.path, UNIQUE_VALUE_TYPE
+                )
+            )
+        if any("[" in key for key in self.path):
+            raise ValueError(
+                "Forced path {} of value type {} must not be in an array".format(
+                    self.path, UNIQUE_VALUE_TYPE
+                )
+            )
+        if pathDict.get("presence", 1) != 1:
+            raise ValueError(
+                "Forced path {} of value type {} must always be present".format(
+                    self.path, UNIQUE_VALUE_TYPE
+                )
+            )
+
+    def plant(self, documents, seed, first, stop, chunk_start):
+        """
+        Sets the value of the path in the documents of a chunk. The documents
+        first..stop-1 being generated get the numbers first..stop-1.
+
+        Args:
+            seed: Seed of the data
+            chunk_start: Number of the first document of the chunk
+        """
+        indices = np.arange(chunk_start - first, chunk_start - first + len(documents))
+        values = first + permute(indices, stop - first, [seed, self.index, first])
+        for document, value in zip(documents, values.tolist()):
+            for key in self.path[:-1]:
+                document = document[key]
+            document[self.path[-1]] = value
+
+
+class ForcedPath:
+    """
+    A forced path with operator of the schema config
+    """
+
+    def __init__(self, index, pathDict):
+        """
+        Args:
+            index: Position of the path in the forcedPaths of the schema config
+            pathDict: The forced path of the schema config
+        """
+        self.index = index
+        self.path = pathDict["path"]
+        self.operator = pathDict["operator"]
+        if self.operator not in FORCED_OPERATORS:
+            raise ValueError(
+                "Unknown operator {} of forced path {}, supported are {}".format(
+                    self.operator, self.path, FORCED_OPERATORS
+                )
+            )
+        if not "value" in pathDict.keys():
+            raise ValueError("key 'value' is missing in path")
+        if not "num" in pathDict.keys():
+            raise ValueError("key 'num' is missing in path")
+        if pathDict.get("presence", 1) != 1:
+            raise ValueError(
+                "Forced path {} with operator must always be present".format(self.path)
+            )
+        self.in_array = any("[" in key for key in self.path)
+        self.num_elements = int(pathDict.get("numArr", 1))
+        if self.in_array and not 1 <= self.num_elements <= min_elements(self.path):
+            raise ValueError(
+                "Forced path {} cannot have {} matching array elements, its arrays may have {}".format(
+                    self.path, self.num_elements, min_elements(self.path)
+                )
+            )
+        if pathDict["valueType"] == UNIQUE_VALUE_TYPE:
+            raise ValueError(
+                "Forced path {} of value type {} must not have an operator".format(
+                    self.path, UNIQUE_VALUE_TYPE
+                )
+            )
+        self.domain = number_domain(pathDict["valueType"])
+        if self.domain is None:
+            if self.operator not in ["eq", "ne"]:
+                raise ValueError(
+                    "Operator {} of forced path {} needs a random_number value type".format(
+                        self.operator, self.path
+                    )
+                )
+            self.value = pathDict["value"]
+            return
+        if self.operator == "between":
+            low, high = [int(v) for v in pathDict["value"]]
+            if low > high:
+                raise ValueError(
+                    "Range {} of forced path {} is empty".format(
+                        pathDict["value"], self.path
+                    )
+                )
+            self.value = [low, high]
+        else:
+            self.value = int(pathDict["value"])
+        self.matching, self.non_matching = predicate_intervals(
+            self.operator, self.value, self.domain
+        )
+
+    def split(self, seed, chunks, num):
+        """
+        Returns the number of matching documents per chunk
+
+        Args:
+            seed: Seed of the data
+            chunks: All chunks (first document, end document) being generated
+            num: Number of matching documents in these chunks
+        """
+        sizes = np.array([stop - start for start, stop in chunks], dtype=np.int64)
+        if num < 0 or num > sizes.sum():
+            raise ValueError(
+                "Cannot force {} matches of path {} in {} documents".format(
+                    num, self.path, sizes.sum()
+                )
+            )
+        rng = np.random.default_rng([seed, self.index, chunks[0][0]])
+        return rng.multivariate_hypergeometric(sizes, num)
+
+    def plant(self, documents, chunk_seed, num):
+        """
+        Sets the value of the path in the documents of a chunk, so exactly num of
+        them match
+        """
+        rng = np.random.default_rng([chunk_seed, self.index])
+        matches = np.zeros(len(documents), dtype=bool)
+        matches[rng.choice(len(documents), size=num, replace=False)] = True
+        if self.in_array:
+            self._plant_elements(documents, rng, matches)
+            return
+        if self.domain is None:
+            faked = []
+            for document in documents:
+                for key in self.path:
+                    document = document[key]
+                faked.append(document)
+            values = self._string_values(faked, matches)
+        else:
+            values = np.empty(len(documents), dtype=np.int64)
+            values[matches] = draw_from_intervals(rng, self.matching, num)
+            values[~matches] = draw_from_intervals(
+                rng, self.non_matching, len(documents) - num
+            )
+            values = values.tolist()
+        for document, value in zip(documents, values):
+            for key in self.path[:-1]:
+                document = document[key]
+            document[self.path[-1]] = value
+
+    def _plant_elements(self, documents, rng, matches):
+        """
+        Sets the array elements of the path so numArr of them match in the
+        matching documents and none in the others
+        """
+        slots, owners = path_slots(documents, self.path)
+        owners = np.array(owners, dtype=np.int64)
+        counts = np.bincount(owners, minlength=len(documents))
+        starts = np.cumsum(counts) - counts
+        # Rank of each element among the elements of its document in random order
+        order = np.lexsort((rng.random(len(slots)), owners))
+        ranks = np.empty(len(slots), dtype=np.int64)
+        ranks[order] = np.arange(len(slots)) - starts[owners[order]]
+        hits = matches[owners] & (ranks < self.num_elements)
+        if self.domain is None:
+            values = self._string_values([c[k] for c, k in slots], hits)
+        else:
+            values = np.empty(len(slots), dtype=np.int64)
+            num = int(np.count_nonzero(hits))
+            values[hits] = draw_from_intervals(rng, self.matching, num)
+            values[~hits] = draw_from_intervals(
+                rng, self.non_matching, len(slots) - num
+            )
+            values = values.tolist()
+        for (container, key), value in zip(slots, values):
+            container[key] = value
+
+    def document_matches(self, documents):
+        """
+        Returns which of the documents match 'path operator value', those with
+        any matching element for a path through arrays
+        """
+        if not self.in_array:
+            values = []
+            for document in documents:
+                for key in self.path:
+                    document = document[key]
+                values.append(document)
+            return self.matches(values)
+        slots, owners = path_slots(documents, self.path)
+        hits = self.matches([c[k] for c, k in slots])
+        owners = np.array(owners, dtype=np.int64)
+        return np.bincount(owners[hits], minlength=len(documents)) > 0
+
+    def matches(self, values):
+        """
+        Returns which of the values match 'path operator value'. Values of the
+        wrong type do not match.
+        """
+        if self.domain is None:
+            hits = np.array(
+                [
+                    v == self.value
+                    and isinstance(v, bool) == isinstance(self.value, bool)
+                    for v in values
+                ],
+                dtype=bool,
+            )
+            return hits if self.operator == "eq" else ~hits
+        numbers = np.array(
+            [isinstance(v, int) and not isinstance(v, bool) for v in values],
+            dtype=bool,
+        )
+        x = np.array([v if ok else 0 for v, ok in zip(values, numbers)], dtype=np.int64)
+        if self.operator == "between":
+            low, high = self.value
+            return numbers & (x >= low) & (x <= high)
+        compare = {
+            "eq": np.equal,
+            "ne": np.not_equal,
+            "lt": np.less,
+            "le": np.less_equal,
+            "gt": np.greater,
+            "ge": np.greater_equal,
+        }[self.operator]
+        return numbers & compare(x, self.value)
+
+    def _string_values(self, faked, matches):
+        """
+        The forced value where 'eq' must hold and the faked value, changed if it
+        happens to be the forced value, where it must not
+        """
+        values = []
+        for value, match in zip(faked, matches):
+            if match == (self.operator == "eq"):
+                values.append(self.value)
+            elif self.matches([value])[0] == (self.operator == "eq"):
+                values.append(str(value) + "_")
+            else:
+                values.append(value)
+        return values
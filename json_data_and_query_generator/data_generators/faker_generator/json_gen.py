@@ -1,6 +1,6 @@
 import os
-import ast
-import collections.abc
+import functools
+import time
 from datetime import datetime
 from xml.dom.minidom import Attr
 import numpy as np
@@ -8,9 +8,70 @@ import random
 import json
 import faker as fakerModule
 import faker.providers as FakeProviders
+from json_data_and_query_generator.offset_index import (
+    INDEX_SUFFIX,
+    OffsetIndexWriter,
+    iter_line_offsets,
+)
+from json_data_and_query_generator.data_generators.faker_generator.writer import (
+    BackgroundWriter,
+)
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    ARRAY_KEY,
+    ITEMS_KEY,
+    ArrayLengths,
+    array_schema,
+    is_array,
+    is_variable_array,
+    split_array_key,
+)
+from json_data_and_query_generator.data_generators.faker_generator.forced_values import (
+    UNIQUE_VALUE_TYPE,
+    ForcedPath,
+    UniquePath,
+)
+from json_data_and_query_generator.data_generators.faker_generator.presence import (
+    absent_fields,
+    presence_paths,
+)
+from json_data_and_query_generator.data_generators.faker_generator.typed_values import (
+    TypedPath,
+    is_typed,
+)
+from json_data_and_query_generator.data_generators.faker_generator.value_sample import (
+    DEFAULT_VALUE_SAMPLE_SIZE,
+    VALUE_SAMPLE_SUFFIX,
+    ValueSample,
+    sample_keys,
+)
 
 FakerInstanceForKeys = fakerModule.Faker()
 
+# Suffix of the per worker metrics file written next to the worker's output file
+METRICS_SUFFIX = ".metrics"
+# Seconds between the checkpoints of a worker
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+
+def chunk_ranges(start, stop, chunk_size):
+    """
+    Splits the documents start..stop-1 into chunks of chunk_size documents
+    """
+    return [
+        (chunk_start, min(chunk_start + chunk_size, stop))
+        for chunk_start in range(start, stop, chunk_size)
+    ]
+
+
+def chunk_seed(seed, chunk_start):
+    """
+    Seed of the chunk starting at document chunk_start. Chunks are seeded by their
+    position in the dataset, so their documents do not depend on the process that
+    fakes them or on whether the run was interrupted.
+    """
+    return int(np.random.SeedSequence([seed, chunk_start]).generate_state(1)[0])
+
+
 # join two dictionaries :
 
 
@@ -24,40 +85,57 @@ class DeepFakerSchema(object):
         result = [self._generate_one_fake(schema) for _ in range(iterations)]
         return result[0] if len(result) == 1 else result
 
-    def _generate_one_fake(self, schema):
+    def _generate_one_fake(self, schema, absent=None, lengths=None):
         """
         Recursively traverse schema dictionary and for each "leaf node", evaluate the fake
         value
 
         Implementation:
         For each key-value pair:
+        0) If the key is absent from the document (see presence), skip it
         1) If value is not an iterable (i.e. dict or list), evaluate the fake data (base case)
         2) If value is a dictionary, recurse
         3) If value is a list, iteratively recurse over each item
+        4) If value is an array of variable length (see arrays), draw its length
+           and recurse over that many items
+
+        Args:
+            absent: Tree of the fields the document lacks, see presence.absent_fields
+            lengths: ArrayLengths of the chunk, see arrays
         """
+        if lengths is None:
+            lengths = ArrayLengths(None)
         data = {}
         for k, v in schema.items():
-            if isinstance(v, dict):
-                data[k] = self._generate_one_fake(v)
-            elif isinstance(v, list):
-                data[k] = [self._generate_one_fake(item) for item in v]
+            absent_below = None
+            if absent is not None and k in absent:
+                absent_below = absent[k]
+                if absent_below is True:
+                    continue
+            if isinstance(v, dict) and not is_variable_array(v):
+                data[k] = self._generate_one_fake(v, absent_below, lengths)
             else:
-                tokens = v.split("(")
-                if len(tokens) > 1:
-                    argument = tokens[1].split(")")[0]
-                    data[k] = getattr(self._faker, tokens[0])(int(argument))
-                else:
-                    data[k] = getattr(self._faker, v)()
+                data[k] = self._generate_value(v, lengths)
         return data
 
-
-def update(d, u):
-    for k, v in u.items():
-        if isinstance(v, collections.abc.Mapping):
-            d[k] = update(d.get(k, {}), v)
-        else:
-            d[k] = v
-    return d
+    def _generate_value(self, v, lengths):
+        if is_variable_array(v):
+            return [
+                self._generate_value(v[ITEMS_KEY], lengths)
+                for _ in range(lengths.draw(v[ARRAY_KEY]))
+            ]
+        if isinstance(v, dict):
+            return self._generate_one_fake(v, None, lengths)
+        if isinstance(v, list):
+            return [self._generate_value(item, lengths) for item in v]
+        if v == UNIQUE_VALUE_TYPE or is_typed(v):
+            # Planted after faking, see forced_values and typed_values
+            return None
+        tokens = v.split("(")
+        if len(tokens) > 1:
+            argument = tokens[1].split(")")[0]
+            return getattr(self._faker, tokens[0])(int(argument))
+        return getattr(self._faker, v)()
 
 
 def populate_dict(path, existing_dict, valueType):
@@ -87,7 +165,7 @@ def count_fields(schema):
     count = 0
     for k in schema.keys():
         count += 1
-        if isinstance(schema[k], dict):
+        if isinstance(schema[k], dict) and not is_array(schema[k]):
             count += count_fields(schema[k])
     return count
 
@@ -95,7 +173,7 @@ def count_fields(schema):
 def get_list_of_levels(schema):
     levels = [[]]
     for k in schema.keys():
-        if isinstance(schema[k], dict):
+        if isinstance(schema[k], dict) and not is_array(schema[k]):
             subLevels = [[k] + x for x in get_list_of_levels(schema[k])]
             levels.extend(subLevels)
     return levels
@@ -111,15 +189,43 @@ def get_longest_path(schema):
 
 
 class DataGenerator:
-    def __init__(self, data_dir, schema_config_filepath="./schemaConfig.json"):
+    def __init__(
+        self,
+        data_dir,
+        schema_config_filepath="./schemaConfig.json",
+        chunk_size=10000,
+        seed=None,
+        value_sample_size=DEFAULT_VALUE_SAMPLE_SIZE,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+    ):
         """
         Args:
             config: config
             schema_config: schema config
+            chunk_size: Number of documents handed to the writer at once
+            seed: Seed of the schema and the data. A random seed is drawn if None
+            value_sample_size: Number of documents whose values are sampled for
+                the query generator, see value_sample
+            checkpoint_interval: Seconds between the checkpoints of a worker, 0
+                checkpoints every chunk
         """
 
         self.schema = "NOT SET"
         self.data_dir = data_dir
+        self.CHUNK_SIZE = int(chunk_size)
+        if self.CHUNK_SIZE < 1:
+            raise ValueError("chunk size must be positive")
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        if int(seed) < 0:
+            raise ValueError("seed must not be negative")
+        self.SEED = int(seed)
+        self.VALUE_SAMPLE_SIZE = int(value_sample_size)
+        if self.VALUE_SAMPLE_SIZE < 0:
+            raise ValueError("value sample size must not be negative")
+        self.CHECKPOINT_INTERVAL = float(checkpoint_interval)
+        if self.CHECKPOINT_INTERVAL < 0:
+            raise ValueError("checkpoint interval must not be negative")
 
         self.CONFIG_FILEPATH = schema_config_filepath
 
@@ -131,11 +237,32 @@ class DataGenerator:
         self.LEN_FIELDS = 0
         self.NUM_LEVELS = 0
         self.NUM_SAMPLES = 0
+        # Documents FIRST_SAMPLE..NUM_SAMPLES-1 are generated, see grow_to
+        self.FIRST_SAMPLE = 0
 
         if "forcedPaths" in self.configDict.keys() and isinstance(
             self.configDict["forcedPaths"], list
         ):
             self.FORCED_PATHS = self.configDict["forcedPaths"]
+        # Paths of value types with a sampler, eg boolean or timestamp
+        self.TYPED = [
+            TypedPath(i, pathDict)
+            for i, pathDict in enumerate(self.FORCED_PATHS)
+            if is_typed(pathDict["valueType"])
+        ]
+        # Forced paths with operator, their values are planted while generating
+        self.FORCED = [
+            ForcedPath(i, pathDict)
+            for i, pathDict in enumerate(self.FORCED_PATHS)
+            if "operator" in pathDict.keys()
+        ]
+        self.UNIQUE = [
+            UniquePath(i, pathDict)
+            for i, pathDict in enumerate(self.FORCED_PATHS)
+            if pathDict["valueType"] == UNIQUE_VALUE_TYPE
+        ]
+        # Checks the presence probabilities of the config early
+        presence_paths(self.configDict, {})
 
         if "numFields" in self.configDict.keys():
             self.NUM_FIELDS = self.configDict["numFields"]
@@ -149,11 +276,19 @@ class DataGenerator:
         if "numSamples" in self.configDict.keys():
             self.NUM_SAMPLES = self.configDict["numSamples"]
 
+        # Number of forced values per forced path in the generated documents
+        self.FORCED_COUNTS = self.forced_counts()
+
     ######################################################
     # GENERATE SCHEMA
     ######################################################
 
     def generate_schema(self):
+        # Seed the generated key names and the placement of dummy fields, so the
+        # same seed always yields the same schema
+        FakerInstanceForKeys.seed_instance(self.SEED)
+        rng = random.Random(self.SEED)
+
         schema = {}
         for pathDict in self.FORCED_PATHS:
             path = pathDict["path"]
@@ -193,11 +328,15 @@ class DataGenerator:
             oldKey = path[-1]
             OLD_CONTENT = d[oldKey]
 
-            new_key, num = oldKey.split("[")
-            num = num.split("]")[0]
-            LEN_ARR = int(num)
+            new_key, lengths = split_array_key(oldKey)
+            if new_key in d:
+                raise ValueError(
+                    "Array {} has several lengths in the forced paths".format(
+                        path[:-1] + [new_key]
+                    )
+                )
 
-            d[new_key] = [OLD_CONTENT for i in range(LEN_ARR)]
+            d[new_key] = array_schema(lengths, OLD_CONTENT)
 
             del d[oldKey]
 
@@ -211,7 +350,7 @@ class DataGenerator:
 
         levels = get_list_of_levels(schema)
         while count_fields(schema) < self.NUM_FIELDS:
-            p = random.choice(levels)
+            p = rng.choice(levels)
             p = p + [FakerInstanceForKeys.word()]
             # print(p)
             add_field(p, DUMMY_FIELD_TYPE, schema)
@@ -239,15 +378,152 @@ class DataGenerator:
 
         return schema
 
-    def actualGenerator(self, num_PROC, schema, outputPath):
+    def forced_counts(self):
+        """
+        Returns the configured number of forced values per forced path (None for
+        paths without operator)
+        """
+        return [
+            int(pathDict["num"]) if "operator" in pathDict.keys() else None
+            for pathDict in self.FORCED_PATHS
+        ]
+
+    def value_sample_paths(self, schema):
+        """
+        Returns the paths whose values are sampled: all fields outside of arrays
+        except the ones with unique values
+        """
+        unique = [unique.path for unique in self.UNIQUE]
+        paths = []
+
+        def iter1(d, path):
+            for k, v in d.items():
+                if is_array(v):
+                    continue
+                if isinstance(v, dict):
+                    iter1(v, path + [k])
+                elif path + [k] not in unique:
+                    paths.append(path + [k])
+
+        iter1(schema, [])
+        return paths
+
+    def grow_to(self, num_samples, planted_counts, mode="proportional"):
+        """
+        Continues an existing dataset of NUM_SAMPLES documents up to num_samples
+        documents. The new documents continue the chunk seeds of the existing ones.
+
+        Args:
+            num_samples: Number of documents after growing
+            planted_counts: Number of forced values per forced path in the existing
+                documents
+            mode: "proportional": forced values keep their configured share of
+                      numSamples, eg num 50 of 1000 -> 500 of 10000
+                  "fixed": the new documents get no forced values
+        Returns:
+            Number of forced values per forced path for the new documents
+        """
+        if num_samples <= int(self.NUM_SAMPLES):
+            raise ValueError(
+                "Dataset has {} documents already, cannot grow it to {}".format(
+                    self.NUM_SAMPLES, num_samples
+                )
+            )
+        if mode not in ["proportional", "fixed"]:
+            raise ValueError("Unknown mode for forced values {}".format(mode))
+
+        new_counts = []
+        for num, planted in zip(self.forced_counts(), planted_counts):
+            if num is None:
+                new_counts.append(None)
+            elif mode == "fixed":
+                new_counts.append(0)
+            else:
+                target = int(
+                    round(num * num_samples / float(self.configDict["numSamples"]))
+                )
+                new_counts.append(max(0, target - planted))
+
+        self.FIRST_SAMPLE = int(self.NUM_SAMPLES)
+        self.NUM_SAMPLES = num_samples
+        self.FORCED_COUNTS = new_counts
+        return new_counts
+
+    def worker_chunks(self, num_PROC, worker):
+        """
+        Returns the chunks (first document, end document) faked by the given worker.
+
+        The dataset is split into chunks of CHUNK_SIZE documents and each worker
+        fakes a contiguous run of chunks.
+        """
+        chunks = chunk_ranges(
+            int(self.FIRST_SAMPLE), int(self.NUM_SAMPLES), self.CHUNK_SIZE
+        )
+        per_worker, rest = divmod(len(chunks), int(num_PROC))
+        first = worker * per_worker + min(worker, rest)
+        last = first + per_worker + (1 if worker < rest else 0)
+        return chunks[first:last]
+
+    def actualGenerator(
+        self,
+        num_PROC,
+        schema,
+        outputPath,
+        worker=0,
+        checkpointPath=None,
+        writer_cpus=None,
+    ):
         ######################################################
         # GENERATE DATASET
         ######################################################
 
-        num_SAMPLES = int(int(self.NUM_SAMPLES) / int(num_PROC))
+        chunks = self.worker_chunks(num_PROC, worker)
+        num_SAMPLES = sum(
+            chunk_stop - chunk_start for chunk_start, chunk_stop in chunks
+        )
+
+        # Number of forced values per chunk of the worker, for each forced path
+        forced_splits = []
+        if len(chunks) > 0:
+            all_chunks = chunk_ranges(
+                int(self.FIRST_SAMPLE), int(self.NUM_SAMPLES), self.CHUNK_SIZE
+            )
+            first_chunk = (chunks[0][0] - int(self.FIRST_SAMPLE)) // self.CHUNK_SIZE
+            for forced in self.FORCED:
+                split = forced.split(
+                    self.SEED, all_chunks, self.FORCED_COUNTS[forced.index]
+                )
+                forced_splits.append(
+                    (forced, split[first_chunk : first_chunk + len(chunks)])
+                )
+
+        # Resume after the last chunk that made it to disk
+        chunks_done, offset = 0, 0
+        value_sample = ValueSample(
+            self.value_sample_paths(schema), self.VALUE_SAMPLE_SIZE
+        )
+        if checkpointPath is not None and os.path.exists(checkpointPath):
+            with open(checkpointPath) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            if (
+                checkpoint["seed"] != self.SEED
+                or checkpoint["chunk_size"] != self.CHUNK_SIZE
+                or checkpoint["num_proc"] != int(num_PROC)
+            ):
+                raise RuntimeError(
+                    "Checkpoint {} does not belong to this run".format(checkpointPath)
+                )
+            chunks_done, offset = checkpoint["chunks_done"], checkpoint["offset"]
+            value_sample = ValueSample.from_dict(checkpoint["value_sample"])
+            print(
+                "### resume worker %s after %s of %s chunks"
+                % (worker, chunks_done, len(chunks))
+            )
+
+        # Fields that only some documents have
+        optional_paths = presence_paths(self.configDict, schema)
 
         FakerInstanceForValues = fakerModule.Faker()
-        fakerModule.Faker.seed(datetime.now())
 
         faker = DeepFakerSchema(faker=FakerInstanceForValues)
 
@@ -256,14 +532,122 @@ class DataGenerator:
         print("### generate sample of size: %s" % num_SAMPLES)
 
         print("### start faking schema at: %s" % start)
-        data = faker.generate_fake(schema, iterations=num_SAMPLES)
+        print("Write data to ", outputPath)
+        # Offsets of the documents in the output (see offset_index). The index of
+        # a resumed worker is rebuilt from the documents on disk.
+        index = OffsetIndexWriter(outputPath + INDEX_SUFFIX)
+        position = offset
+        if chunks_done > 0:
+            for offsets in iter_line_offsets(outputPath, offset):
+                index.extend_array(offsets)
+        with open(outputPath, "r+b" if chunks_done > 0 else "wb") as file1:
+            file1.truncate(offset)
+            file1.seek(offset)
+            # Hand filled chunks to a writer thread, so faking the next chunk
+            # overlaps with writing the previous one
+            writer = BackgroundWriter(
+                file1, sync=checkpointPath is not None, cpus=writer_cpus
+            )
+            try:
+                last_checkpoint = time.perf_counter()
+                for chunk_index in range(chunks_done, len(chunks)):
+                    chunk_start, chunk_stop = chunks[chunk_index]
+                    FakerInstanceForValues.seed_instance(
+                        chunk_seed(self.SEED, chunk_start)
+                    )
+                    lengths = ArrayLengths(
+                        chunk_seed(self.SEED, chunk_start), chunk_stop - chunk_start
+                    )
+                    documents = [
+                        faker._generate_one_fake(schema, absent, lengths)
+                        for absent in absent_fields(
+                            chunk_seed(self.SEED, chunk_start),
+                            optional_paths,
+                            chunk_stop - chunk_start,
+                        )
+                    ]
+                    for typed in self.TYPED:
+                        typed.plant(
+                            documents,
+                            chunk_seed(self.SEED, chunk_start),
+                            FakerInstanceForValues,
+                        )
+                    for forced, split in forced_splits:
+                        forced.plant(
+                            documents,
+                            chunk_seed(self.SEED, chunk_start),
+                            int(split[chunk_index]),
+                        )
+                    for unique in self.UNIQUE:
+                        unique.plant(
+                            documents,
+                            self.SEED,
+                            int(self.FIRST_SAMPLE),
+                            int(self.NUM_SAMPLES),
+                            chunk_start,
+                        )
+                    value_sample.add(
+                        sample_keys(chunk_seed(self.SEED, chunk_start), len(documents)),
+                        documents,
+                        chunk_start,
+                    )
+                    buffer = [json.dumps(document) + "\n" for document in documents]
+                    # json.dumps escapes non ASCII characters, so the length of a
+                    # line is its size in bytes
+                    sizes = np.fromiter((len(line) for line in buffer), dtype=np.int64)
+                    index.extend_array(np.cumsum(sizes) - sizes, position)
+                    position += int(sizes.sum())
+                    # Checkpoints fsync the data and serialize the value sample,
+                    # so they are only taken every CHECKPOINT_INTERVAL seconds
+                    # and after the last chunk
+                    on_written = None
+                    now = time.perf_counter()
+                    if checkpointPath is not None and (
+                        now - last_checkpoint >= self.CHECKPOINT_INTERVAL
+                        or chunk_index + 1 == len(chunks)
+                    ):
+                        last_checkpoint = now
+                        on_written = functools.partial(
+                            self._write_checkpoint,
+                            checkpointPath,
+                            num_PROC,
+                            worker,
+                            chunks,
+                            chunk_index + 1,
+                            value_sample.to_dict(),
+                        )
+                    writer.write(buffer, on_written)
+            finally:
+                writer.close()
+        index.close(position)
         stop = datetime.now()
         print("### stop faking schema at: %s" % stop)
         print("took %s" % (stop - start))
 
-        print("Write data to ", outputPath)
-        with open(outputPath, "w") as file1:
-            file1.writelines([json.dumps(x) + "\n" for x in data])
+        metrics = {
+            "documents": sum(
+                chunk_stop - chunk_start
+                for chunk_start, chunk_stop in chunks[chunks_done:]
+            ),
+            "resumed_after_chunk": chunks_done,
+            "cpu_affinity": sorted(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity")
+            else None,
+            "chunk_size": self.CHUNK_SIZE,
+            "seconds": (stop - start).total_seconds(),
+        }
+        metrics.update(writer.metrics())
+        print(
+            "### writer stalled generation for %.3fs, waited for generation %.3fs (%s bound)"
+            % (
+                metrics["generator_stall_seconds"],
+                metrics["writer_idle_seconds"],
+                metrics["bound"],
+            )
+        )
+        with open(outputPath + METRICS_SUFFIX, "w") as metrics_file:
+            json.dump(metrics, metrics_file)
+        value_sample.write(outputPath + VALUE_SAMPLE_SUFFIX)
 
         # Dont create schema.txt file in the data directory as it conflicts with the
         # directory structure for benchmark (only json files in this directory)
@@ -271,42 +655,39 @@ class DataGenerator:
         with open(os.path.join(schema_txt_path, "schema.txt"), "w") as file1:
             file1.write(str(schema) + "\n")
 
-    ######################################################
-    # ADAPT TO REQUIRED QUERY RESULT
-    ######################################################
-
-    def dataGenerator_adapt(
-        self, InFilePath="./genDatasets/data.txt", OutFilePath="./genDatasets/data.txt"
+    def _write_checkpoint(
+        self,
+        checkpointPath,
+        num_PROC,
+        worker,
+        chunks,
+        chunks_done,
+        value_sample,
+        offset,
     ):
-        with open(InFilePath) as f:
-            jsons = f.readlines()
-
-        for pathDict in self.FORCED_PATHS:
-            path = pathDict["path"]
-            if "operator" in pathDict.keys():
-                op = pathDict["operator"]
-                if not op == "eq":
-                    print("Only supported operator is 'eq' until further development.")
-                    raise ValueError(
-                        "Only supported operator is 'eq' until further development."
-                    )
-                if not "value" in pathDict.keys():
-                    raise ValueError("key 'value' is missing in path")
-                val = pathDict["value"]
-                if not "num" in pathDict.keys():
-                    raise ValueError("key 'num' is missing in path")
-                num = int(pathDict["num"])
-
-                dictWithCorrectValue = {}
-                populate_dict(path, dictWithCorrectValue, val)
-
-                for i, line in enumerate(jsons[:num]):
-                    data = ast.literal_eval(line)
-                    update(data, dictWithCorrectValue)
-                    jsons[i] = json.dumps(data) + "\n"
-
-                random.shuffle(jsons)
-
-        print("Output file is: " + OutFilePath)
-        with open(OutFilePath, "w+") as outfile:
-            outfile.write("".join(jsons))
+        """
+        Records that the first chunks_done chunks of the worker are durable and end
+        at the given offset of its output file, together with the value sample of
+        these chunks
+        """
+        next_chunk_seed = None
+        if chunks_done < len(chunks):
+            next_chunk_seed = chunk_seed(self.SEED, chunks[chunks_done][0])
+        checkpoint = {
+            "worker": worker,
+            "num_proc": int(num_PROC),
+            "seed": self.SEED,
+            "chunk_size": self.CHUNK_SIZE,
+            "chunks_done": chunks_done,
+            "chunks_total": len(chunks),
+            "documents_done": [chunks[0][0], chunks[chunks_done - 1][1]],
+            "offset": offset,
+            "next_chunk_seed": next_chunk_seed,
+            "value_sample": value_sample,
+        }
+        temp_path = checkpointPath + ".tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, checkpointPath)
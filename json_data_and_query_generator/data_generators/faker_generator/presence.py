@@ -0,0 +1,92 @@
+"""
+Optional fields of the generated documents.
+
+A forced path of the schema config with "presence": p is present in a document
+with probability p. "fieldPresence": p at the top level of the schema config does
+the same for every dummy field the schema generator adds. Fields in arrays and
+forced paths with operator or unique values are always present, so their counts
+stay exact.
+
+Which fields a document lacks is decided per chunk with one vectorized Bernoulli
+draw for all optional fields of all documents, seeded by the chunk seed. The faker
+skips the absent fields instead of removing them afterwards, so sparse documents
+are not slower to generate than dense ones.
+"""
+import numpy as np
+
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    is_array,
+)
+
+# Seeds the presence draws of a chunk apart from its forced values
+PRESENCE_SEED_KEY = 0x70726573
+
+
+def check_presence(p, where):
+    if not isinstance(p, (int, float)) or isinstance(p, bool) or not 0 < p <= 1:
+        raise ValueError("Presence {} of {} must be in (0, 1]".format(p, where))
+
+
+def presence_paths(configDict, schema):
+    """
+    Returns the optional fields as lists (path, presence probability)
+
+    Args:
+        configDict: The schema config
+        schema: The schema generated from it
+    """
+    forced_paths = [list(p["path"]) for p in configDict.get("forcedPaths", [])]
+    paths = []
+    for pathDict in configDict.get("forcedPaths", []):
+        if "presence" not in pathDict.keys():
+            continue
+        check_presence(pathDict["presence"], "forced path {}".format(pathDict["path"]))
+        if pathDict["presence"] < 1:
+            if any("[" in key for key in pathDict["path"]):
+                raise ValueError(
+                    "Forced path {} in an array must always be present".format(
+                        pathDict["path"]
+                    )
+                )
+            paths.append((list(pathDict["path"]), float(pathDict["presence"])))
+    field_presence = configDict.get("fieldPresence", 1)
+    check_presence(field_presence, "fieldPresence")
+    if field_presence < 1:
+
+        def iter1(d, path):
+            for k, v in d.items():
+                if is_array(v):
+                    continue
+                if isinstance(v, dict):
+                    iter1(v, path + [k])
+                elif path + [k] not in forced_paths:
+                    paths.append((path + [k], float(field_presence)))
+
+        iter1(schema, [])
+    return paths
+
+
+def absent_fields(seed, paths, n):
+    """
+    Returns for each of the n documents of a chunk the tree of its absent fields,
+    eg {"c0": {"a1": True}}, or None if it has all fields
+
+    Args:
+        seed: Seed of the chunk
+        paths: Optional fields, see presence_paths
+    """
+    if len(paths) == 0:
+        return [None] * n
+    rng = np.random.default_rng([seed, PRESENCE_SEED_KEY])
+    probabilities = np.array([p for _, p in paths])
+    absent = rng.random((n, len(paths))) >= probabilities
+    trees = [None] * n
+    for i, j in zip(*[a.tolist() for a in np.nonzero(absent)]):
+        if trees[i] is None:
+            trees[i] = {}
+        tree = trees[i]
+        path = paths[j][0]
+        for key in path[:-1]:
+            tree = tree.setdefault(key, {})
+        tree[path[-1]] = True
+    return trees
@@ -0,0 +1,88 @@
+import pytest
+
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    ArrayLengths,
+    array_schema,
+    length_bounds,
+    min_elements,
+    parse_length,
+    path_slots,
+    split_array_key,
+    unwrap_array,
+)
+
+
+def test_split_array_key():
+    assert split_array_key("matrix[2][1..3]") == ("matrix", ["2", "1..3"])
+    assert split_array_key("a1") == ("a1", [])
+    with pytest.raises(ValueError):
+        split_array_key("a[1]b")
+
+
+@pytest.mark.parametrize(
+    "length, distribution, bounds",
+    [
+        ("3", ("fixed", 3), (3, 3)),
+        ("0", ("fixed", 0), (0, 0)),
+        ("1..4", ("uniform", 1, 4), (1, 4)),
+        (" 2 .. 2 ", ("uniform", 2, 2), (2, 2)),
+        ("poisson(2.5)", ("poisson", 2.5), (0, None)),
+    ],
+)
+def test_parse_length_and_bounds(length, distribution, bounds):
+    assert parse_length(length) == distribution
+    assert length_bounds(length) == bounds
+
+
+@pytest.mark.parametrize("length", ["", "-1", "3..1", "1..", "poisson()", "normal(2)"])
+def test_parse_length_rejects_invalid_lengths(length):
+    with pytest.raises(ValueError):
+        parse_length(length)
+
+
+@pytest.mark.parametrize("length", ["4", "2..5", "poisson(3)"])
+def test_array_lengths_stay_in_bounds_and_are_seeded(length):
+    def draw(seed):
+        lengths = ArrayLengths(seed, batch_size=64)
+        return [lengths.draw(length) for _ in range(1000)]
+
+    low, high = length_bounds(length)
+    values = draw(5)
+    assert min(values) >= low
+    assert high is None or max(values) <= high
+    assert values == draw(5)
+    if low != high:
+        assert values != draw(6)
+    if high is not None:
+        assert set(values) == set(range(low, high + 1))
+
+
+def test_array_lengths_streams_are_independent():
+    lengths = ArrayLengths(5)
+    lengths.draw("poisson(2)")
+
+    assert lengths.draw("0..9") == ArrayLengths(5).draw("0..9")
+
+
+def test_array_schema_round_trips():
+    schema = array_schema(["2", "1..3"], "word")
+
+    assert schema == [{"$array": "1..3", "$items": "word"}] * 2
+    assert unwrap_array(schema) == (["2", "1..3"], "word")
+    assert unwrap_array(array_schema(["0"], "word")) == (["0"], None)
+
+
+def test_path_slots_and_min_elements():
+    documents = [
+        {"arr": [{"v": 1}, {"v": 2}], "t": [[1, 2], [3]]},
+        {"arr": [], "t": [[4]]},
+    ]
+
+    slots, owners = path_slots(documents, ["arr[0..2]", "v"])
+    assert [c[k] for c, k in slots] == [1, 2]
+    assert owners == [0, 0]
+    slots, owners = path_slots(documents, ["t[2][1..2]"])
+    assert [c[k] for c, k in slots] == [1, 2, 3, 4]
+    assert owners == [0, 0, 0, 1]
+    assert min_elements(["arr[3]", "b[2..4]", "v"]) == 6
+    assert min_elements(["arr[poisson(1)]"]) == 0
@@ -0,0 +1,192 @@
+import operator
+
+import numpy as np
+import pytest
+
+from json_data_and_query_generator.data_generators.faker_generator.forced_values import (
+    ForcedPath,
+    UniquePath,
+    permute,
+)
+
+COMPARE = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+
+
+def forced_path(**pathDict):
+    return ForcedPath(
+        0, dict({"path": ["a"], "valueType": "random_number(2)"}, **pathDict)
+    )
+
+
+def count_matches(forced, values):
+    if forced.operator == "between":
+        low, high = forced.value
+        return sum(low <= v <= high for v in values)
+    return sum(COMPARE[forced.operator](v, forced.value) for v in values)
+
+
+def test_split_sums_to_num_within_chunk_sizes():
+    forced = forced_path(operator="eq", value=3, num=250)
+    chunks = [(0, 100), (100, 200), (200, 300), (300, 350)]
+
+    split = forced.split(7, chunks, 250)
+
+    assert split.sum() == 250
+    assert all(0 <= n <= stop - start for n, (start, stop) in zip(split, chunks))
+    assert list(split) == list(forced.split(7, chunks, 250))
+
+
+def test_split_rejects_more_matches_than_documents():
+    forced = forced_path(operator="eq", value=3, num=11)
+
+    with pytest.raises(ValueError):
+        forced.split(7, [(0, 10)], 11)
+
+
+@pytest.mark.parametrize(
+    "operator, value",
+    [
+        ("eq", 3),
+        ("ne", 3),
+        ("lt", 10),
+        ("le", 0),
+        ("gt", 98),
+        ("ge", 50),
+        ("between", [20, 29]),
+        ("eq", 500),
+    ],
+)
+def test_plant_numbers_matches_exactly(operator, value):
+    forced = forced_path(operator=operator, value=value, num=37)
+    documents = [{"a": None} for _ in range(200)]
+
+    forced.plant(documents, 11, 37)
+
+    values = [d["a"] for d in documents]
+    assert all(isinstance(v, int) for v in values)
+    assert count_matches(forced, values) == 37
+    assert np.count_nonzero(forced.document_matches(documents)) == 37
+
+
+def test_plant_strings_eq():
+    forced = ForcedPath(
+        0,
+        {
+            "path": ["c", "w"],
+            "valueType": "word",
+            "operator": "eq",
+            "value": "x",
+            "num": 4,
+        },
+    )
+    documents = [{"c": {"w": "x" if i % 7 == 0 else "y"}} for i in range(50)]
+
+    forced.plant(documents, 11, 4)
+
+    assert [d["c"]["w"] for d in documents].count("x") == 4
+
+
+def test_plant_strings_ne_changes_the_colliding_values():
+    forced = ForcedPath(
+        0,
+        {"path": ["w"], "valueType": "word", "operator": "ne", "value": "x", "num": 3},
+    )
+    documents = [{"w": "x"} for _ in range(20)]
+
+    forced.plant(documents, 11, 3)
+
+    assert [d["w"] for d in documents].count("x") == 17
+
+
+def test_invalid_forced_paths():
+    with pytest.raises(ValueError):
+        forced_path(operator="like", value=1, num=1)
+    with pytest.raises(ValueError):
+        forced_path(operator="between", value=[5, 4], num=1)
+    with pytest.raises(ValueError):
+        forced_path(valueType="word", operator="lt", value=1, num=1)
+    with pytest.raises(ValueError):
+        forced_path(operator="eq", value=1)
+
+
+def test_plant_strings_keeps_the_value_type():
+    forced = ForcedPath(
+        0,
+        {
+            "path": ["c", "w"],
+            "valueType": "word",
+            "operator": "eq",
+            "value": 5,
+            "num": 4,
+        },
+    )
+    documents = [{"c": {"w": str(i % 7)}} for i in range(50)]
+
+    forced.plant(documents, 11, 4)
+
+    assert [d["c"]["w"] for d in documents].count(5) == 4
+    assert np.count_nonzero(forced.document_matches(documents)) == 4
+
+
+def test_plant_array_elements():
+    forced = ForcedPath(
+        0,
+        {
+            "path": ["arr[3]", "arr[2]", "v"],
+            "valueType": "random_number(1)",
+            "operator": "eq",
+            "value": 99,
+            "num": 5,
+            "numArr": 2,
+        },
+    )
+    documents = [
+        {"arr": [{"arr": [{"v": 0}, {"v": 0}]} for _ in range(3)]} for _ in range(40)
+    ]
+
+    forced.plant(documents, 11, 5)
+
+    hits = [sum(e["v"] == 99 for a in d["arr"] for e in a["arr"]) for d in documents]
+    assert sorted(hits)[-5:] == [2] * 5
+    assert hits.count(0) == 35
+    assert np.count_nonzero(forced.document_matches(documents)) == 5
+
+
+def test_array_elements_must_suffice_for_numArr():
+    with pytest.raises(ValueError):
+        forced_path(path=["arr[0..3]", "v"], operator="eq", value=1, num=1)
+    with pytest.raises(ValueError):
+        forced_path(path=["arr[2]"], operator="eq", value=1, num=1, numArr=3)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 17, 64, 1000, 4097])
+def test_permute_is_a_bijection(n):
+    values = permute(np.arange(n), n, [3, 0, 0])
+
+    assert sorted(values.tolist()) == list(range(n))
+    assert values.tolist() == permute(np.arange(n), n, [3, 0, 0]).tolist()
+
+
+def test_permute_depends_on_the_seed():
+    assert (
+        permute(np.arange(1000), 1000, [1]).tolist()
+        != permute(np.arange(1000), 1000, [2]).tolist()
+    )
+
+
+def test_unique_path_numbers_every_document_once_across_chunks():
+    unique = UniquePath(0, {"path": ["c", "u"], "valueType": "unique_number"})
+    documents = [{"c": {}} for _ in range(250)]
+
+    for chunk_start in range(0, 250, 60):
+        chunk = documents[chunk_start : chunk_start + 60]
+        unique.plant(chunk, 5, 0, 250, chunk_start)
+
+    assert sorted(d["c"]["u"] for d in documents) == list(range(250))
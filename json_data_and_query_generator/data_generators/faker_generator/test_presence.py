@@ -0,0 +1,48 @@
+import pytest
+
+from json_data_and_query_generator.data_generators.faker_generator.presence import (
+    absent_fields,
+    presence_paths,
+)
+
+SCHEMA = {"a": "word", "b": {"c": "word", "d": "word"}, "arr": ["word", "word"]}
+
+
+def test_presence_paths_of_forced_paths_and_dummy_fields():
+    configDict = {
+        "forcedPaths": [
+            {"path": ["a"], "valueType": "word", "presence": 0.5},
+            {"path": ["b", "c"], "valueType": "word", "presence": 1},
+        ],
+        "fieldPresence": 0.9,
+    }
+
+    paths = presence_paths(configDict, SCHEMA)
+
+    # Forced paths keep their own presence and arrays are always present
+    assert paths == [(["a"], 0.5), (["b", "d"], 0.9)]
+
+
+def test_presence_paths_rejects_invalid_presence():
+    for presence in [0, 1.5, True, "0.5"]:
+        with pytest.raises(ValueError):
+            presence_paths({"fieldPresence": presence}, SCHEMA)
+    with pytest.raises(ValueError):
+        presence_paths({"forcedPaths": [{"path": ["arr[2]"], "presence": 0.5}]}, SCHEMA)
+
+
+def test_absent_fields_follow_the_presence():
+    paths = [(["a"], 0.25), (["b", "d"], 1.0), (["b", "c"], 0.75)]
+
+    trees = absent_fields(3, paths, 20000)
+
+    absent_a = sum(1 for t in trees if t is not None and "a" in t)
+    absent_c = sum(1 for t in trees if t is not None and "c" in t.get("b", {}))
+    assert abs(absent_a / 20000 - 0.75) < 0.02
+    assert abs(absent_c / 20000 - 0.25) < 0.02
+    assert not any(t is not None and "d" in t.get("b", {}) for t in trees)
+    assert trees == absent_fields(3, paths, 20000)
+
+
+def test_absent_fields_without_optional_fields():
+    assert absent_fields(3, [], 4) == [None] * 4
@@ -0,0 +1,106 @@
+import faker as fakerModule
+import numpy as np
+import pytest
+
+from json_data_and_query_generator.data_generators.faker_generator.typed_values import (
+    TypedPath,
+    matrix_types,
+    sampler,
+    split_top_level,
+    split_value_type,
+    value_matches_type,
+)
+
+
+def test_split_value_type():
+    assert split_value_type("random_number(3)") == ("random_number", "3")
+    assert split_value_type(" word ") == ("word", None)
+    assert split_top_level("mixed(a:1, b(2):3), c", ",") == [
+        "mixed(a:1, b(2):3)",
+        " c",
+    ]
+
+
+@pytest.mark.parametrize(
+    "valueType, types",
+    [
+        ("boolean", ["boolean"]),
+        ("null", ["null"]),
+        ("random_float(2)", ["number"]),
+        ("timestamp", ["string"]),
+        (
+            "mixed(random_number(3):0.7, word:0.2, null:0.1)",
+            ["null", "number", "string"],
+        ),
+        ("unique_number", ["number"]),
+        ("word", ["string"]),
+    ],
+)
+def test_samples_match_their_value_type(valueType, types):
+    rng = np.random.default_rng(1)
+
+    assert matrix_types(valueType) == types
+    if valueType == "unique_number":
+        return
+    values = sampler(valueType).sample(rng, 500, fakerModule.Faker())
+    assert len(values) == 500
+    assert all(value_matches_type(v, valueType) for v in values)
+
+
+def test_float_and_timestamp_ranges():
+    rng = np.random.default_rng(1)
+
+    floats = sampler("random_float(2)").sample(rng, 1000, None)
+    timestamps = sampler("timestamp").sample(rng, 1000, None)
+
+    assert all(0 <= f < 100 and round(f, 2) == f for f in floats)
+    assert all("2000" <= t[:4] < "2030" and t.endswith("Z") for t in timestamps)
+
+
+def test_mixed_weights():
+    rng = np.random.default_rng(1)
+
+    values = sampler("mixed(boolean:3, null:1)").sample(rng, 20000, None)
+
+    assert abs(values.count(None) / 20000 - 0.25) < 0.02
+    assert all(v is None or isinstance(v, bool) for v in values)
+
+
+@pytest.mark.parametrize(
+    "valueType",
+    ["mixed(boolean:0)", "mixed()", "mixed(mixed(null:1):1)", "mixed(unique_number:1)"],
+)
+def test_invalid_mixed_value_types(valueType):
+    with pytest.raises(ValueError):
+        sampler(valueType)
+
+
+def test_typed_path_plants_every_array_element_reproducibly():
+    typed = TypedPath(0, {"path": ["c", "arr[3]", "b"], "valueType": "boolean"})
+
+    def plant():
+        documents = [{"c": {"arr": [{"b": 0} for _ in range(3)]}} for i in range(30)]
+        typed.plant(documents, 9, None)
+        return documents
+
+    documents = plant()
+    assert all(isinstance(e["b"], bool) for d in documents for e in d["c"]["arr"])
+    assert documents == plant()
+
+
+def test_typed_path_fills_paths_that_are_arrays():
+    typed = TypedPath(0, {"path": ["c", "tags[1..3]"], "valueType": "boolean"})
+
+    def plant():
+        documents = [{"c": {"tags": [0] * (1 + i % 3)}} for i in range(30)]
+        typed.plant(documents, 9, None)
+        return documents
+
+    documents = plant()
+    assert all(isinstance(v, bool) for d in documents for v in d["c"]["tags"])
+    assert documents == plant()
+
+
+def test_typed_path_rejects_operators():
+    with pytest.raises(ValueError):
+        TypedPath(0, {"path": ["a"], "valueType": "boolean", "operator": "eq"})
@@ -0,0 +1,38 @@
+import json
+
+from json_data_and_query_generator.data_generators.faker_generator.value_sample import (
+    ValueSample,
+    count_values,
+    sample_keys,
+)
+
+
+def test_count_values_is_exact(tmp_path):
+    data_path = str(tmp_path / "mycol.json")
+    documents = [{"a": i % 3, "b": {"c": i % 2 == 0}} for i in range(100)]
+    documents.append({"a": True, "b": {}})
+    with open(data_path, "w") as data_file:
+        for document in documents:
+            data_file.write(json.dumps(document) + "\n")
+    estimates = {("a",): [(1, 10), (True, 10), (7, 1)], ("b", "c"): [(False, 1)]}
+
+    for num_proc in [1, 3]:
+        counts = count_values(data_path, estimates, num_proc, batch_size=7)
+
+        assert counts == {("a",): [(1, 33), (True, 1)], ("b", "c"): [(False, 50)]}
+
+
+def test_value_counts_tell_booleans_from_numbers():
+    documents = [{"a": x} for x in [1, True, 1.0, 0, False, True]]
+    sample = ValueSample([["a"]], size=len(documents))
+    sample.add(sample_keys(0, len(documents)), documents, 0)
+
+    counts = sample.value_counts()[("a",)]
+
+    # 1 and 1.0 are the same JSON number
+    assert sorted((isinstance(v, bool), v, c) for v, c in counts) == [
+        (False, 0, 1),
+        (False, 1, 2),
+        (True, False, 1),
+        (True, True, 2),
+    ]
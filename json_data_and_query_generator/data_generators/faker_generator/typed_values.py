@@ -0,0 +1,263 @@
+"""
+Value types drawn by vectorized samplers instead of the faker.
+
+    boolean: true or false
+    null: always null
+    random_float(d): number uniform in [0, 10**d) with 2 decimals, d = 9 without
+        argument
+    timestamp: ISO 8601 UTC timestamp string between 2000 and 2030, eg
+        "2017-03-04T05:06:07Z"
+    mixed(t1:w1, t2:w2, ...): a value of type ti with probability proportional to
+        wi, eg "mixed(random_number(3):0.7, word:0.3)". The ti are any value
+        types except unique_number and mixed; faker providers among them are
+        faked one value at a time.
+
+The values of a path are drawn for all documents of a chunk at once, seeded by
+the chunk seed, and then set in the documents like the forced values. Paths in
+arrays, and paths that are arrays (see arrays), get a value per array element.
+"""
+import functools
+import re
+
+import numpy as np
+
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    path_slots,
+)
+from json_data_and_query_generator.data_generators.faker_generator.forced_values import (
+    UNIQUE_VALUE_TYPE,
+    number_domain,
+)
+
+TYPED_VALUE_TYPES = ["boolean", "null", "random_float", "timestamp", "mixed"]
+# Seeds the typed values of a chunk apart from its forced values
+TYPED_SEED_KEY = 0x74797065
+
+TIMESTAMP_START = np.datetime64("2000-01-01T00:00:00", "s")
+TIMESTAMP_STOP = np.datetime64("2030-01-01T00:00:00", "s")
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ")
+
+
+def split_value_type(valueType):
+    """
+    Returns the name and the argument string of a value type, eg
+    "random_number(3)" -> ("random_number", "3"), "word" -> ("word", None)
+    """
+    match = re.fullmatch(r"\s*(\w+)\s*(?:\((.*)\))?\s*", valueType)
+    if match is None:
+        raise ValueError("Invalid value type {}".format(valueType))
+    return match.group(1), match.group(2)
+
+
+def split_top_level(s, separator):
+    """
+    Splits s at the separators outside of parentheses
+    """
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(s):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(s[start:i])
+            start = i + 1
+    parts.append(s[start:])
+    return parts
+
+
+@functools.lru_cache(maxsize=None)
+def is_typed(valueType):
+    return isinstance(valueType, str) and (
+        split_value_type(valueType)[0] in TYPED_VALUE_TYPES
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def sampler(valueType):
+    """
+    Returns the sampler of a value type
+    """
+    name, argument = split_value_type(valueType)
+    if name == "boolean":
+        return BooleanSampler()
+    if name == "null":
+        return NullSampler()
+    if name == "random_float":
+        return FloatSampler(int(argument) if argument else 9)
+    if name == "timestamp":
+        return TimestampSampler()
+    if name == "mixed":
+        return MixedSampler(argument or "")
+    if valueType == UNIQUE_VALUE_TYPE:
+        raise ValueError("Value type {} cannot be mixed".format(valueType))
+    if number_domain(valueType) is not None:
+        return IntegerSampler(number_domain(valueType))
+    return FakerSampler(name, int(argument) if argument else None)
+
+
+def matrix_types(valueType):
+    """
+    Returns the sorted types of the feasibility matrix the values of a value type
+    have
+    """
+    if valueType == UNIQUE_VALUE_TYPE or number_domain(valueType) is not None:
+        return ["number"]
+    if not is_typed(valueType):
+        return ["string"]
+    return sampler(valueType).matrix_types
+
+
+def value_matches_type(value, valueType):
+    """
+    Returns whether a generated value has the type of its value type. Values of
+    faker providers only need to be scalars.
+    """
+    if valueType == UNIQUE_VALUE_TYPE or number_domain(valueType) is not None:
+        return isinstance(value, int) and not isinstance(value, bool)
+    if not is_typed(valueType):
+        return not isinstance(value, (dict, list))
+    return sampler(valueType).matches(value)
+
+
+class BooleanSampler:
+    matrix_types = ["boolean"]
+
+    def sample(self, rng, n, faker):
+        return (rng.random(n) < 0.5).tolist()
+
+    def matches(self, value):
+        return isinstance(value, bool)
+
+
+class NullSampler:
+    matrix_types = ["null"]
+
+    def sample(self, rng, n, faker):
+        return [None] * n
+
+    def matches(self, value):
+        return value is None
+
+
+class IntegerSampler:
+    matrix_types = ["number"]
+
+    def __init__(self, domain):
+        self.domain = domain
+
+    def sample(self, rng, n, faker):
+        return rng.integers(self.domain[0], self.domain[1] + 1, size=n).tolist()
+
+    def matches(self, value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+
+class FloatSampler:
+    matrix_types = ["number"]
+
+    def __init__(self, digits):
+        self.scale = 10.0**digits
+
+    def sample(self, rng, n, faker):
+        return np.round(rng.random(n) * self.scale, 2).tolist()
+
+    def matches(self, value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class TimestampSampler:
+    matrix_types = ["string"]
+
+    def sample(self, rng, n, faker):
+        seconds = rng.integers(
+            0, (TIMESTAMP_STOP - TIMESTAMP_START).astype(np.int64), size=n
+        )
+        timestamps = np.datetime_as_string(
+            TIMESTAMP_START + seconds.astype("timedelta64[s]"), unit="s"
+        )
+        return [t + "Z" for t in timestamps.tolist()]
+
+    def matches(self, value):
+        return isinstance(value, str) and TIMESTAMP_PATTERN.fullmatch(value) is not None
+
+
+class FakerSampler:
+    matrix_types = ["string"]
+
+    def __init__(self, provider, argument):
+        self.provider = provider
+        self.argument = argument
+
+    def sample(self, rng, n, faker):
+        fct = getattr(faker, self.provider)
+        if self.argument is None:
+            return [fct() for _ in range(n)]
+        return [fct(self.argument) for _ in range(n)]
+
+    def matches(self, value):
+        return not isinstance(value, (dict, list))
+
+
+class MixedSampler:
+    def __init__(self, argument):
+        self.samplers, weights = [], []
+        for part in split_top_level(argument, ","):
+            valueType, _, weight = part.rpartition(":")
+            if split_value_type(valueType)[0] == "mixed":
+                raise ValueError("Mixed value types cannot be nested")
+            self.samplers.append(sampler(valueType.strip()))
+            weights.append(float(weight))
+        if len(self.samplers) == 0 or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError("Invalid weights of mixed({})".format(argument))
+        self.weights = np.array(weights) / sum(weights)
+        self.matrix_types = sorted(
+            set(t for s in self.samplers for t in s.matrix_types)
+        )
+
+    def sample(self, rng, n, faker):
+        which = rng.choice(len(self.samplers), size=n, p=self.weights)
+        values = [None] * n
+        for j, s in enumerate(self.samplers):
+            positions = np.flatnonzero(which == j).tolist()
+            for i, value in zip(positions, s.sample(rng, len(positions), faker)):
+                values[i] = value
+        return values
+
+    def matches(self, value):
+        return any(s.matches(value) for s in self.samplers)
+
+
+class TypedPath:
+    """
+    A forced path of the schema config whose value type has a sampler
+    """
+
+    def __init__(self, index, pathDict):
+        """
+        Args:
+            index: Position of the path in the forcedPaths of the schema config
+            pathDict: The forced path of the schema config
+        """
+        self.index = index
+        self.path = pathDict["path"]
+        self.valueType = pathDict["valueType"]
+        if "operator" in pathDict.keys():
+            raise ValueError(
+                "Forced path {} of value type {} must not have an operator".format(
+                    self.path, self.valueType
+                )
+            )
+        self.sampler = sampler(self.valueType)
+
+    def plant(self, documents, chunk_seed, faker):
+        """
+        Sets the values of the path in the documents of a chunk. Documents that
+        lack the path (see presence) are left as they are.
+        """
+        slots, _ = path_slots(documents, self.path)
+        rng = np.random.default_rng([chunk_seed, TYPED_SEED_KEY, self.index])
+        for (container, key), value in zip(
+            slots, self.sampler.sample(rng, len(slots), faker)
+        ):
+            container[key] = value
@@ -0,0 +1,224 @@
+"""
+Sample of the values of the generated documents, so the query generator can build
+predicates on values that occur in the data.
+
+Every document gets a pseudo random key and the sample keeps the values of the
+documents with the smallest keys (bottom-k sampling). The sample of a set of
+documents is therefore the same no matter how they were split into chunks and
+processes, and the samples of disjoint sets of documents merge into the sample
+of their union.
+
+A value found in j of the k sampled documents occurs in about j * n / k of the n
+documents, and in at least one. On request (--exact-counts of the pipeline)
+count_values replaces these estimates by the exact counts in one extra pass over
+the data.
+"""
+import heapq
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from json_data_and_query_generator.data_scan import byte_ranges, iter_line_batches
+
+# Sample of the workbook data, next to schema.txt
+VALUE_SAMPLE_FILENAME = "values.json"
+# Suffix of the per worker sample written next to the worker's output file
+VALUE_SAMPLE_SUFFIX = ".values"
+DEFAULT_VALUE_SAMPLE_SIZE = 100
+DEFAULT_COUNT_BATCH_SIZE = 20000
+
+
+def sample_keys(seed, n):
+    """
+    Returns the sample keys of the n documents of a chunk
+    """
+    return np.random.default_rng(seed).random(n)
+
+
+def get_value(document, path):
+    """
+    Returns the value of a path, None if the document lacks it
+    """
+    for key in path:
+        if key not in document:
+            return None
+        document = document[key]
+    return document
+
+
+class ValueSample:
+    """
+    Bottom-k sample of the values of some paths of the documents
+    """
+
+    def __init__(self, paths, size=DEFAULT_VALUE_SAMPLE_SIZE):
+        """
+        Args:
+            paths: Paths whose values are sampled, as lists of field names
+            size: Number of sampled documents
+        """
+        self.paths = [list(p) for p in paths]
+        self.size = int(size)
+        self.documents = 0
+        # (-key, -document index, values), the largest key on top
+        self._heap = []
+
+    def add(self, keys, documents, first_index):
+        """
+        Args:
+            keys: Sample keys of the documents, see sample_keys
+            documents: Generated documents
+            first_index: Index of the first document in the data set
+        """
+        self.documents += len(documents)
+        if self.size == 0:
+            return
+        candidates = range(len(documents))
+        if len(self._heap) >= self.size:
+            candidates = np.flatnonzero(keys < -self._heap[0][0])
+        for i in candidates:
+            self._push(
+                (
+                    -float(keys[i]),
+                    -(first_index + int(i)),
+                    [get_value(documents[i], p) for p in self.paths],
+                )
+            )
+
+    def merge(self, other):
+        """
+        Adds the sample of other documents
+        """
+        if other.paths != self.paths:
+            raise ValueError("Cannot merge samples of different paths")
+        self.documents += other.documents
+        for entry in other._heap:
+            self._push(entry)
+
+    def _push(self, entry):
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def value_counts(self):
+        """
+        Returns a dictionary path tuple -> list of (value, estimated number of
+        documents with the value), most frequent first. Null or missing values and values
+        that are not scalars are left out.
+        """
+        rows = [entry[2] for entry in sorted(self._heap, reverse=True)]
+        counts = {}
+        for j, path in enumerate(self.paths):
+            # count_key -> [value, number of sampled documents]
+            path_counts = {}
+            for row in rows:
+                value = row[j]
+                if value is None or isinstance(value, (list, dict)):
+                    continue
+                path_counts.setdefault(count_key(value), [value, 0])[1] += 1
+            if len(path_counts) > 0:
+                counts[tuple(path)] = sorted(
+                    (
+                        (value, max(1, round(c * self.documents / len(rows))))
+                        for value, c in path_counts.values()
+                    ),
+                    key=lambda x: -x[1],
+                )
+        return counts
+
+    def to_dict(self):
+        entries = sorted(self._heap, reverse=True)
+        return {
+            "paths": self.paths,
+            "size": self.size,
+            "documents": self.documents,
+            "keys": [-entry[0] for entry in entries],
+            "indices": [-entry[1] for entry in entries],
+            "rows": [entry[2] for entry in entries],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sample = cls(d["paths"], d["size"])
+        sample.documents = d["documents"]
+        sample._heap = [
+            (-key, -index, row)
+            for key, index, row in zip(d["keys"], d["indices"], d["rows"])
+        ]
+        heapq.heapify(sample._heap)
+        return sample
+
+    def write(self, path):
+        with open(path + ".tmp", "w", encoding="utf8") as sample_file:
+            json.dump(self.to_dict(), sample_file)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, encoding="utf8") as sample_file:
+            return cls.from_dict(json.load(sample_file))
+
+
+def count_key(value):
+    """
+    Key of a value in the counts, so booleans are not counted as the numbers 0
+    and 1
+    """
+    return isinstance(value, bool), value
+
+
+def count_range(data_path, value_counts, start, end, batch_size):
+    counts = {
+        path: {count_key(value): 0 for value, _ in values}
+        for path, values in value_counts.items()
+    }
+    for batch in iter_line_batches(data_path, start, end, batch_size):
+        for line in batch:
+            document = json.loads(line)
+            for path, path_counts in counts.items():
+                value = get_value(document, path)
+                if value is None or isinstance(value, (list, dict)):
+                    continue
+                key = count_key(value)
+                if key in path_counts:
+                    path_counts[key] += 1
+    return counts
+
+
+def _count_range_worker(args):
+    return count_range(*args)
+
+
+def count_values(
+    data_path, value_counts, num_proc=1, batch_size=DEFAULT_COUNT_BATCH_SIZE
+):
+    """
+    Returns the value counts (see ValueSample.value_counts) with the exact number
+    of documents of the data that have each value, most frequent first
+
+    Args:
+        data_path: The generated JSONL data the values were sampled from
+        num_proc: Number of processes counting parts of the data
+    """
+    jobs = [
+        (data_path, value_counts, start, end, batch_size)
+        for start, end in byte_ranges(data_path, num_proc)
+    ]
+    if num_proc == 1:
+        partial = [_count_range_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(num_proc) as pool:
+            partial = pool.map(_count_range_worker, jobs)
+    exact = {}
+    for path, values in value_counts.items():
+        counted = [
+            (value, sum(counts[path][count_key(value)] for counts in partial))
+            for value, _ in values
+        ]
+        counted = [(value, c) for value, c in counted if c > 0]
+        if len(counted) > 0:
+            exact[path] = sorted(counted, key=lambda x: -x[1])
+    return exact
@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+import time
+
+
+class BackgroundWriter:
+    """
+    Writes buffers of serialized documents on a dedicated thread.
+
+    The generating worker fills one buffer while the writer thread writes the
+    previous one (double buffering), so faking and disk I/O overlap. The queue
+    between the two is bounded, so at most `depth` filled buffers wait for the
+    writer and memory stays bounded.
+
+    Stall times are measured on both sides:
+        generator_stall_seconds: time the worker was blocked handing over a buffer
+            because the writer was still busy (the run is I/O bound)
+        writer_idle_seconds: time the writer waited for the next buffer because
+            the worker was still faking (the run is CPU bound)
+    """
+
+    _SENTINEL = object()
+
+    def __init__(self, file, depth=1, sync=False, cpus=None):
+        """
+        Args:
+            file: File object opened for writing in binary mode
+            depth: Number of filled buffers that may wait for the writer
+            sync: fsync the file after each buffer with a callback, so the
+                buffer is durable before its callback runs
+            cpus: Cores the writer thread runs on, by default those of the
+                thread that creates the writer
+        """
+        self._file = file
+        self._sync = sync
+        self._cpus = cpus
+        self._queue = queue.Queue(maxsize=depth)
+        self._error = None
+        self.generator_stall_seconds = 0.0
+        self.writer_idle_seconds = 0.0
+        self.write_seconds = 0.0
+        self.bytes_written = 0
+        self.buffers_written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, buffer, on_written=None):
+        """
+        Hands a buffer (list of strings) over to the writer thread. Blocks while
+        the queue is full.
+
+        Args:
+            buffer: List of strings
+            on_written: Called on the writer thread with the file offset after the
+                buffer was written
+        """
+        if self._error is not None:
+            raise self._error
+        start = time.perf_counter()
+        self._queue.put((buffer, on_written))
+        self.generator_stall_seconds += time.perf_counter() - start
+
+    def close(self):
+        """
+        Waits until all buffers are written. Re-raises errors of the writer thread.
+        """
+        self._queue.put(self._SENTINEL)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def metrics(self):
+        return {
+            "buffers_written": self.buffers_written,
+            "bytes_written": self.bytes_written,
+            "write_seconds": self.write_seconds,
+            "generator_stall_seconds": self.generator_stall_seconds,
+            "writer_idle_seconds": self.writer_idle_seconds,
+            "bound": "io"
+            if self.generator_stall_seconds > self.writer_idle_seconds
+            else "cpu",
+        }
+
+    def _run(self):
+        if self._cpus is not None:
+            try:
+                os.sched_setaffinity(0, self._cpus)
+            except OSError as e:
+                self._error = e
+        while True:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.writer_idle_seconds += time.perf_counter() - start
+            if item is self._SENTINEL:
+                break
+            buffer, on_written = item
+            if self._error is not None:
+                continue  # drain the queue so the worker does not block forever
+            try:
+                start = time.perf_counter()
+                data = "".join(buffer).encode("utf8")
+                self._file.write(data)
+                if self._sync and on_written is not None:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self.write_seconds += time.perf_counter() - start
+                self.bytes_written += len(data)
+                self.buffers_written += 1
+                if on_written is not None:
+                    on_written(self._file.tell())
+            except Exception as e:
+                self._error = e
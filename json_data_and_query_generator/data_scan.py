@@ -0,0 +1,94 @@
+"""
+Access to generated JSONL data.
+
+Streaming scans split the file into byte ranges so processes can scan the parts of
+a file in parallel. A line belongs to the range it starts in.
+
+Random access goes through the offset index the data generator writes next to the
+data (see offset_index): DocumentReader fetches document number i or a uniform
+sample of the documents without reading the rest of the file.
+"""
+import json
+import os
+
+import numpy as np
+
+from json_data_and_query_generator.offset_index import IndexedRecordReader
+
+# Offset index of the data in the workbook, the data directory only holds json files
+DATA_INDEX_FILENAME = "data.idx"
+
+
+def byte_ranges(path, parts):
+    """
+    Splits the file into parts byte ranges (start, end) of about equal size
+    """
+    size = os.path.getsize(path)
+    return [(size * i // parts, size * (i + 1) // parts) for i in range(parts)]
+
+
+def iter_lines(path, start, end):
+    """
+    Yields the (offset, line) of the lines (bytes, with line break) starting in the
+    byte range start..end-1
+    """
+    with open(path, "rb") as data_file:
+        position = start
+        if start > 0:
+            # Skip the rest of the line started in the previous range
+            data_file.seek(start - 1)
+            position = start - 1 + len(data_file.readline())
+        while position < end:
+            line = data_file.readline()
+            if len(line) == 0:
+                break
+            yield position, line
+            position += len(line)
+
+
+def iter_line_batches(path, start, end, batch_size):
+    """
+    Yields the non empty lines (bytes, with line break) starting in the byte range
+    start..end-1 in batches of batch_size lines
+    """
+    batch = []
+    for _, line in iter_lines(path, start, end):
+        if line.strip():
+            batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+class DocumentReader(IndexedRecordReader):
+    """
+    Memory mapped random access to the documents of a generated dataset, eg
+
+        with DocumentReader(data_path, os.path.join(workbook, DATA_INDEX_FILENAME)) as reader:
+            document = reader.document(42)
+            sample = reader.sample(1000, seed=1)
+    """
+
+    def document(self, i):
+        """
+        Returns the parsed document number i
+        """
+        return json.loads(self[i])
+
+    def sample_indices(self, n, seed=None):
+        """
+        Returns the numbers of n documents drawn uniformly without replacement, in
+        file order
+        """
+        if n > len(self):
+            raise ValueError("Cannot sample {} of {} documents".format(n, len(self)))
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(len(self), size=n, replace=False))
+
+    def sample(self, n, seed=None):
+        """
+        Returns n parsed documents drawn uniformly without replacement
+        """
+        return [self.document(int(i)) for i in self.sample_indices(n, seed)]
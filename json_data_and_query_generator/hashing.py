@@ -0,0 +1,18 @@
+"""
+Vectorized 64 bit hashing of the values of the generated data.
+"""
+import numpy as np
+
+# Constants of the splitmix64 finalizer
+MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+
+def mix64(x):
+    """
+    splitmix64 finalizer of an uint64 array
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * MIX_MULTIPLIERS[0]
+    x = x ^ (x >> np.uint64(27))
+    x = x * MIX_MULTIPLIERS[1]
+    return x ^ (x >> np.uint64(31))
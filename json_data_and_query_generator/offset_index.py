@@ -0,0 +1,177 @@
+"""
+Sidecar index of the byte offsets of the records in a file.
+
+The index is a flat array of little endian uint64 values: the offset of each record
+followed by the size of the file, so record i spans offsets[i]..offsets[i+1]. It can
+be memory mapped with numpy and gives O(1) access to any record.
+"""
+import array
+import mmap
+import os
+import sys
+
+import numpy as np
+
+INDEX_SUFFIX = ".idx"
+INDEX_DTYPE = np.dtype("<u8")
+
+
+class OffsetIndexWriter:
+    """
+    Appends record offsets to an index file while the records are written
+    """
+
+    def __init__(self, index_path, buffer_size=65536):
+        self._file = open(index_path, "wb")
+        self._buffer = array.array("Q")
+        self._buffer_size = buffer_size
+
+    def add(self, offset):
+        self._buffer.append(offset)
+        if len(self._buffer) >= self._buffer_size:
+            self._flush()
+
+    def extend(self, offsets):
+        self._buffer.extend(offsets)
+        if len(self._buffer) >= self._buffer_size:
+            self._flush()
+
+    def extend_array(self, offsets, shift=0, block_size=1 << 20):
+        """
+        Appends a numpy array of offsets, each plus shift. The offsets are written
+        in blocks of block_size without converting them to Python integers, so
+        memory mapped arrays of any size can be appended.
+        """
+        self._flush()
+        for start in range(0, len(offsets), block_size):
+            block = np.asarray(offsets[start : start + block_size], dtype=INDEX_DTYPE)
+            if shift:
+                block = block + np.uint64(shift)
+            block.astype(INDEX_DTYPE, copy=False).tofile(self._file)
+
+    def close(self, end_offset):
+        """
+        Args:
+            end_offset: Size of the indexed file
+        """
+        self._buffer.append(end_offset)
+        self._flush()
+        self._file.close()
+
+    def _flush(self):
+        if sys.byteorder != "little":
+            self._buffer.byteswap()
+        self._buffer.tofile(self._file)
+        self._buffer = array.array("Q")
+
+
+def iter_line_offsets(path, end=None, block_size=1 << 24):
+    """
+    Yields the offsets of the lines starting before end (defaults to the size of
+    the file) as numpy arrays, one per block of block_size bytes scanned
+    """
+    if end is None:
+        end = os.path.getsize(path)
+    if end > 0:
+        yield np.zeros(1, dtype=INDEX_DTYPE)
+    with open(path, "rb") as f:
+        position = 0
+        while position < end:
+            block = np.frombuffer(
+                f.read(min(block_size, end - position)), dtype=np.uint8
+            )
+            if len(block) == 0:
+                break
+            offsets = (np.flatnonzero(block == ord("\n")) + position + 1).astype(
+                INDEX_DTYPE
+            )
+            position += len(block)
+            yield offsets[offsets < end]
+
+
+def line_offsets(path, end=None, block_size=1 << 24):
+    """
+    Returns the offsets of the lines starting before end (defaults to the size of
+    the file) by scanning the file, for files written without an index
+    """
+    return np.concatenate(
+        [np.zeros(0, dtype=INDEX_DTYPE)]
+        + list(iter_line_offsets(path, end, block_size))
+    )
+
+
+def build_index(path, index_path):
+    """
+    Writes the index of the lines of a file
+    """
+    index = OffsetIndexWriter(index_path)
+    for offsets in iter_line_offsets(path):
+        index.extend_array(offsets)
+    index.close(os.path.getsize(path))
+
+
+def concat_indexes(index_paths, output_index_path):
+    """
+    Writes the index of the concatenation of the indexed files
+    """
+    index = OffsetIndexWriter(output_index_path)
+    offset = 0
+    for index_path in index_paths:
+        offsets = read_offsets(index_path)
+        index.extend_array(offsets[:-1], offset)
+        offset += int(offsets[-1])
+        del offsets
+    index.close(offset)
+
+
+def read_offsets(index_path):
+    """
+    Returns the memory mapped offsets of an index file
+    """
+    return np.memmap(index_path, dtype=INDEX_DTYPE, mode="r")
+
+
+class IndexedRecordReader:
+    """
+    Random access to the records of a file through its offset index
+    """
+
+    def __init__(self, path, index_path=None):
+        """
+        Args:
+            path: Path of the indexed file
+            index_path: Path of the index, defaults to path + ".idx"
+        """
+        self._offsets = read_offsets(
+            index_path if index_path is not None else path + INDEX_SUFFIX
+        )
+        if len(self._offsets) == 0 or self._offsets[-1] != os.path.getsize(path):
+            raise RuntimeError("Index does not match {}".format(path))
+        self._file = open(path, "rb")
+        self._mmap = None
+        if self._offsets[-1] > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        """
+        Returns the bytes of record i
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("record {} out of range".format(i))
+        return self._mmap[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,302 @@
+"""
+Content addressed cache of generated datasets.
+
+A dataset is fully determined by the schema config, the seed, the number of
+documents, the chunk size, the size of the value sample, the output format, the
+data format version and the generator version. The hash of these is the key of a
+cache entry, which holds the generated data, its offset index, schema.txt, the
+value sample and the manifest of the workbook. On a hit the files are reflinked
+(or hard linked) into the workbook instead of being generated again.
+
+Usage:
+    python -m json_data_and_query_generator cache ls
+    python -m json_data_and_query_generator cache prune --max-size 10G
+"""
+import argparse
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import json_data_and_query_generator
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "json_data_and_query_generator",
+)
+DEFAULT_MAX_SIZE = "20G"
+
+OUTPUT_FORMAT = "jsonl"
+# Version of the generated data of a config. Bump it with every change that
+# makes the same config generate different data, so older cache entries miss.
+DATA_FORMAT_VERSION = 7
+
+DATA_FILENAME = "data.json"
+SCHEMA_FILENAME = "schema.txt"
+MANIFEST_FILENAME = "dataset.json"
+VALUE_SAMPLE_FILENAME = "values.json"
+DATA_INDEX_FILENAME = "data.idx"
+ENTRY_FILENAME = "entry.json"
+
+# ioctl request to share the extents of a file with another file (Linux, btrfs/xfs)
+FICLONE = 0x40049409
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def dataset_key(schema_config, seed, num_samples, chunk_size, value_sample_size):
+    """
+    Returns the cache key of a dataset
+    """
+    description = {
+        "schema_config": schema_config,
+        "seed": seed,
+        "numSamples": int(num_samples),
+        "chunk_size": int(chunk_size),
+        "value_sample_size": int(value_sample_size),
+        "output_format": OUTPUT_FORMAT,
+        "data_format_version": DATA_FORMAT_VERSION,
+        "version": json_data_and_query_generator.__version__,
+    }
+    normalized = json.dumps(description, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode("utf8")).hexdigest()
+
+
+def parse_size(size):
+    """
+    Parses a size like "512M" or "20G" into bytes
+    """
+    size = str(size).strip().upper().rstrip("B")
+    unit = size[-1:] if size[-1:] in SIZE_UNITS else ""
+    number = size[: len(size) - len(unit)]
+    try:
+        return int(float(number) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError("Invalid size {}".format(size))
+
+
+def format_size(num_bytes):
+    for unit in ["", "K", "M", "G"]:
+        if num_bytes < 1024:
+            return "{:.1f}{}".format(num_bytes, unit)
+        num_bytes /= 1024.0
+    return "{:.1f}T".format(num_bytes)
+
+
+def link_file(src, dst):
+    """
+    Makes the content of src available at dst without copying if possible:
+    reflink (copy on write), else hard link, else a plain copy.
+
+    Returns the method used.
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        return "reflink"
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class DatasetCache:
+    """
+    Directory with one sub directory per cached dataset, named by its key
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self._cache_dir = os.path.abspath(cache_dir)
+
+    def _entry_dir(self, key):
+        return os.path.join(self._cache_dir, key)
+
+    def lookup(self, key):
+        """
+        Returns the directory of the entry or None. A hit marks the entry as used.
+        """
+        entry_dir = self._entry_dir(key)
+        if not os.path.exists(os.path.join(entry_dir, ENTRY_FILENAME)):
+            return None
+        os.utime(os.path.join(entry_dir, ENTRY_FILENAME))
+        return entry_dir
+
+    def restore(self, key, data_filepath, workbook_dir):
+        """
+        Links the cached files of the entry into the workbook
+        """
+        entry_dir = self._entry_dir(key)
+        method = link_file(os.path.join(entry_dir, DATA_FILENAME), data_filepath)
+        shutil.copyfile(
+            os.path.join(entry_dir, SCHEMA_FILENAME),
+            os.path.join(workbook_dir, SCHEMA_FILENAME),
+        )
+        shutil.copyfile(
+            os.path.join(entry_dir, MANIFEST_FILENAME),
+            os.path.join(workbook_dir, MANIFEST_FILENAME),
+        )
+        for filename in [VALUE_SAMPLE_FILENAME, DATA_INDEX_FILENAME]:
+            if os.path.exists(os.path.join(entry_dir, filename)):
+                shutil.copyfile(
+                    os.path.join(entry_dir, filename),
+                    os.path.join(workbook_dir, filename),
+                )
+        print("Restored dataset {} from cache ({})".format(key[:12], method))
+
+    def store(self, key, data_filepath, workbook_dir, description=None):
+        """
+        Adds the generated files of the workbook to the cache
+        """
+        entry_dir = self._entry_dir(key)
+        temp_dir = entry_dir + ".tmp{}".format(os.getpid())
+        os.makedirs(temp_dir)
+        try:
+            link_file(data_filepath, os.path.join(temp_dir, DATA_FILENAME))
+            for filename in [
+                SCHEMA_FILENAME,
+                MANIFEST_FILENAME,
+                VALUE_SAMPLE_FILENAME,
+                DATA_INDEX_FILENAME,
+            ]:
+                if not os.path.exists(os.path.join(workbook_dir, filename)):
+                    continue
+                shutil.copyfile(
+                    os.path.join(workbook_dir, filename),
+                    os.path.join(temp_dir, filename),
+                )
+            entry = {
+                "key": key,
+                "created": time.time(),
+                "size": os.path.getsize(data_filepath),
+                "description": description,
+            }
+            with open(os.path.join(temp_dir, ENTRY_FILENAME), "w") as entry_file:
+                json.dump(entry, entry_file, indent=4)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(temp_dir, entry_dir)
+        finally:
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+        print("Stored dataset {} in cache {}".format(key[:12], self._cache_dir))
+
+    def entries(self):
+        """
+        Returns the entries, least recently used first
+        """
+        if not os.path.exists(self._cache_dir):
+            return []
+        entries = []
+        for key in os.listdir(self._cache_dir):
+            entry_path = os.path.join(self._entry_dir(key), ENTRY_FILENAME)
+            if not os.path.exists(entry_path):
+                continue
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+            entry["last_used"] = os.path.getmtime(entry_path)
+            entry["size"] = sum(
+                os.path.getsize(os.path.join(self._entry_dir(key), f))
+                for f in os.listdir(self._entry_dir(key))
+            )
+            entries.append(entry)
+        return sorted(entries, key=lambda e: e["last_used"])
+
+    def prune(self, max_size):
+        """
+        Evicts least recently used entries until the cache is not larger than
+        max_size bytes. Returns the evicted entries.
+        """
+        entries = self.entries()
+        total = sum(e["size"] for e in entries)
+        evicted = []
+        for entry in entries:
+            if total <= max_size:
+                break
+            shutil.rmtree(self._entry_dir(entry["key"]))
+            total -= entry["size"]
+            evicted.append(entry)
+        return evicted
+
+
+def getArgParser():
+    parser = argparse.ArgumentParser(
+        prog="json_data_and_query_generator cache",
+        description="Inspect and prune the dataset cache",
+    )
+    cache_dir_help = 'Cache directory. Defaults to "{}"'.format(DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--cache-dir",
+        help=cache_dir_help,
+        default=DEFAULT_CACHE_DIR,
+    )
+    # The commands accept --cache-dir as well, without overriding the one given
+    # before the command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--cache-dir", help=cache_dir_help, default=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "ls",
+        parents=[common],
+        help="List cached datasets, least recently used first",
+    )
+    prune = commands.add_parser(
+        "prune",
+        parents=[common],
+        help="Evict least recently used datasets down to a size",
+    )
+    prune.add_argument(
+        "--max-size",
+        help="Size the cache is pruned to, eg 500M. Defaults to {}".format(
+            DEFAULT_MAX_SIZE
+        ),
+        default=DEFAULT_MAX_SIZE,
+    )
+    prune.add_argument(
+        "--all", help="Evict all datasets", default=False, action="store_true"
+    )
+    return parser
+
+
+def main(arguments):
+    args = getArgParser().parse_args(arguments)
+    cache = DatasetCache(args.cache_dir)
+
+    if args.command == "ls":
+        entries = cache.entries()
+        for entry in entries:
+            description = entry["description"] or {}
+            print(
+                "{}  {:>8}  {}  seed={} numSamples={}".format(
+                    entry["key"][:12],
+                    format_size(entry["size"]),
+                    time.strftime(
+                        "%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"])
+                    ),
+                    description.get("seed"),
+                    description.get("numSamples"),
+                )
+            )
+        print(
+            "{} datasets, {}".format(
+                len(entries), format_size(sum(e["size"] for e in entries))
+            )
+        )
+
+    elif args.command == "prune":
+        max_size = 0 if args.all else parse_size(args.max_size)
+        for entry in cache.prune(max_size):
+            print(
+                "Evicted {} ({})".format(entry["key"][:12], format_size(entry["size"]))
+            )
@@ -0,0 +1,341 @@
+"""
+External merge sort of generated data, to cluster the documents by the values of
+one or more paths or to put them in random order.
+
+The documents are split into runs along the offset index of the data (see
+offset_index). A run holds the documents and sort keys that fit into memory /
+num_proc bytes of Python objects, as measured on a sample of the documents. Processes sort the runs in parallel
+and write them to run files, each line prefixed with its sort key. The runs are
+then merged, at most MERGE_FAN_IN at a time, into the sorted data and its new
+offset index. Only the runs being sorted and one line per merged run are held in
+memory.
+
+Documents are ordered by the values of the paths, then by their number in the
+data, so the order does not depend on the number of processes or the memory.
+Values of different types are ordered missing < null < boolean < number <
+string < object/array. The random order is a keyed permutation of the document
+numbers given by the seed.
+
+Usage:
+    python -m json_data_and_query_generator sort --data <workbook>/data/mycol.json --index <workbook>/data.idx --by c0.a1 b0 --num-proc 8
+    python -m json_data_and_query_generator sort --data <workbook>/data/mycol.json --index <workbook>/data.idx --by random --seed 1
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from json_data_and_query_generator.data_scan import DATA_INDEX_FILENAME
+from json_data_and_query_generator.hashing import mix64
+from json_data_and_query_generator.offset_index import (
+    OffsetIndexWriter,
+    build_index,
+    read_offsets,
+)
+from json_data_and_query_generator.pipeline.cache import parse_size
+
+RANDOM_ORDER = "random"
+DEFAULT_SORT_MEMORY = "1G"
+# Number of runs merged at once, more runs are merged in several passes
+MERGE_FAN_IN = 64
+# Number of documents whose size in memory is measured to size the runs
+MEMORY_SAMPLE_SIZE = 1000
+
+# Rank of the JSON types in the order
+_MISSING, _NULL, _BOOLEAN, _NUMBER, _STRING, _OTHER = range(6)
+
+
+def parse_order(order_by):
+    """
+    Returns the paths (lists of keys) to order by, or None for the random order
+
+    Args:
+        order_by: List of paths like "c0.a1", or ["random"]
+    """
+    if list(order_by) == [RANDOM_ORDER]:
+        return None
+    if len(order_by) == 0:
+        raise ValueError("No paths to order by")
+    paths = []
+    for path in order_by:
+        if "[" in path:
+            raise ValueError("Cannot order by path {} in an array".format(path))
+        paths.append(path.split("."))
+    return paths
+
+
+def value_key(document, path):
+    """
+    Returns the sort key [type rank, value] of the value of a path
+    """
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return [_MISSING, 0]
+        document = document[key]
+    if document is None:
+        return [_NULL, 0]
+    if isinstance(document, bool):
+        return [_BOOLEAN, document]
+    if isinstance(document, (int, float)):
+        return [_NUMBER, document]
+    if isinstance(document, str):
+        return [_STRING, document]
+    return [_OTHER, json.dumps(document, sort_keys=True)]
+
+
+def random_keys(seed, numbers):
+    """
+    Returns the keys of the random order of the document numbers
+    """
+    key = np.random.SeedSequence(seed).generate_state(1, dtype=np.uint64)[0]
+    return mix64(np.asarray(numbers, dtype=np.uint64) ^ key).tolist()
+
+
+def run_keys(lines, numbers, paths, seed):
+    """
+    Returns the sort keys of document lines with the given document numbers
+    """
+    if paths is None:
+        return [[k, number] for k, number in zip(random_keys(seed, numbers), numbers)]
+    keys = []
+    for number, line in zip(numbers, lines):
+        document = json.loads(line)
+        keys.append([value_key(document, path) for path in paths] + [number])
+    return keys
+
+
+def object_size(obj):
+    """
+    Returns the size in memory of a sort key or line with the objects it holds
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, list):
+        size += sum(object_size(x) for x in obj)
+    return size
+
+
+def memory_per_byte(data_path, offsets, paths, seed, sample_size=MEMORY_SAMPLE_SIZE):
+    """
+    Returns the memory a run takes per byte of data: its lines, their sort keys
+    and the references to them, measured on documents spread over the data
+    """
+    num_documents = len(offsets) - 1
+    numbers = np.unique(
+        np.linspace(0, num_documents - 1, min(sample_size, num_documents)).astype(
+            np.int64
+        )
+    ).tolist()
+    lines = []
+    with open(data_path, "rb") as data_file:
+        for number in numbers:
+            data_file.seek(int(offsets[number]))
+            lines.append(data_file.read(int(offsets[number + 1] - offsets[number])))
+    keys = run_keys(lines, numbers, paths, seed)
+    data_bytes = sum(len(line) for line in lines)
+    # The data of the run, and per document its line, its key and the
+    # references of the lists of lines, keys and order
+    memory = data_bytes + sum(
+        object_size(line) + object_size(key) + 3 * 8 for line, key in zip(lines, keys)
+    )
+    return memory / max(1, data_bytes)
+
+
+def sort_run(data_path, index_path, first, stop, paths, seed, run_path):
+    """
+    Sorts the documents first..stop-1 into a run file of lines 'key<TAB>document'
+    """
+    offsets = read_offsets(index_path)
+    with open(data_path, "rb") as data_file:
+        data_file.seek(int(offsets[first]))
+        data = data_file.read(int(offsets[stop]) - int(offsets[first]))
+    starts = (offsets[first : stop + 1] - offsets[first]).tolist()
+    del offsets
+    lines = [data[starts[i] : starts[i + 1]] for i in range(stop - first)]
+    keys = run_keys(lines, range(first, stop), paths, seed)
+    order = sorted(range(len(lines)), key=keys.__getitem__)
+    with open(run_path, "wb") as run_file:
+        for i in order:
+            run_file.write(json.dumps(keys[i]).encode("utf8") + b"\t")
+            run_file.write(lines[i])
+    return run_path
+
+
+def _sort_run_worker(args):
+    return sort_run(*args)
+
+
+def read_run(run_path):
+    """
+    Yields the (key, document line) of a run file
+    """
+    with open(run_path, "rb") as run_file:
+        for record in run_file:
+            key, _, line = record.partition(b"\t")
+            yield json.loads(key), line
+
+
+def merge_runs(run_paths, output_path, index=None):
+    """
+    Merges sorted run files. Writes a run file, or the documents alone and their
+    offsets to index if an OffsetIndexWriter is given.
+    """
+    offset = 0
+    with open(output_path, "wb") as output_file:
+        for key, line in heapq.merge(*[read_run(path) for path in run_paths]):
+            if index is None:
+                output_file.write(json.dumps(key).encode("utf8") + b"\t")
+            else:
+                index.add(offset)
+                offset += len(line)
+            output_file.write(line)
+    if index is not None:
+        index.close(offset)
+
+
+def run_ranges(offsets, run_bytes):
+    """
+    Splits the documents into runs (first, stop) of about run_bytes bytes each
+    """
+    num_documents = len(offsets) - 1
+    bounds = np.searchsorted(
+        offsets[:-1], np.arange(0, int(offsets[-1]), max(1, run_bytes), dtype=np.uint64)
+    ).tolist()
+    bounds = sorted(set(bounds + [num_documents]))
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+def sort_data(
+    data_path,
+    index_path,
+    order_by,
+    temp_dir,
+    seed=0,
+    num_proc=1,
+    memory=DEFAULT_SORT_MEMORY,
+):
+    """
+    Sorts the documents of a JSONL file in place and rewrites its offset index
+
+    Args:
+        order_by: Paths to order by, or ["random"] (see parse_order)
+        temp_dir: Directory of the run files, on the file system of the data
+        memory: Memory for the documents being sorted, eg "512M"
+    """
+    paths = parse_order(order_by)
+    if num_proc < 1:
+        raise ValueError("Number of processes must be positive")
+    if not os.path.exists(index_path):
+        build_index(data_path, index_path)
+    offsets = read_offsets(index_path)
+    runs = []
+    if len(offsets) > 1:
+        run_bytes = parse_size(memory) / num_proc
+        run_bytes /= memory_per_byte(data_path, offsets, paths, seed)
+        runs = run_ranges(offsets, int(run_bytes))
+    del offsets
+    os.makedirs(temp_dir, exist_ok=True)
+    try:
+        jobs = [
+            (
+                data_path,
+                index_path,
+                first,
+                stop,
+                paths,
+                seed,
+                os.path.join(temp_dir, "run{}".format(i)),
+            )
+            for i, (first, stop) in enumerate(runs)
+        ]
+        if num_proc == 1:
+            run_paths = [_sort_run_worker(job) for job in jobs]
+        else:
+            with multiprocessing.Pool(num_proc) as pool:
+                run_paths = pool.map(_sort_run_worker, jobs)
+
+        merge_pass = 0
+        while len(run_paths) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(run_paths), MERGE_FAN_IN):
+                merged_path = os.path.join(
+                    temp_dir, "merge{}_{}".format(merge_pass, len(merged))
+                )
+                merge_runs(run_paths[i : i + MERGE_FAN_IN], merged_path)
+                for path in run_paths[i : i + MERGE_FAN_IN]:
+                    os.remove(path)
+                merged.append(merged_path)
+            run_paths = merged
+            merge_pass += 1
+
+        sorted_path = os.path.join(temp_dir, "sorted.json")
+        merge_runs(run_paths, sorted_path, OffsetIndexWriter(sorted_path + ".idx"))
+        os.replace(sorted_path, data_path)
+        os.replace(sorted_path + ".idx", index_path)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def getArgParser():
+    parser = argparse.ArgumentParser(
+        prog="json_data_and_query_generator sort",
+        description="Sort generated data by the values of paths or put it in random order",
+    )
+    parser.add_argument(
+        "--data", help="Path to the generated JSONL data", required=True
+    )
+    parser.add_argument(
+        "--index",
+        help="Path to the offset index of the data, built if missing. Defaults to {} of the workbook of the data".format(
+            DATA_INDEX_FILENAME
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--by",
+        help='Paths to order by, eg "c0.a1 b0", or "{}"'.format(RANDOM_ORDER),
+        nargs="+",
+        required=True,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed of the random order. Defaults to 0",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--num-proc",
+        help="Number of processes sorting runs. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--memory",
+        help="Memory for the documents being sorted, eg 512M. Defaults to {}".format(
+            DEFAULT_SORT_MEMORY
+        ),
+        default=DEFAULT_SORT_MEMORY,
+    )
+    return parser
+
+
+def main(arguments):
+    args = getArgParser().parse_args(arguments)
+    data_path = os.path.abspath(args.data)
+    sort_data(
+        data_path,
+        args.index
+        if args.index is not None
+        else os.path.join(
+            os.path.dirname(os.path.dirname(data_path)), DATA_INDEX_FILENAME
+        ),
+        args.by,
+        data_path + ".sort",
+        args.seed,
+        args.num_proc,
+        args.memory,
+    )
@@ -7,16 +7,77 @@ import os
 from datetime import datetime
 import argparse
 from json_data_and_query_generator.query_generator.query_generator import (
+    ProgressReporter,
     SchemaBasedGenerator,
-    StandaloneGenerator,
+    generate_schema_based_queries,
+    load_schema,
+)
+from json_data_and_query_generator.query_generator.query_writer import (
+    QUERY_FILE_EXTENSIONS,
+    QUERY_OUTPUT_FORMATS,
+    create_query_writer,
+    merge_query_shards,
+    shard_name,
+)
+from json_data_and_query_generator.query_generator.evaluator import (
+    evaluate_queries,
+    read_queries,
+    write_results,
+    main as evaluate_main,
 )
 from json_data_and_query_generator.data_generators.faker_generator.json_gen import (
+    DEFAULT_CHECKPOINT_INTERVAL,
     DataGenerator,
+    METRICS_SUFFIX,
+)
+from json_data_and_query_generator.data_generators.faker_generator.value_sample import (
+    DEFAULT_VALUE_SAMPLE_SIZE,
+    VALUE_SAMPLE_FILENAME,
+    VALUE_SAMPLE_SUFFIX,
+    ValueSample,
+    count_values,
+)
+from json_data_and_query_generator.pipeline.cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_MAX_SIZE,
+    DatasetCache,
+    dataset_key,
+    parse_size,
+    main as cache_main,
+)
+from json_data_and_query_generator.pipeline.profiler import main as profile_main
+from json_data_and_query_generator.pipeline.validator import (
+    validate_dataset,
+    workbook_data_path,
+    main as validate_main,
+)
+from json_data_and_query_generator.pipeline.external_sort import (
+    DEFAULT_SORT_MEMORY,
+    RANDOM_ORDER,
+    sort_data,
+    main as sort_main,
+)
+from json_data_and_query_generator.data_scan import DATA_INDEX_FILENAME
+from json_data_and_query_generator.offset_index import (
+    INDEX_SUFFIX,
+    build_index,
+    concat_indexes,
+)
+from json_data_and_query_generator.pipeline.placement import (
+    PLACEMENT_POLICIES,
+    plan_placement,
+    run_pinned,
 )
 import json
 import tempfile
 import shutil
 
+# Describes how the data of a workbook was generated, see runDataGenerator
+MANIFEST_FILENAME = "dataset.json"
+# Expected results of the queries, see runQueryEvaluator
+EXPECTED_RESULTS_FILENAME = "expected.jsonl"
+VALIDATION_FILENAME = "validation.json"
+
 
 def stopwatch(name, fct, argList):
     start = datetime.now()
@@ -32,12 +93,18 @@ def stopwatch(name, fct, argList):
     print("took %s" % (stop - start))
 
 
-def setup_output_dirs(workbook, output_dir, overwrite):
+def setup_output_dirs(workbook, output_dir, overwrite, existing=False):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     workbook_dir = os.path.join(output_dir, workbook)
     queries_dir = os.path.join(workbook_dir, "queries")
     data_dir = os.path.join(workbook_dir, "data")
+    if existing:
+        if overwrite:
+            raise RuntimeError("Cannot overwrite a workbook that is continued")
+        if not os.path.exists(workbook_dir):
+            raise RuntimeError("Workbook " + workbook + " does not exist!")
+        return data_dir, queries_dir
     if os.path.exists(workbook_dir) and overwrite:
         shutil.rmtree(workbook_dir)
     if os.path.exists(workbook_dir):
@@ -90,18 +157,157 @@ def printSummary(args):
     print()
 
 
+def read_manifest(workbook_dir):
+    """
+    Returns the manifest of the data in the workbook or None if there is none
+    """
+    manifest_path = os.path.join(workbook_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_manifest(workbook_dir, manifest):
+    """
+    Atomically replaces the manifest of the data in the workbook
+    """
+    manifest_path = os.path.join(workbook_dir, MANIFEST_FILENAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
 def runDataGenerator(args, data_dir):
-    DG = DataGenerator(data_dir, os.path.abspath(args.schema_config))
-    schema = DG.generate_schema()
+    workbook_dir = os.path.dirname(data_dir)
+    checkpoint_dir = os.path.join(workbook_dir, "checkpoint")
+
+    if args.resume and args.grow_to is not None:
+        raise RuntimeError("Cannot specify resume and grow-to together")
+
+    manifest = None
+    if args.resume or args.grow_to is not None:
+        manifest = read_manifest(workbook_dir)
+        if manifest is None:
+            raise RuntimeError(
+                "Workbook {} has no data generation to continue".format(args.workbook)
+            )
+        if args.grow_to is not None and not manifest["complete"]:
+            raise RuntimeError(
+                "Data of workbook {} is incomplete, finish it with --resume first".format(
+                    args.workbook
+                )
+            )
+        if args.resume and manifest["complete"]:
+            print("Data of workbook {} is complete".format(args.workbook))
+            return
+        # The existing data decides how the data is split and seeded
+        args.num_proc = manifest["num_proc"]
+        args.chunk_size = manifest["chunk_size"]
+        args.seed = manifest["seed"]
+        args.value_sample_size = manifest.get("value_sample_size", 0)
+
+    DG = DataGenerator(
+        data_dir,
+        os.path.abspath(args.schema_config),
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        value_sample_size=args.value_sample_size,
+        checkpoint_interval=args.checkpoint_interval,
+    )
+    final_filepath = os.path.join(data_dir, "{}.json".format(args.collection_name))
+    index_filepath = os.path.join(workbook_dir, DATA_INDEX_FILENAME)
+
+    cache, cache_key = None, None
+    if args.cache and manifest is None:
+        if args.seed is None:
+            raise RuntimeError("Caching datasets requires a --seed")
+        cache = DatasetCache(args.cache_dir)
+        cache_key = dataset_key(
+            DG.configDict,
+            DG.SEED,
+            DG.NUM_SAMPLES,
+            DG.CHUNK_SIZE,
+            DG.VALUE_SAMPLE_SIZE,
+        )
+        if cache.lookup(cache_key) is not None:
+            cache.restore(cache_key, final_filepath, workbook_dir)
+            return
+
+    if manifest is None:
+        schema = DG.generate_schema()
+        manifest = {
+            "complete": False,
+            "seed": DG.SEED,
+            "chunk_size": DG.CHUNK_SIZE,
+            "value_sample_size": DG.VALUE_SAMPLE_SIZE,
+            "num_proc": int(args.num_proc),
+            "first_sample": 0,
+            "numSamples": int(DG.NUM_SAMPLES),
+            "forced_counts": [None for _ in DG.FORCED_PATHS],
+            "schema_config": DG.configDict,
+            "schema": schema,
+        }
+        write_manifest(workbook_dir, manifest)
+    else:
+        if manifest["schema_config"] != DG.configDict:
+            raise RuntimeError(
+                "Schema config {} differs from the one of the workbook data".format(
+                    args.schema_config
+                )
+            )
+        schema = manifest["schema"]
+        DG.schema = schema
+        if args.grow_to is not None:
+            print(
+                "### grow data of workbook {} from {} to {} documents".format(
+                    args.workbook, manifest["numSamples"], args.grow_to
+                )
+            )
+            manifest["complete"] = False
+            # The new documents are appended after the ordered ones
+            manifest.pop("order", None)
+            manifest["first_sample"] = manifest["numSamples"]
+            manifest["numSamples"] = args.grow_to
+            manifest["grow_forced"] = args.grow_forced
+            # Sizes of the data before growing, the data and its index are cut
+            # back to them when an interrupted growth is resumed
+            manifest["grow_from"] = {
+                "data_size": os.path.getsize(final_filepath),
+                "index_size": (
+                    os.path.getsize(index_filepath)
+                    if os.path.exists(index_filepath)
+                    else None
+                ),
+            }
+            write_manifest(workbook_dir, manifest)
+
+    # Generate the documents first_sample..numSamples-1, the ones before exist already
+    forced_counts = None
+    if manifest["first_sample"] > 0:
+        DG.NUM_SAMPLES = manifest["first_sample"]
+        forced_counts = DG.grow_to(
+            manifest["numSamples"], manifest["forced_counts"], manifest["grow_forced"]
+        )
+        # An interrupted growth may have appended to the data and the index
+        grow_from = manifest["grow_from"]
+        truncate_file(final_filepath, grow_from["data_size"])
+        if grow_from["index_size"] is None:
+            if os.path.exists(index_filepath):
+                os.remove(index_filepath)
+        else:
+            truncate_file(index_filepath, grow_from["index_size"])
 
     temp_dir = os.path.join(data_dir, "temp")
-    os.mkdir(temp_dir)
+    os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
     temp_filename = "temp%s.json"
+    checkpoint_filename = "worker%s.json"
     merged_filename = "merged.json"
-    final_filename = "{}.json".format(args.collection_name)
     temp_filepath = os.path.join(temp_dir, temp_filename % "*")
     merged_filepath = os.path.join(data_dir, merged_filename)
-    final_filepath = os.path.join(data_dir, final_filename)
 
     jobs = []
 
@@ -112,22 +318,70 @@ def runDataGenerator(args, data_dir):
             )
         )
 
+    placement = plan_placement(int(args.num_proc), args.placement)
+    if placement is not None:
+        for p in placement:
+            print(
+                "### pin data generator process {} to core {} on NUMA node {}, its writer to cores {}".format(
+                    p["worker"], p["cpu"], p["node"], p["writer_cpus"]
+                )
+            )
+
     if int(args.num_proc) == 1:
-        DG.actualGenerator(
-            args.num_proc, schema, os.path.join(temp_dir, temp_filename % 0)
+        generator_args = (
+            args.num_proc,
+            schema,
+            os.path.join(temp_dir, temp_filename % 0),
+            0,
+            os.path.join(checkpoint_dir, checkpoint_filename % 0),
         )
+        if placement is None:
+            DG.actualGenerator(*generator_args)
+        else:
+            affinity = os.sched_getaffinity(0)
+            try:
+                run_pinned(
+                    placement[0]["cpu"],
+                    DG.actualGenerator,
+                    *generator_args,
+                    placement[0]["writer_cpus"]
+                )
+            finally:
+                os.sched_setaffinity(0, affinity)
     else:
         for i in range(int(args.num_proc)):
-            p = multiprocessing.Process(
-                target=DG.actualGenerator,
-                args=(args.num_proc, schema, os.path.join(temp_dir, temp_filename % i)),
+            generator_args = (
+                args.num_proc,
+                schema,
+                os.path.join(temp_dir, temp_filename % i),
+                i,
+                os.path.join(checkpoint_dir, checkpoint_filename % i),
             )
+            if placement is None:
+                p = multiprocessing.Process(
+                    target=DG.actualGenerator, args=generator_args
+                )
+            else:
+                p = multiprocessing.Process(
+                    target=run_pinned,
+                    args=(placement[i]["cpu"], DG.actualGenerator)
+                    + generator_args
+                    + (placement[i]["writer_cpus"],),
+                )
             jobs.append(p)
             p.start()
 
         for job in jobs:
             job.join()
 
+        failed = [i for i, job in enumerate(jobs) if job.exitcode != 0]
+        if len(failed) > 0:
+            raise RuntimeError(
+                "Data generator processes {} failed, continue with --resume".format(
+                    failed
+                )
+            )
+
     # merge files
     # merge_command = "sed 1d %s > %s" % (temp_filepath, merged_filepath)
     def merge_files(file_out):
@@ -136,19 +390,217 @@ def runDataGenerator(args, data_dir):
                 with open(os.path.join(temp_dir, temp_filename % i)) as g_in:
                     fout.write(g_in.read())
 
-    stopwatch(
-        "merging parrallelly constructed files in '{}'".format(str(merge_files)),
-        merge_files,
-        [merged_filepath],
-    )
-    stopwatch(
-        "adapting to forced values",
-        DG.dataGenerator_adapt,
-        {"InFilePath": merged_filepath, "OutFilePath": final_filepath},
+    # The offset index of the data is the concatenation of the existing one and
+    # the ones of the workers
+    index_filepaths = [
+        os.path.join(temp_dir, temp_filename % i) + INDEX_SUFFIX
+        for i in range(int(args.num_proc))
+    ]
+    if forced_counts is not None:
+        if not os.path.exists(index_filepath):
+            build_index(final_filepath, index_filepath)
+        index_filepaths.insert(0, index_filepath)
+    concat_indexes(index_filepaths, index_filepath + ".tmp")
+
+    # The forced values are planted while generating, so the documents of the
+    # workers only need to be concatenated
+    if forced_counts is None:
+        stopwatch(
+            "merging parrallelly constructed files in '{}'".format(str(merge_files)),
+            merge_files,
+            [final_filepath],
+        )
+        manifest["forced_counts"] = DG.forced_counts()
+    else:
+        # The new documents are appended to the existing ones
+        stopwatch(
+            "merging parrallelly constructed files in '{}'".format(str(merge_files)),
+            merge_files,
+            [merged_filepath],
+        )
+        append_file(merged_filepath, final_filepath)
+        os.remove(merged_filepath)
+        manifest["forced_counts"] = [
+            None if planted is None else planted + new
+            for planted, new in zip(manifest["forced_counts"], forced_counts)
+        ]
+    os.replace(index_filepath + ".tmp", index_filepath)
+
+    # Sample of the values for the query generator. When growing, the sample of
+    # the existing documents is merged with the one of the new documents, unless
+    # an interrupted growth merged them already.
+    value_sample_filepath = os.path.join(workbook_dir, VALUE_SAMPLE_FILENAME)
+    value_sample = None
+    if forced_counts is not None:
+        if os.path.exists(value_sample_filepath):
+            value_sample = ValueSample.read(value_sample_filepath)
+            if value_sample.documents >= manifest["numSamples"]:
+                value_sample = None
+    else:
+        value_sample = ValueSample(DG.value_sample_paths(schema), DG.VALUE_SAMPLE_SIZE)
+    if value_sample is not None:
+        for i in range(int(args.num_proc)):
+            value_sample.merge(
+                ValueSample.read(
+                    os.path.join(temp_dir, temp_filename % i) + VALUE_SAMPLE_SUFFIX
+                )
+            )
+        value_sample.write(value_sample_filepath)
+
+    write_run_metrics(
+        workbook_dir,
+        [
+            os.path.join(temp_dir, temp_filename % i) + METRICS_SUFFIX
+            for i in range(int(args.num_proc))
+        ],
+        placement,
     )
 
+    manifest["complete"] = True
+    manifest["first_sample"] = 0
+    manifest.pop("grow_forced", None)
+    manifest.pop("grow_from", None)
+    write_manifest(workbook_dir, manifest)
+
     shutil.rmtree(temp_dir)
-    os.remove(merged_filepath)
+    shutil.rmtree(checkpoint_dir)
+
+    if cache is not None:
+        cache.store(
+            cache_key,
+            final_filepath,
+            workbook_dir,
+            {"seed": DG.SEED, "numSamples": int(DG.NUM_SAMPLES)},
+        )
+        for entry in cache.prune(parse_size(args.cache_max_size)):
+            print("Evicted dataset {} from cache".format(entry["key"][:12]))
+
+
+def runDataSort(args, data_dir):
+    """
+    Orders the documents of the workbook data by the paths of --order-by, or
+    randomly, unless they are in this order already
+    """
+    workbook_dir = os.path.dirname(data_dir)
+    manifest = read_manifest(workbook_dir)
+    if manifest.get("order") == args.order_by:
+        print("Data of workbook {} is ordered already".format(args.workbook))
+        return
+    sort_data(
+        os.path.join(data_dir, "{}.json".format(args.collection_name)),
+        os.path.join(workbook_dir, DATA_INDEX_FILENAME),
+        args.order_by,
+        os.path.join(workbook_dir, "sort"),
+        manifest["seed"],
+        int(args.num_proc),
+        args.sort_memory,
+    )
+    manifest["order"] = args.order_by
+    write_manifest(workbook_dir, manifest)
+
+
+def runDataValidation(args, data_dir):
+    """
+    Validates the workbook data against its manifest into validation.json of the
+    workbook, fails on any mismatch
+    """
+    workbook_dir = os.path.dirname(data_dir)
+    report = validate_dataset(
+        os.path.join(data_dir, "{}.json".format(args.collection_name)),
+        read_manifest(workbook_dir),
+        int(args.num_proc),
+    )
+    with open(
+        os.path.join(workbook_dir, VALIDATION_FILENAME), "w", encoding="utf8"
+    ) as report_file:
+        json.dump(report, report_file, indent=4)
+    if not report["valid"]:
+        raise RuntimeError(
+            "Data of workbook {} is invalid, {} errors:\n{}".format(
+                args.workbook, report["num_errors"], "\n".join(report["errors"])
+            )
+        )
+    print(
+        "### validated {} documents and {} forced paths".format(
+            report["documents"], len(report["forced"])
+        )
+    )
+
+
+def append_file(src, dst):
+    """
+    Appends the content of src to dst. A dst that shares its data with other files
+    (eg with the dataset cache) is detached first.
+    """
+    if os.stat(dst).st_nlink > 1:
+        shutil.copyfile(dst, dst + ".tmp")
+        os.replace(dst + ".tmp", dst)
+    with open(dst, "ab") as fout:
+        with open(src, "rb") as fin:
+            shutil.copyfileobj(fin, fout)
+
+
+def truncate_file(path, size):
+    """
+    Cuts path back to size bytes if it is longer. A file that shares its data
+    with other files (eg with the dataset cache) is detached first.
+    """
+    if os.path.getsize(path) <= size:
+        return
+    if os.stat(path).st_nlink > 1:
+        shutil.copyfile(path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    os.truncate(path, size)
+
+
+def write_run_metrics(workbook_dir, worker_metrics_paths, placement=None):
+    """
+    Collects the metrics written by the data generator workers and their placement
+    on cores into metrics.json of the workbook
+    """
+    workers = []
+    for path in worker_metrics_paths:
+        with open(path, encoding="utf8") as metrics_file:
+            workers.append(json.load(metrics_file))
+
+    generator_stall = sum(w["generator_stall_seconds"] for w in workers)
+    writer_idle = sum(w["writer_idle_seconds"] for w in workers)
+    metrics = {
+        "data_generator": {
+            "documents": sum(w["documents"] for w in workers),
+            "bytes_written": sum(w["bytes_written"] for w in workers),
+            "generator_stall_seconds": generator_stall,
+            "writer_idle_seconds": writer_idle,
+            "bound": "io" if generator_stall > writer_idle else "cpu",
+            "placement": placement,
+            "workers": workers,
+        }
+    }
+    metrics_path = os.path.join(workbook_dir, "metrics.json")
+    with open(metrics_path, "w", encoding="utf8") as metrics_file:
+        json.dump(metrics, metrics_file, indent=4)
+    print(
+        "Data generation was {} bound, metrics written to {}".format(
+            metrics["data_generator"]["bound"], metrics_path
+        )
+    )
+
+
+def runQueryGeneratorShard(
+    generator, queries_dir, query_base_name, output_format, shard, start, stop
+):
+    """
+    Generates the queries start..stop-1 into the output shard of one process
+    """
+    writer = create_query_writer(
+        output_format, queries_dir, shard_name(query_base_name, shard)
+    )
+    progress = ProgressReporter()
+    generate_schema_based_queries(
+        generator, queries_dir, query_base_name, writer, start, stop, progress
+    )
+    writer.close()
+    progress.report()
 
 
 def runQueryGenerator(args, queries_dir):
@@ -158,18 +610,132 @@ def runQueryGenerator(args, queries_dir):
         ) as schema_cfg_file:
             query_cfg = json.load(query_cfg_file)
             schema_cfg = json.load(schema_cfg_file)
-            if query_cfg["collection"] != args.collection_name:
-                print(
-                    "WARNING: Collection name from query config was overwritten. Use the --collection-name parameter!"
-                )
-                query_cfg["collection"] = args.collection_name
-            schema_based_generator = SchemaBasedGenerator(query_cfg, schema_cfg)
-            standalone_configs = schema_based_generator.run()
-            for i, c in enumerate(standalone_configs):
-                g = StandaloneGenerator(
-                    c, queries_dir, "{}_{}".format(args.query_base_name, i)
-                )
-                g.run()
+    if query_cfg["collection"] != args.collection_name:
+        print(
+            "WARNING: Collection name from query config was overwritten. Use the --collection-name parameter!"
+        )
+        query_cfg["collection"] = args.collection_name
+    if args.seed is not None:
+        query_cfg["seed"] = args.seed
+    # The queries are annotated with the number of documents their forced paths
+    # match, which differ from the schema config after growing the data
+    manifest = read_manifest(os.path.dirname(queries_dir))
+    if manifest is not None and manifest["complete"]:
+        schema_cfg["numSamples"] = manifest["numSamples"]
+        for pathDict, count in zip(
+            schema_cfg["forcedPaths"], manifest["forced_counts"]
+        ):
+            if count is not None:
+                pathDict["num"] = count
+    # Query all paths of the schema the data was generated with
+    schema = None
+    schema_filepath = os.path.join(os.path.dirname(queries_dir), "schema.txt")
+    if os.path.exists(schema_filepath):
+        schema = load_schema(schema_filepath)
+    # Filter on values that occur in the data
+    sampled_values = None
+    value_sample_filepath = os.path.join(
+        os.path.dirname(queries_dir), VALUE_SAMPLE_FILENAME
+    )
+    exact_sampled_counts = False
+    if os.path.exists(value_sample_filepath):
+        sampled_values = ValueSample.read(value_sample_filepath).value_counts()
+        if args.exact_counts and manifest is not None and manifest["complete"]:
+            # The annotations get the exact counts of the sampled values
+            sampled_values = count_values(
+                workbook_data_path(os.path.dirname(queries_dir)),
+                sampled_values,
+                int(args.num_proc),
+            )
+            exact_sampled_counts = True
+    # Every query is seeded on its own, so the queries do not depend on the
+    # number of processes
+    schema_based_generator = SchemaBasedGenerator(
+        query_cfg, schema_cfg, schema, sampled_values, exact_sampled_counts
+    )
+    print("Query seed: {}".format(schema_based_generator.seed))
+
+    if int(args.query_proc) < 1 or int(args.query_proc) > 100:
+        raise RuntimeError(
+            "Query proc is {} and therefore exceeds valid value range".format(
+                args.query_proc
+            )
+        )
+
+    if int(args.query_proc) == 1:
+        progress = ProgressReporter()
+        writer = create_query_writer(
+            args.query_output, queries_dir, args.query_base_name
+        )
+        generate_schema_based_queries(
+            schema_based_generator,
+            queries_dir,
+            args.query_base_name,
+            writer,
+            progress=progress,
+        )
+        writer.close()
+        progress.report()
+        return
+
+    num_queries = query_cfg["number_of_different_queries"]
+    num_shards = int(args.query_proc)
+    jobs = []
+    for shard in range(num_shards):
+        p = multiprocessing.Process(
+            target=runQueryGeneratorShard,
+            args=(
+                schema_based_generator,
+                queries_dir,
+                args.query_base_name,
+                args.query_output,
+                shard,
+                num_queries * shard // num_shards,
+                num_queries * (shard + 1) // num_shards,
+            ),
+        )
+        jobs.append(p)
+        p.start()
+
+    for job in jobs:
+        job.join()
+
+    failed = [i for i, job in enumerate(jobs) if job.exitcode != 0]
+    if len(failed) > 0:
+        raise RuntimeError("Query generator processes {} failed".format(failed))
+
+    stopwatch(
+        "merging query shards",
+        merge_query_shards,
+        [args.query_output, queries_dir, args.query_base_name, num_shards],
+    )
+
+
+def runQueryEvaluator(args, data_dir, queries_dir):
+    """
+    Computes the expected results of the generated queries on the generated data
+    into expected.jsonl of the workbook
+    """
+    queries_path = queries_dir
+    if args.query_output != "files":
+        queries_path = os.path.join(
+            queries_dir,
+            args.query_base_name + QUERY_FILE_EXTENSIONS[args.query_output],
+        )
+    results = evaluate_queries(
+        os.path.join(data_dir, "{}.json".format(args.collection_name)),
+        read_queries(queries_path),
+        int(args.num_proc),
+    )
+    expected_filepath = os.path.join(
+        os.path.dirname(data_dir), EXPECTED_RESULTS_FILENAME
+    )
+    write_results(results, expected_filepath)
+    print(
+        "Expected results of {} queries written to {}".format(
+            len(results), expected_filepath
+        )
+    )
 
 
 def getArgParser():
@@ -198,6 +764,12 @@ def getArgParser():
         help='Base name of the generated queries. Defaults to "query"',
         default="query",
     )
+    parser.add_argument(
+        "--query-output",
+        help='"files": one .sql file per query, "sql": all queries in one .sql file, "jsonl": all queries in one .jsonl file with query id, template id and parameters. Batched formats get an offset index (.idx) for random access. Defaults to "files"',
+        choices=QUERY_OUTPUT_FORMATS,
+        default="files",
+    )
     parser.add_argument(
         "--collection-name",
         help="Name of the collection to be created. Defaults to mycol",
@@ -208,9 +780,55 @@ def getArgParser():
         help="Number of processes for the data generation. Defaults to 1",
         default=1,
     )
+    parser.add_argument(
+        "--query-proc",
+        help="Number of processes for the query generation. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        help="Number of documents a data generator process fakes before handing them to its writer thread. Defaults to 10000",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--placement",
+        help='Placement of the data generator processes: "spread" pins each process to a core and spreads them evenly across NUMA nodes, "compact" fills one node first. Defaults to "none" (no pinning)',
+        choices=PLACEMENT_POLICIES,
+        default="none",
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed of the data and query generation. Runs with the same seed and configs produce the same data and queries. Defaults to a random seed",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--value-sample-size",
+        help="Number of documents whose values are sampled during the data generation. The query generator builds predicates on the sampled values. 0 disables the sample. Defaults to {}".format(
+            DEFAULT_VALUE_SAMPLE_SIZE
+        ),
+        type=int,
+        default=DEFAULT_VALUE_SAMPLE_SIZE,
+    )
     parser.add_argument(
         "--no-query", help="generate only data", default=False, action="store_true"
     )
+    parser.add_argument(
+        "--exact-counts",
+        help="annotate the predicates on sampled values with their exact number of matching documents, counted in an extra pass over the data. Defaults to the estimates of the value sample",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--evaluate",
+        help="compute the expected results of the queries on the data into {} of the workbook (matching documents, rows and checksum per query)".format(
+            EXPECTED_RESULTS_FILENAME
+        ),
+        default=False,
+        action="store_true",
+    )
     parser.add_argument("--workbook", "-w", help="workbook name", default="workbook1")
     parser.add_argument(
         "--overwrite",
@@ -218,6 +836,75 @@ def getArgParser():
         default=False,
         action="store_true",
     )
+    parser.add_argument(
+        "--grow-to",
+        help="append documents to the existing data of the workbook until it has this many documents",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--grow-forced",
+        help='Forced values of the appended documents: "proportional" keeps the share of forced values configured by "num" and "numSamples", "fixed" keeps their number. Defaults to "proportional"',
+        choices=["proportional", "fixed"],
+        default="proportional",
+    )
+    parser.add_argument(
+        "--cache",
+        help="reuse the data of an earlier run with the same schema config, seed and chunk size from the dataset cache (requires --seed)",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help='Directory of the dataset cache. Defaults to "{}"'.format(
+            DEFAULT_CACHE_DIR
+        ),
+        default=DEFAULT_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        help="Least recently used datasets are evicted when the cache grows beyond this size. Defaults to {}".format(
+            DEFAULT_MAX_SIZE
+        ),
+        default=DEFAULT_MAX_SIZE,
+    )
+    parser.add_argument(
+        "--validate",
+        help="check the generated data against the schema and the forced counts into {} of the workbook, fail on any mismatch".format(
+            VALIDATION_FILENAME
+        ),
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--order-by",
+        help='Order the documents by the values of these paths, eg "c0.a1 b0", or put them in random order with "{}". Data larger than --sort-memory is sorted externally. Defaults to the order of generation'.format(
+            RANDOM_ORDER
+        ),
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--sort-memory",
+        help="Memory for the documents being sorted by --order-by. Defaults to {}".format(
+            DEFAULT_SORT_MEMORY
+        ),
+        default=DEFAULT_SORT_MEMORY,
+    )
+    parser.add_argument(
+        "--resume",
+        help="continue an interrupted data generation of the workbook after its last durable chunk",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        help="Seconds between the checkpoints of the durable chunks of a data generator process, which --resume continues after. 0 checkpoints every chunk. Defaults to {:g}".format(
+            DEFAULT_CHECKPOINT_INTERVAL
+        ),
+        type=float,
+        default=DEFAULT_CHECKPOINT_INTERVAL,
+    )
 
     return parser
 
@@ -240,17 +927,40 @@ def parsArguments(arguments, parser):
 
 
 def main(arguments):
+    if len(arguments) > 0 and arguments[0] == "cache":
+        cache_main(arguments[1:])
+        return
+    if len(arguments) > 0 and arguments[0] == "evaluate":
+        evaluate_main(arguments[1:])
+        return
+    if len(arguments) > 0 and arguments[0] == "profile":
+        profile_main(arguments[1:])
+        return
+    if len(arguments) > 0 and arguments[0] == "sort":
+        sort_main(arguments[1:])
+        return
+    if len(arguments) > 0 and arguments[0] == "validate":
+        validate_main(arguments[1:])
+        return
+
     parser = getArgParser()
     args = parsArguments(arguments, parser)
 
     data_dir, queries_dir = setup_output_dirs(
-        args.workbook, os.path.abspath(args.output), args.overwrite
+        args.workbook,
+        os.path.abspath(args.output),
+        args.overwrite,
+        args.resume or args.grow_to is not None,
     )
 
     # ================= #
     # Data generator
     # ================= #
     runDataGenerator(args, data_dir)
+    if args.order_by is not None:
+        stopwatch("ordering data", runDataSort, [args, data_dir])
+    if args.validate:
+        stopwatch("validating data", runDataValidation, [args, data_dir])
 
     if args.no_query:
         printSummary(args)
@@ -260,6 +970,10 @@ def main(arguments):
     # Query generator
     # ================= #
     runQueryGenerator(args, queries_dir)
+    if args.evaluate:
+        stopwatch(
+            "evaluating queries", runQueryEvaluator, [args, data_dir, queries_dir]
+        )
     printSummary(args)
 
 
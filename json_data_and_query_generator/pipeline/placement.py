@@ -0,0 +1,104 @@
+"""
+Placement of the data generator processes on CPU cores and NUMA nodes
+"""
+import os
+import glob
+
+NUMA_NODE_DIR = "/sys/devices/system/node"
+
+PLACEMENT_POLICIES = ["none", "spread", "compact"]
+
+
+def parse_cpu_list(cpu_list):
+    """
+    Parses a cpu list as used in sysfs, eg "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+    """
+    cpus = []
+    for part in cpu_list.strip().split(","):
+        if part == "":
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def read_numa_nodes(node_dir=NUMA_NODE_DIR):
+    """
+    Returns a dictionary NUMA node -> sorted list of the cores of the node this
+    process may run on. Without NUMA information all cores are on node 0.
+    """
+    available = os.sched_getaffinity(0)
+    nodes = {}
+    for path in glob.glob(os.path.join(node_dir, "node[0-9]*", "cpulist")):
+        node = int(os.path.basename(os.path.dirname(path))[len("node") :])
+        with open(path) as cpulist_file:
+            cpus = [c for c in parse_cpu_list(cpulist_file.read()) if c in available]
+        if len(cpus) > 0:
+            nodes[node] = sorted(cpus)
+    if len(nodes) == 0:
+        nodes[0] = sorted(available)
+    return nodes
+
+
+def plan_placement(num_workers, policy, nodes=None):
+    """
+    Assigns each worker a core for its generating thread and the other cores of
+    the core's NUMA node for its writer thread, so writing overlaps with
+    generating
+
+    Args:
+        num_workers: Number of worker processes
+        policy: "none": no pinning
+                "spread": round robin over the NUMA nodes, so the workers are
+                    spread evenly across the sockets
+                "compact": fill the cores of one node before using the next one
+        nodes: NUMA node -> cores, read from sysfs if None
+    Returns:
+        None for policy "none", else a list with one {"worker", "node", "cpu",
+        "writer_cpus"} dictionary per worker. Cores are reused once every core
+        has a worker. A node with a single core runs both threads on it.
+    """
+    if policy not in PLACEMENT_POLICIES:
+        raise ValueError("Unknown placement policy {}".format(policy))
+    if policy == "none":
+        return None
+    if not hasattr(os, "sched_setaffinity"):
+        raise RuntimeError("CPU pinning is not supported on this platform")
+    if nodes is None:
+        nodes = read_numa_nodes()
+
+    node_ids = sorted(nodes.keys())
+    if policy == "spread":
+        slots = []
+        for i in range(max(len(cpus) for cpus in nodes.values())):
+            slots.extend(
+                (node, nodes[node][i]) for node in node_ids if i < len(nodes[node])
+            )
+    else:
+        slots = [(node, cpu) for node in node_ids for cpu in nodes[node]]
+
+    placement = []
+    for i in range(num_workers):
+        node, cpu = slots[i % len(slots)]
+        placement.append(
+            {
+                "worker": i,
+                "node": node,
+                "cpu": cpu,
+                "writer_cpus": [c for c in nodes[node] if c != cpu] or [cpu],
+            }
+        )
+    return placement
+
+
+def run_pinned(cpu, target, *args):
+    """
+    Pins the calling thread to the given core and runs target(*args). Threads
+    the target starts inherit the core unless they pin themselves elsewhere
+    (see BackgroundWriter).
+    """
+    os.sched_setaffinity(0, {cpu})
+    return target(*args)
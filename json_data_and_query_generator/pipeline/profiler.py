@@ -0,0 +1,445 @@
+"""
+Streaming profile of a generated dataset.
+
+A single pass over the JSONL data, split into byte ranges over processes, collects
+per path:
+    presence: share of the documents that have the path
+    types: number of values per JSON type
+    min, max: of the numbers, and the shortest and longest string
+    distinct: approximate number of distinct values (HyperLogLog)
+    heavy_hitters: most frequent values with their approximate counts (count-min
+        sketch)
+    string_length: histogram of the string lengths
+and a histogram of the document sizes. The sketches of the processes are merged,
+so the report does not depend on the number of processes.
+
+Paths are written with "." between the fields and "[]" for array elements, eg
+"arr[].arrContent".
+
+Usage:
+    python -m json_data_and_query_generator profile --data <workbook>/data/mycol.json --num-proc 8 -o profile.json
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import multiprocessing
+import sys
+
+import numpy as np
+
+from json_data_and_query_generator.data_scan import byte_ranges, iter_line_batches
+from json_data_and_query_generator.hashing import mix64
+
+DEFAULT_BATCH_SIZE = 20000
+# 2**12 HyperLogLog registers, about 1.6% standard error
+HLL_PRECISION = 12
+CMS_DEPTH = 4
+CMS_WIDTH = 2048
+DEFAULT_HEAVY_HITTERS = 10
+# Candidates kept per reported heavy hitter, values that become frequent late in
+# a range must not be pruned too early
+CANDIDATES_PER_HEAVY_HITTER = 64
+
+CMS_SEEDS = np.array(
+    [0x243F6A8885A308D3, 0x13198A2E03707344, 0xA4093822299F31D0, 0x082EFA98EC4E6C89],
+    dtype=np.uint64,
+)
+
+
+def hash_values(values):
+    """
+    Returns a 64 bit hash of every scalar JSON value, the same in every process
+    """
+    hashes = np.empty(len(values), dtype=np.uint64)
+    for i, v in enumerate(values):
+        data = json.dumps(v).encode("utf8")
+        hashes[i] = int.from_bytes(
+            hashlib.blake2b(data, digest_size=8).digest(), "little"
+        )
+    return hashes
+
+
+def log2_histogram(sizes):
+    """
+    Returns the number of sizes per power of two bucket, eg {"<=64": 10, ...}
+    """
+    sizes = np.asarray(sizes)
+    if len(sizes) == 0:
+        return {}
+    buckets = np.ceil(np.log2(np.maximum(sizes, 1))).astype(np.int64)
+    numbers, counts = np.unique(buckets, return_counts=True)
+    return {"<={}".format(2 ** int(b)): int(c) for b, c in zip(numbers, counts)}
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Rank of the first set bit in the low 32 bits, exact in float64
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        with np.errstate(divide="ignore"):
+            rank = np.where(low > 0, 32 - np.floor(np.log2(low)), 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """
+    Count-min sketch with the most frequent values seen so far as heavy hitter
+    candidates. The candidates are pruned to CANDIDATES_PER_HEAVY_HITTER times the
+    number of heavy hitters once there are twice as many.
+    """
+
+    def __init__(self, num_heavy_hitters=DEFAULT_HEAVY_HITTERS):
+        self.table = np.zeros((CMS_DEPTH, CMS_WIDTH), dtype=np.int64)
+        self.num_heavy_hitters = num_heavy_hitters
+        self.capacity = max(1, CANDIDATES_PER_HEAVY_HITTER * num_heavy_hitters)
+        # hash -> value
+        self.candidates = {}
+
+    def _columns(self, hashes):
+        return [
+            (mix64(hashes ^ seed) % np.uint64(CMS_WIDTH)).astype(np.int64)
+            for seed in CMS_SEEDS
+        ]
+
+    def estimates(self, hashes):
+        return np.min(
+            [self.table[i][column] for i, column in enumerate(self._columns(hashes))],
+            axis=0,
+        )
+
+    def add(self, hashes, values):
+        for i, column in enumerate(self._columns(hashes)):
+            np.add.at(self.table[i], column, 1)
+        unique, first = np.unique(hashes, return_index=True)
+        for h, j in zip(unique.tolist(), first.tolist()):
+            self.candidates.setdefault(h, values[j])
+        self._prune()
+
+    def merge(self, other):
+        self.table += other.table
+        for h, v in other.candidates.items():
+            self.candidates.setdefault(h, v)
+        self._prune()
+
+    def _prune(self, capacity=None):
+        if capacity is None:
+            if len(self.candidates) <= 2 * self.capacity:
+                return
+            capacity = self.capacity
+        hashes = np.array(list(self.candidates.keys()), dtype=np.uint64)
+        estimates = self.estimates(hashes)
+        keep = heapq.nlargest(
+            capacity,
+            range(len(hashes)),
+            key=lambda i: (estimates[i], -int(hashes[i])),
+        )
+        self.candidates = {
+            int(hashes[i]): self.candidates[int(hashes[i])] for i in keep
+        }
+
+    def heavy_hitters(self):
+        self._prune(self.num_heavy_hitters)
+        if len(self.candidates) == 0:
+            return []
+        hashes = np.array(list(self.candidates.keys()), dtype=np.uint64)
+        estimates = self.estimates(hashes)
+        return sorted(
+            ([self.candidates[int(h)], int(e)] for h, e in zip(hashes, estimates)),
+            key=lambda x: (-x[1], json.dumps(x[0])),
+        )
+
+
+class PathProfile:
+    def __init__(self, num_heavy_hitters=DEFAULT_HEAVY_HITTERS):
+        self.documents = 0
+        self.types = {}
+        self.min = None
+        self.max = None
+        self.shortest = None
+        self.longest = None
+        self.string_lengths = []
+        self.hll = HyperLogLog()
+        self.cms = CountMinSketch(num_heavy_hitters)
+
+    def add(self, documents, values):
+        """
+        Args:
+            documents: Number of documents of the batch that have the path
+            values: Values of the path in the batch
+        """
+        self.documents += documents
+        scalars = []
+        numbers = []
+        strings = []
+        for v in values:
+            if isinstance(v, bool):
+                name = "boolean"
+            elif isinstance(v, (int, float)):
+                name = "number"
+                numbers.append(v)
+            elif isinstance(v, str):
+                name = "string"
+                strings.append(v)
+            elif v is None:
+                name = "null"
+            elif isinstance(v, dict):
+                name = "object"
+            else:
+                name = "array"
+            self.types[name] = self.types.get(name, 0) + 1
+            if name not in ["object", "array"]:
+                scalars.append(v)
+        if len(numbers) > 0:
+            low, high = min(numbers), max(numbers)
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        if len(strings) > 0:
+            lengths = np.fromiter((len(s) for s in strings), dtype=np.int64)
+            self.string_lengths.append(np.bincount(lengths))
+            shortest, longest = min(strings, key=len), max(strings, key=len)
+            if self.shortest is None or len(shortest) < len(self.shortest):
+                self.shortest = shortest
+            if self.longest is None or len(longest) > len(self.longest):
+                self.longest = longest
+        if len(scalars) > 0:
+            hashes = hash_values(scalars)
+            self.hll.add(hashes)
+            self.cms.add(hashes, scalars)
+
+    def merge(self, other):
+        self.documents += other.documents
+        for name, count in other.types.items():
+            self.types[name] = self.types.get(name, 0) + count
+        for attr, fct in [("min", min), ("max", max)]:
+            if getattr(other, attr) is not None:
+                mine = getattr(self, attr)
+                setattr(
+                    self,
+                    attr,
+                    getattr(other, attr)
+                    if mine is None
+                    else fct(mine, getattr(other, attr)),
+                )
+        if other.shortest is not None and (
+            self.shortest is None or len(other.shortest) < len(self.shortest)
+        ):
+            self.shortest = other.shortest
+        if other.longest is not None and (
+            self.longest is None or len(other.longest) > len(self.longest)
+        ):
+            self.longest = other.longest
+        self.string_lengths.extend(other.string_lengths)
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+
+    def report(self, num_documents):
+        report = {
+            "presence": self.documents / float(num_documents) if num_documents else 0.0,
+            "types": self.types,
+        }
+        if self.min is not None:
+            report["min"] = self.min
+            report["max"] = self.max
+        if self.shortest is not None:
+            report["shortest"] = self.shortest
+            report["longest"] = self.longest
+            counts = np.zeros(max(len(c) for c in self.string_lengths), dtype=np.int64)
+            for c in self.string_lengths:
+                counts[: len(c)] += c
+            report["string_length"] = log2_histogram(
+                np.repeat(np.arange(len(counts)), counts)
+            )
+        if sum(n for t, n in self.types.items() if t not in ["object", "array"]) > 0:
+            report["distinct"] = self.hll.estimate()
+            report["heavy_hitters"] = self.cms.heavy_hitters()
+        return report
+
+
+class DatasetProfile:
+    def __init__(self, num_heavy_hitters=DEFAULT_HEAVY_HITTERS):
+        self.num_heavy_hitters = num_heavy_hitters
+        self.documents = 0
+        self.bytes = 0
+        self.document_sizes = np.zeros(0, dtype=np.int64)
+        self.paths = {}
+
+    def add(self, lines):
+        sizes = np.fromiter((len(line) for line in lines), dtype=np.int64)
+        self.documents += len(lines)
+        self.bytes += int(sizes.sum())
+        self._add_sizes(sizes)
+        values = {}
+        counts = {}
+        # Last document counted per path
+        presence = {}
+
+        def visit(value, path, document):
+            values.setdefault(path, []).append(value)
+            if presence.get(path, -1) != document:
+                presence[path] = document
+                counts[path] = counts.get(path, 0) + 1
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    visit(v, path + "." + k if path else k, document)
+            elif isinstance(value, list):
+                for v in value:
+                    visit(v, path + "[]", document)
+
+        for i, line in enumerate(lines):
+            for k, v in json.loads(line).items():
+                visit(v, k, i)
+        for path, path_values in values.items():
+            if path not in self.paths:
+                self.paths[path] = PathProfile(self.num_heavy_hitters)
+            self.paths[path].add(counts[path], path_values)
+
+    def _add_sizes(self, sizes):
+        buckets = np.ceil(np.log2(np.maximum(sizes, 1))).astype(np.int64)
+        counts = np.bincount(buckets)
+        if len(counts) > len(self.document_sizes):
+            counts[: len(self.document_sizes)] += self.document_sizes
+            self.document_sizes = counts
+        else:
+            self.document_sizes[: len(counts)] += counts
+
+    def merge(self, other):
+        self.documents += other.documents
+        self.bytes += other.bytes
+        sizes = np.zeros(
+            max(len(self.document_sizes), len(other.document_sizes)), dtype=np.int64
+        )
+        sizes[: len(self.document_sizes)] += self.document_sizes
+        sizes[: len(other.document_sizes)] += other.document_sizes
+        self.document_sizes = sizes
+        for path, profile in other.paths.items():
+            if path in self.paths:
+                self.paths[path].merge(profile)
+            else:
+                self.paths[path] = profile
+
+    def report(self):
+        return {
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "document_size": {
+                "mean": self.bytes / float(self.documents) if self.documents else 0.0,
+                "histogram": {
+                    "<={}".format(2**b): int(c)
+                    for b, c in enumerate(self.document_sizes)
+                    if c > 0
+                },
+            },
+            "paths": {
+                path: self.paths[path].report(self.documents)
+                for path in sorted(self.paths)
+            },
+        }
+
+
+def profile_range(data_path, start, end, batch_size, num_heavy_hitters):
+    profile = DatasetProfile(num_heavy_hitters)
+    for lines in iter_line_batches(data_path, start, end, batch_size):
+        profile.add(lines)
+    return profile
+
+
+def _profile_range_worker(args):
+    return profile_range(*args)
+
+
+def profile_dataset(
+    data_path,
+    num_proc=1,
+    batch_size=DEFAULT_BATCH_SIZE,
+    num_heavy_hitters=DEFAULT_HEAVY_HITTERS,
+):
+    """
+    Returns the profile report of a JSONL file
+    """
+    jobs = [
+        (data_path, start, end, batch_size, num_heavy_hitters)
+        for start, end in byte_ranges(data_path, num_proc)
+    ]
+    if num_proc == 1:
+        profiles = [_profile_range_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(num_proc) as pool:
+            profiles = pool.map(_profile_range_worker, jobs)
+    profile = profiles[0]
+    for other in profiles[1:]:
+        profile.merge(other)
+    return profile.report()
+
+
+def getArgParser():
+    parser = argparse.ArgumentParser(
+        prog="json_data_and_query_generator profile",
+        description="Profile the paths of a generated dataset",
+    )
+    parser.add_argument(
+        "--data", help="Path to the generated JSONL data", required=True
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help='Path of the JSON report. Defaults to "-" (stdout)',
+        default="-",
+    )
+    parser.add_argument(
+        "--num-proc",
+        help="Number of processes scanning the data. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Number of documents profiled at once. Defaults to {}".format(
+            DEFAULT_BATCH_SIZE
+        ),
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--heavy-hitters",
+        help="Number of most frequent values reported per path. Defaults to {}".format(
+            DEFAULT_HEAVY_HITTERS
+        ),
+        type=int,
+        default=DEFAULT_HEAVY_HITTERS,
+    )
+    return parser
+
+
+def main(arguments):
+    args = getArgParser().parse_args(arguments)
+    if args.num_proc < 1 or args.batch_size < 1 or args.heavy_hitters < 0:
+        raise RuntimeError(
+            "Number of processes and batch size must be positive, heavy hitters not negative"
+        )
+    report = profile_dataset(
+        args.data, args.num_proc, args.batch_size, args.heavy_hitters
+    )
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w", encoding="utf8") as report_file:
+            json.dump(report, report_file, indent=4)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from json_data_and_query_generator.offset_index import build_index, read_offsets
+from json_data_and_query_generator.pipeline.external_sort import sort_data
+
+VALUES = [3, "b", None, True, 1.5, {"x": 1}, "a", 3, False]
+
+
+def write_data(path):
+    with open(path, "w") as data_file:
+        for i in range(300):
+            document = {"i": i, "c": {"v": VALUES[i % len(VALUES)]}}
+            if i % 11 == 0:
+                del document["c"]["v"]
+            data_file.write(json.dumps(document) + "\n")
+
+
+def sorted_documents(tmp_path, name, order_by, num_proc, memory):
+    data_path = str(tmp_path / (name + ".json"))
+    index_path = data_path + ".idx"
+    write_data(data_path)
+    sort_data(
+        data_path,
+        index_path,
+        order_by,
+        str(tmp_path / (name + "_runs")),
+        seed=4,
+        num_proc=num_proc,
+        memory=memory,
+    )
+    with open(data_path, "rb") as data_file:
+        data = data_file.read()
+    # The rewritten index matches the sorted data
+    build_index(data_path, str(tmp_path / "check.idx"))
+    assert list(read_offsets(index_path)) == list(
+        read_offsets(str(tmp_path / "check.idx"))
+    )
+    return [json.loads(line) for line in data.splitlines()]
+
+
+@pytest.mark.parametrize("order_by", [["c.v", "i"], ["c.v"], ["random"]])
+def test_sort_is_independent_of_num_proc_and_memory(tmp_path, order_by):
+    # 300 runs of one document take two merge passes
+    expected = sorted_documents(tmp_path, "a", order_by, 1, "1G")
+    assert sorted_documents(tmp_path, "b", order_by, 3, "300") == expected
+    assert sorted_documents(tmp_path, "c", order_by, 1, "1") == expected
+    assert sorted(d["i"] for d in expected) == list(range(300))
+
+
+def type_rank(document):
+    if "v" not in document["c"]:
+        return 0
+    v = document["c"]["v"]
+    for rank, types in enumerate([type(None), bool, (int, float), str], 1):
+        if isinstance(v, types):
+            return rank
+    return 5
+
+
+def test_sort_orders_by_type_then_value_then_number(tmp_path):
+    documents = sorted_documents(tmp_path, "a", ["c.v"], 2, "500")
+
+    ranks = [type_rank(d) for d in documents]
+    assert ranks == sorted(ranks)
+    for rank in range(6):
+        group = [d for d in documents if type_rank(d) == rank]
+        values = [
+            json.dumps(d["c"].get("v"), sort_keys=True)
+            if rank == 5
+            else d["c"].get("v")
+            for d in group
+        ]
+        keys = [(v if rank > 1 else 0, d["i"]) for v, d in zip(values, group)]
+        assert keys == sorted(keys)
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+
+from json_data_and_query_generator.hashing import mix64
+from json_data_and_query_generator.pipeline.profiler import (
+    CMS_WIDTH,
+    CountMinSketch,
+    HyperLogLog,
+    hash_values,
+    profile_dataset,
+)
+
+
+def distinct_hashes(n, offset=0):
+    return mix64(np.arange(offset, offset + n, dtype=np.uint64))
+
+
+def test_hyperloglog_estimate_error():
+    for n in [10, 1000, 50000, 400000]:
+        hll = HyperLogLog()
+        hll.add(distinct_hashes(n))
+        hll.add(distinct_hashes(n // 2))
+
+        # About 1.6% standard error with 2**12 registers
+        assert abs(hll.estimate() - n) <= max(1, 0.05 * n)
+
+
+def test_hyperloglog_merge_equals_one_pass():
+    one, first, second = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    one.add(distinct_hashes(30000))
+    first.add(distinct_hashes(20000))
+    second.add(distinct_hashes(20000, 10000))
+
+    first.merge(second)
+
+    assert np.array_equal(first.registers, one.registers)
+
+
+def test_count_min_sketch_error_bound_and_heavy_hitters():
+    rng = np.random.default_rng(1)
+    values = rng.zipf(1.5, 100000)
+    values = values[values < 5000].tolist()
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    first, second = CountMinSketch(5), CountMinSketch(5)
+    half = len(values) // 2
+    first.add(hash_values(values[:half]), values[:half])
+    second.add(hash_values(values[half:]), values[half:])
+    first.merge(second)
+
+    keys = list(counts)
+    estimates = first.estimates(hash_values(keys))
+    errors = estimates - np.array([counts[k] for k in keys])
+    # Never below the true count, and above it by at most e / width of the total
+    # unless all rows collide
+    assert errors.min() >= 0
+    assert errors.max() <= np.e / CMS_WIDTH * len(values)
+    top = sorted(counts, key=lambda k: -counts[k])[:5]
+    assert [v for v, _ in first.heavy_hitters()] == top
+
+
+def test_profile_dataset(tmp_path):
+    data_path = str(tmp_path / "mycol.json")
+    with open(data_path, "w") as data_file:
+        for i in range(1000):
+            document = {"a": i % 10, "b": {"c": "x" * (i % 3)}}
+            if i % 4 == 0:
+                document["n"] = None
+            data_file.write(json.dumps(document) + "\n")
+
+    report = profile_dataset(data_path, num_proc=2, batch_size=64)
+
+    assert report["documents"] == 1000
+    a = report["paths"]["a"]
+    assert (a["presence"], a["types"], a["min"], a["max"]) == (
+        1.0,
+        {"number": 1000},
+        0,
+        9,
+    )
+    assert a["distinct"] == 10
+    assert sorted(v for v, _ in a["heavy_hitters"]) == list(range(10))
+    assert report["paths"]["n"]["presence"] == 0.25
+    assert report["paths"]["b.c"]["shortest"] == ""
+    assert report["paths"]["b.c"]["longest"] == "xx"
+    assert report == profile_dataset(data_path)
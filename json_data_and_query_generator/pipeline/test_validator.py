@@ -0,0 +1,100 @@
+import json
+
+from json_data_and_query_generator.pipeline.validator import validate_dataset
+
+SCHEMA = {"a": "random_number(2)", "c": {"w": "word"}, "u": "unique_number"}
+SCHEMA_CONFIG = {
+    "forcedPaths": [
+        {
+            "path": ["a"],
+            "valueType": "random_number(2)",
+            "operator": "lt",
+            "value": 10,
+            "num": 3,
+        },
+        {"path": ["u"], "valueType": "unique_number"},
+    ],
+    "numSamples": 8,
+}
+
+
+def documents():
+    return [
+        {"a": 5 if i < 3 else 50 + i, "c": {"w": "w{}".format(i)}, "u": 7 - i}
+        for i in range(8)
+    ]
+
+
+def validate(tmp_path, documents, num_proc=1, forced_counts=(3, None)):
+    data_path = str(tmp_path / "mycol.json")
+    with open(data_path, "w") as data_file:
+        for document in documents:
+            data_file.write(
+                document if isinstance(document, str) else json.dumps(document)
+            )
+            data_file.write("\n")
+    manifest = {
+        "schema_config": SCHEMA_CONFIG,
+        "schema": SCHEMA,
+        "numSamples": 8,
+        "forced_counts": list(forced_counts),
+        "complete": True,
+    }
+    return validate_dataset(data_path, manifest, num_proc, batch_size=3)
+
+
+def assert_invalid(report, message):
+    assert not report["valid"]
+    assert any(message in error for error in report["errors"]), report["errors"]
+
+
+def test_valid_data(tmp_path):
+    report = validate(tmp_path, documents())
+
+    assert report["valid"]
+    assert report["num_errors"] == 0
+    assert report["forced"][0]["matches"] == 3
+    assert validate(tmp_path, documents(), num_proc=3) == report
+
+
+def test_wrong_forced_count(tmp_path):
+    assert_invalid(
+        validate(tmp_path, documents(), forced_counts=(4, None)),
+        "a lt 10: expected 4 matches, found 3",
+    )
+
+
+def test_structure_errors(tmp_path):
+    data = documents()
+    del data[0]["c"]["w"]
+    data[1]["extra"] = 1
+    data[2]["a"] = "5"
+    data[3]["c"] = [1]
+    report = validate(tmp_path, data)
+
+    assert_invalid(report, "c.w: missing")
+    assert_invalid(report, "extra: not in the schema")
+    assert_invalid(report, "a: expected a value of type random_number(2)")
+    assert_invalid(report, "c: expected an object")
+
+
+def test_not_json(tmp_path):
+    data = documents()
+    data[4] = "{not json"
+
+    assert_invalid(validate(tmp_path, data), "not a JSON document")
+
+
+def test_unique_numbers_across_processes(tmp_path):
+    data = documents()
+    data[7]["u"] = data[0]["u"]
+    data[6]["u"] = 8
+    report = validate(tmp_path, data, num_proc=3)
+
+    assert_invalid(report, "u: document number 7 occurs more than once")
+    assert_invalid(report, "u: 8 is not a document number")
+    assert_invalid(report, "u: 2 document numbers missing")
+
+
+def test_document_count(tmp_path):
+    assert_invalid(validate(tmp_path, documents()[:7]), "expected 8 documents, found 7")
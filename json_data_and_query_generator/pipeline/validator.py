@@ -0,0 +1,436 @@
+"""
+Streaming validation of the generated data of a workbook against its manifest.
+
+A single pass over the JSONL data, split into byte ranges over processes, checks
+    structure: every document is a JSON object with exactly the fields of the
+        compiled schema, except optional fields it lacks (see presence), arrays of
+        a length the schema allows (see arrays) and values of the type of each field: integers for
+        random_number and unique_number, the types of the typed values (see
+        typed_values) and scalars for faker providers
+    forced counts: every forced path with operator has exactly as many matching
+        documents as the manifest records
+    unique paths: the unique_number paths hold every document number exactly once
+    document count: the data holds numSamples documents
+
+Any mismatch makes the validation fail. The report holds the number of errors and
+the first ones found.
+
+Usage:
+    python -m json_data_and_query_generator validate --workbook <output>/<workbook> --num-proc 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from json_data_and_query_generator.data_scan import byte_ranges, iter_lines
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    ARRAY_KEY,
+    ITEMS_KEY,
+    is_variable_array,
+    length_bounds,
+)
+from json_data_and_query_generator.data_generators.faker_generator.forced_values import (
+    UNIQUE_VALUE_TYPE,
+    ForcedPath,
+    UniquePath,
+)
+from json_data_and_query_generator.data_generators.faker_generator.presence import (
+    presence_paths,
+)
+from json_data_and_query_generator.data_generators.faker_generator.typed_values import (
+    value_matches_type,
+)
+
+MANIFEST_FILENAME = "dataset.json"
+DEFAULT_BATCH_SIZE = 20000
+# Number of errors listed in the report
+MAX_ERRORS = 20
+
+
+def describe(value):
+    if isinstance(value, dict):
+        return "an object"
+    if isinstance(value, list):
+        return "an array"
+    return json.dumps(value)[:40]
+
+
+def join(path, key):
+    return path + "." + key if path else key
+
+
+def check_structure(value, schema, path, errors, optional=frozenset()):
+    """
+    Appends a message to errors for every difference between a value and the
+    compiled schema
+
+    Args:
+        optional: Paths like "c0.a1" that documents may lack
+    """
+    if is_variable_array(schema):
+        low, high = length_bounds(schema[ARRAY_KEY])
+        if (
+            not isinstance(value, list)
+            or len(value) < low
+            or (high is not None and len(value) > high)
+        ):
+            errors.append(
+                "{}: expected an array of [{}] elements, found {}".format(
+                    path, schema[ARRAY_KEY], describe(value)
+                )
+            )
+            return
+        for i, item in enumerate(value):
+            check_structure(
+                item, schema[ITEMS_KEY], "{}[{}]".format(path, i), errors, optional
+            )
+    elif isinstance(schema, dict):
+        if not isinstance(value, dict):
+            errors.append(
+                "{}: expected an object, found {}".format(path, describe(value))
+            )
+            return
+        for key in sorted(schema.keys() - value.keys()):
+            if join(path, key) not in optional:
+                errors.append("{}: missing".format(join(path, key)))
+        for key in sorted(value.keys() - schema.keys()):
+            errors.append("{}: not in the schema".format(join(path, key)))
+        for key, item_schema in schema.items():
+            if key in value:
+                check_structure(
+                    value[key], item_schema, join(path, key), errors, optional
+                )
+    elif isinstance(schema, list):
+        if not isinstance(value, list) or len(value) != len(schema):
+            errors.append(
+                "{}: expected an array of {} elements, found {}".format(
+                    path, len(schema), describe(value)
+                )
+            )
+            return
+        for i, (item, item_schema) in enumerate(zip(value, schema)):
+            check_structure(
+                item, item_schema, "{}[{}]".format(path, i), errors, optional
+            )
+    elif not value_matches_type(value, schema):
+        errors.append(
+            "{}: expected a value of type {}, found {}".format(
+                path, schema, describe(value)
+            )
+        )
+
+
+def get_value(document, path):
+    for key in path:
+        document = document[key]
+    return document
+
+
+class Validation:
+    """
+    Validation state of a part of the data, merged with the other parts
+    """
+
+    def __init__(self, manifest):
+        forced_paths = manifest["schema_config"].get("forcedPaths", [])
+        self.schema = manifest["schema"]
+        self.optional = frozenset(
+            ".".join(path)
+            for path, _ in presence_paths(manifest["schema_config"], self.schema)
+        )
+        self.num_samples = int(manifest["numSamples"])
+        self.forced = [
+            ForcedPath(i, pathDict)
+            for i, pathDict in enumerate(forced_paths)
+            if "operator" in pathDict.keys()
+        ]
+        self.unique = [
+            UniquePath(i, pathDict)
+            for i, pathDict in enumerate(forced_paths)
+            if pathDict["valueType"] == UNIQUE_VALUE_TYPE
+        ]
+        self.documents = 0
+        self.num_errors = 0
+        # (byte offset of the document or None, message)
+        self.errors = []
+        self.forced_matches = [0 for _ in self.forced]
+        # Bitmap of the document numbers seen per unique path
+        self.unique_seen = [
+            np.zeros((self.num_samples + 7) // 8, dtype=np.uint8) for _ in self.unique
+        ]
+
+    def error(self, offset, message):
+        self.num_errors += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((offset, message))
+
+    def errors_at(self, indices, error):
+        """
+        Adds the error (offset, message) = error(i) for each of the indices,
+        building only the ones listed in the report
+        """
+        for i in indices[:MAX_ERRORS]:
+            self.error(*error(i))
+        self.num_errors += max(0, len(indices) - MAX_ERRORS)
+
+    def add(self, lines):
+        """
+        Args:
+            lines: List of (byte offset, line) of the data
+        """
+        offsets, documents = [], []
+        for offset, line in lines:
+            try:
+                document = json.loads(line)
+            except ValueError as e:
+                self.error(offset, "not a JSON document: {}".format(e))
+                continue
+            self.documents += 1
+            errors = []
+            check_structure(document, self.schema, "", errors, self.optional)
+            for message in errors:
+                self.error(offset, message)
+            if len(errors) == 0:
+                offsets.append(offset)
+                documents.append(document)
+        if len(documents) == 0:
+            return
+        for i, forced in enumerate(self.forced):
+            self.forced_matches[i] += int(
+                np.count_nonzero(forced.document_matches(documents))
+            )
+        for i, unique in enumerate(self.unique):
+            values = np.array(
+                [get_value(document, unique.path) for document in documents],
+                dtype=np.int64,
+            )
+            self._add_unique(i, values, offsets)
+
+    def _add_unique(self, i, values, offsets):
+        name = ".".join(self.unique[i].path)
+        outside = (values < 0) | (values >= self.num_samples)
+        self.errors_at(
+            np.flatnonzero(outside),
+            lambda j: (
+                offsets[j],
+                "{}: {} is not a document number".format(name, values[j]),
+            ),
+        )
+        inside = np.flatnonzero(~outside)
+        values = values[inside]
+        numbers, first, counts = np.unique(
+            values, return_index=True, return_counts=True
+        )
+        positions, bits = numbers >> 3, np.left_shift(1, numbers & 7).astype(np.uint8)
+        seen = (self.unique_seen[i][positions] & bits) != 0
+        # A number found again in this batch or in an earlier one
+        self.errors_at(
+            np.flatnonzero((counts > 1) | seen),
+            lambda j: (
+                offsets[inside[first[j]]],
+                "{}: document number {} occurs more than once".format(name, numbers[j]),
+            ),
+        )
+        np.bitwise_or.at(self.unique_seen[i], positions, bits)
+
+    def merge(self, other):
+        self.documents += other.documents
+        self.num_errors += other.num_errors
+        self.errors = sorted(
+            self.errors + other.errors, key=lambda e: (e[0] is None, e[0] or 0)
+        )[:MAX_ERRORS]
+        for i in range(len(self.forced)):
+            self.forced_matches[i] += other.forced_matches[i]
+        for i, unique in enumerate(self.unique):
+            both = np.flatnonzero(
+                np.unpackbits(
+                    self.unique_seen[i] & other.unique_seen[i], bitorder="little"
+                )
+            )
+            self.errors_at(
+                both,
+                lambda number: (
+                    None,
+                    "{}: document number {} occurs more than once".format(
+                        ".".join(unique.path), number
+                    ),
+                ),
+            )
+            self.unique_seen[i] |= other.unique_seen[i]
+
+    def finish(self, forced_counts):
+        """
+        Checks the totals of all data
+
+        Args:
+            forced_counts: Number of matches per forced path of the manifest
+        """
+        if self.documents != self.num_samples:
+            self.error(
+                None,
+                "expected {} documents, found {}".format(
+                    self.num_samples, self.documents
+                ),
+            )
+        for forced, matches in zip(self.forced, self.forced_matches):
+            expected = forced_counts[forced.index]
+            if expected is not None and matches != expected:
+                self.error(
+                    None,
+                    "{} {} {}: expected {} matches, found {}".format(
+                        ".".join(forced.path),
+                        forced.operator,
+                        json.dumps(forced.value),
+                        expected,
+                        matches,
+                    ),
+                )
+        for unique, seen in zip(self.unique, self.unique_seen):
+            missing = self.num_samples - int(
+                np.count_nonzero(np.unpackbits(seen, bitorder="little"))
+            )
+            if missing > 0:
+                self.error(
+                    None,
+                    "{}: {} document numbers missing".format(
+                        ".".join(unique.path), missing
+                    ),
+                )
+
+    def report(self, forced_counts):
+        return {
+            "valid": self.num_errors == 0,
+            "documents": self.documents,
+            "num_errors": self.num_errors,
+            "errors": [
+                message if offset is None else "byte {}: {}".format(offset, message)
+                for offset, message in self.errors
+            ],
+            "forced": [
+                {
+                    "path": forced.path,
+                    "operator": forced.operator,
+                    "value": forced.value,
+                    "expected": forced_counts[forced.index],
+                    "matches": matches,
+                }
+                for forced, matches in zip(self.forced, self.forced_matches)
+            ],
+        }
+
+
+def validate_range(data_path, manifest, start, end, batch_size):
+    validation = Validation(manifest)
+    batch = []
+    for offset, line in iter_lines(data_path, start, end):
+        batch.append((offset, line))
+        if len(batch) >= batch_size:
+            validation.add(batch)
+            batch = []
+    validation.add(batch)
+    return validation
+
+
+def _validate_range_worker(args):
+    return validate_range(*args)
+
+
+def validate_dataset(data_path, manifest, num_proc=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Returns the validation report of the data of a workbook
+
+    Args:
+        manifest: Manifest of the workbook, see pipeline.write_manifest
+    """
+    if not manifest["complete"]:
+        raise RuntimeError("Data generation of {} is incomplete".format(data_path))
+    jobs = [
+        (data_path, manifest, start, end, batch_size)
+        for start, end in byte_ranges(data_path, num_proc)
+    ]
+    if num_proc == 1:
+        validations = [_validate_range_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(num_proc) as pool:
+            validations = pool.map(_validate_range_worker, jobs)
+    validation = validations[0]
+    for other in validations[1:]:
+        validation.merge(other)
+    validation.finish(manifest["forced_counts"])
+    return validation.report(manifest["forced_counts"])
+
+
+def workbook_data_path(workbook_dir):
+    """
+    Returns the path of the data of a workbook, the only json file of its data
+    directory
+    """
+    data_dir = os.path.join(workbook_dir, "data")
+    data_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))
+    if len(data_files) != 1:
+        raise RuntimeError(
+            "Expected one data file in {}, found {}".format(data_dir, data_files)
+        )
+    return os.path.join(data_dir, data_files[0])
+
+
+def getArgParser():
+    parser = argparse.ArgumentParser(
+        prog="json_data_and_query_generator validate",
+        description="Validate the generated data of a workbook against the schema and the forced counts of its manifest",
+    )
+    parser.add_argument(
+        "--workbook",
+        "-w",
+        help="Path to the workbook directory, eg <output>/<workbook>",
+        required=True,
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help='Path of the JSON report. Defaults to "-" (stdout)',
+        default="-",
+    )
+    parser.add_argument(
+        "--num-proc",
+        help="Number of processes validating the data. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Number of documents validated at once. Defaults to {}".format(
+            DEFAULT_BATCH_SIZE
+        ),
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    return parser
+
+
+def main(arguments):
+    args = getArgParser().parse_args(arguments)
+    if args.num_proc < 1 or args.batch_size < 1:
+        raise RuntimeError("Number of processes and batch size must be positive")
+    with open(os.path.join(args.workbook, MANIFEST_FILENAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    report = validate_dataset(
+        workbook_data_path(args.workbook), manifest, args.num_proc, args.batch_size
+    )
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w", encoding="utf8") as report_file:
+            json.dump(report, report_file, indent=4)
+    if not report["valid"]:
+        sys.stderr.write(
+            "Validation failed with {} errors:\n{}\n".format(
+                report["num_errors"], "\n".join(report["errors"])
+            )
+        )
+        sys.exit(1)
@@ -0,0 +1,887 @@
+"""
+Reference evaluator of the generated queries.
+
+Executes the SQL subset emitted by the query generator (projections of paths, the
+UNARY, BINARY and AGGREGATE functions, WHERE with AND/OR, LIMIT) over the
+generated JSONL data and writes the expected result of every query: the number
+of documents matching the where clause, the number of result rows and a checksum
+of the rows.
+
+The data is scanned in a single streaming pass, split into byte ranges over
+processes. Every batch of documents is parsed once, only the paths the queries
+reference are extracted into numpy columns and all queries are evaluated on
+these columns. Memory is bounded by the batch size.
+
+The checksum is the sum of the hashes of the rows modulo 2**64, so it does not
+depend on the order of the rows. Numbers are rounded to 6 decimals before
+hashing. A query whose LIMIT cuts its result has no defined result set and gets
+no checksum. Functions outside their domain (eg LN(0), a number function on a
+string) yield NULL.
+
+A query with aggregate functions has a single row, also when it projects plain
+expressions next to them, which the query generator emits without GROUP BY. Like
+the bare columns of SQLite, the plain expressions take their values from one of
+the matching documents: the first one in the order of the data (NULL if none
+matches). The result of such a query depends on the order of the documents.
+
+Usage:
+    python -m json_data_and_query_generator evaluate --data data/mycol.json --queries queries/query.jsonl --output expected.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import zlib
+
+import numpy as np
+
+from json_data_and_query_generator.data_scan import byte_ranges, iter_line_batches
+from json_data_and_query_generator.hashing import mix64
+from json_data_and_query_generator.offset_index import (
+    INDEX_SUFFIX,
+    IndexedRecordReader,
+)
+from json_data_and_query_generator.query_generator.query_generator import (
+    AGGREGATE_FUNCTIONS,
+)
+
+DEFAULT_BATCH_SIZE = 50000
+
+MASK64 = (1 << 64) - 1
+NULL_HASH = np.uint64(0x6A09E667F3BCC908)
+STRING_TAG = np.uint64(0x3C6EF372FE94F82B)
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<ident>"(?:[^"]|"")*")
+        |(?P<string>'(?:[^']|'')*')
+        |(?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+        |(?P<op><>|<=|>=|[=<>(),.;*+/-])
+        |(?P<word>[A-Za-z_][A-Za-z_0-9]*)
+    )""",
+    re.VERBOSE,
+)
+COMPARISONS = ["=", "<>", "<", "<=", ">", ">="]
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+######################################################
+# PARSER
+######################################################
+
+# Expressions are tuples:
+#   ("path", (field, ...)), ("literal", value), ("call", NAME, [args]),
+#   ("infix", op, lhs, rhs)
+# Conditions are tuples:
+#   ("compare", op, lhs, rhs), ("between", expr, low, high), ("in", expr, [values]),
+#   ("and", [conditions]), ("or", [conditions])
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None or match.end() == position:
+            raise QuerySyntaxError(
+                "Unexpected character at {}: {}".format(position, query[position:])
+            )
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "ident":
+            tokens.append(("ident", text[1:-1].replace('""', '"')))
+        elif kind == "string":
+            tokens.append(("literal", text[1:-1].replace("''", "'")))
+        elif kind == "number":
+            is_int = re.fullmatch(r"-?\d+", text) is not None
+            tokens.append(("literal", int(text) if is_int else float(text)))
+        elif kind == "word":
+            tokens.append(("word", text.upper()))
+        else:
+            tokens.append(("op", text))
+    return tokens
+
+
+class Query:
+    """
+    A parsed query
+
+    Attributes:
+        projections: Expressions of the select list
+        where: Condition or None
+        limit: Number of rows or None
+    """
+
+    def __init__(self, text):
+        self._tokens = tokenize(text)
+        self._position = 0
+        self._expect("word", "SELECT")
+        self.projections = [self._expression()]
+        while self._accept("op", ","):
+            self.projections.append(self._expression())
+        self._expect("word", "FROM")
+        self.collection = self._expect("ident")
+        self.where = None
+        if self._accept("word", "WHERE"):
+            self.where = self._condition()
+        self.limit = None
+        if self._accept("word", "LIMIT"):
+            self.limit = self._expect("literal")
+            if type(self.limit) is not int or self.limit < 0:
+                raise QuerySyntaxError("Invalid LIMIT {}".format(self.limit))
+        self._accept("op", ";")
+        if self._position < len(self._tokens):
+            raise QuerySyntaxError(
+                "Unexpected {} after the query".format(self._tokens[self._position][1])
+            )
+        self.projections = [self._strip_collection(p) for p in self.projections]
+        if self.where is not None:
+            self.where = self._strip_collection(self.where)
+        self.aggregate = any(self.is_aggregate(p) for p in self.projections)
+        self.referenced = self.paths()
+
+    @staticmethod
+    def is_aggregate(expression):
+        return expression[0] == "call" and expression[1] in AGGREGATE_FUNCTIONS
+
+    def paths(self):
+        """
+        Returns the set of paths referenced by the query
+        """
+        paths = set()
+
+        def visit(node):
+            if isinstance(node, tuple) and len(node) > 0 and node[0] == "path":
+                paths.add(node[1])
+            elif isinstance(node, (tuple, list)):
+                for child in node:
+                    visit(child)
+
+        visit(self.projections)
+        visit(self.where)
+        return paths
+
+    def _strip_collection(self, node):
+        """
+        Paths are written with the collection as first field
+        """
+        if not isinstance(node, (tuple, list)):
+            return node
+        if isinstance(node, tuple) and len(node) > 0 and node[0] == "path":
+            fields = node[1]
+            if len(fields) > 1 and fields[0] == self.collection:
+                fields = fields[1:]
+            return ("path", fields)
+        stripped = [self._strip_collection(child) for child in node]
+        return tuple(stripped) if isinstance(node, tuple) else stripped
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return (None, None)
+
+    def _accept(self, kind, text=None):
+        token = self._peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self._position += 1
+            return True
+        return False
+
+    def _expect(self, kind, text=None):
+        token = self._peek()
+        if token[0] != kind or (text is not None and token[1] != text):
+            raise QuerySyntaxError(
+                "Expected {} but found {}".format(text or kind, token[1])
+            )
+        self._position += 1
+        return token[1]
+
+    def _condition(self):
+        terms = [self._conjunction()]
+        while self._accept("word", "OR"):
+            terms.append(self._conjunction())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def _conjunction(self):
+        terms = [self._predicate()]
+        while self._accept("word", "AND"):
+            terms.append(self._predicate())
+        return terms[0] if len(terms) == 1 else ("and", terms)
+
+    def _predicate(self):
+        if self._peek() == ("op", "("):
+            # Either a parenthesized condition or an expression
+            start = self._position
+            self._position += 1
+            try:
+                condition = self._condition()
+                self._expect("op", ")")
+                return condition
+            except QuerySyntaxError:
+                self._position = start
+        lhs = self._expression()
+        if self._accept("word", "BETWEEN"):
+            low = self._expression()
+            self._expect("word", "AND")
+            return ("between", lhs, low, self._expression())
+        if self._accept("word", "IN"):
+            self._expect("op", "(")
+            values = [self._expect("literal")]
+            while self._accept("op", ","):
+                values.append(self._expect("literal"))
+            self._expect("op", ")")
+            return ("in", lhs, values)
+        token = self._peek()
+        if token[0] == "op" and token[1] in COMPARISONS:
+            self._position += 1
+            return ("compare", token[1], lhs, self._expression())
+        raise QuerySyntaxError("Expected a comparison but found {}".format(token[1]))
+
+    def _expression(self):
+        lhs = self._term()
+        while self._peek()[0] == "op" and self._peek()[1] in ["+", "-"]:
+            op = self._expect("op")
+            lhs = ("infix", op, lhs, self._term())
+        return lhs
+
+    def _term(self):
+        lhs = self._factor()
+        while self._peek()[0] == "op" and self._peek()[1] in ["*", "/"]:
+            op = self._expect("op")
+            lhs = ("infix", op, lhs, self._factor())
+        return lhs
+
+    def _factor(self):
+        kind, text = self._peek()
+        if kind == "literal":
+            self._position += 1
+            return ("literal", text)
+        if kind == "ident":
+            fields = [self._expect("ident")]
+            while self._accept("op", "."):
+                fields.append(self._expect("ident"))
+            return ("path", tuple(fields))
+        if kind == "word" and text in ["TRUE", "FALSE", "NULL"]:
+            self._position += 1
+            return ("literal", {"TRUE": True, "FALSE": False, "NULL": None}[text])
+        if kind == "word":
+            self._position += 1
+            self._expect("op", "(")
+            args = [self._expression()]
+            while self._accept("op", ","):
+                args.append(self._expression())
+            self._expect("op", ")")
+            return ("call", text, args)
+        if self._accept("op", "("):
+            expression = self._expression()
+            self._expect("op", ")")
+            return expression
+        raise QuerySyntaxError("Unexpected {}".format(text))
+
+
+######################################################
+# COLUMNS
+######################################################
+
+
+class Column:
+    """
+    Values of an expression for a batch of documents.
+
+    kind is "number" (float64 values), "string" or "object" (object values, any
+    JSON value). valid is False where the value is NULL or the path is missing.
+    """
+
+    __slots__ = ("kind", "values", "valid")
+
+    def __init__(self, kind, values, valid):
+        self.kind = kind
+        self.values = values
+        self.valid = valid
+
+    def take(self, rows):
+        return Column(self.kind, self.values[rows], self.valid[rows])
+
+
+def make_column(values):
+    """
+    Builds the column of a list of JSON values (None for missing values)
+    """
+    valid = np.array([v is not None for v in values], dtype=bool)
+    types = set(type(v) for v in values)
+    types.discard(type(None))
+    if types <= {int, float}:
+        return Column(
+            "number",
+            np.array(
+                [v if v is not None else np.nan for v in values], dtype=np.float64
+            ),
+            valid,
+        )
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return Column("string" if types == {str} else "object", column, valid)
+
+
+def constant_column(value, n):
+    return make_column([value] * n)
+
+
+def get_value(document, path):
+    for key in path:
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def number_view(column):
+    """
+    Returns the numeric values of a column and where they are valid numbers
+    """
+    if column.kind == "number":
+        return column.values, column.valid
+    is_number = (
+        np.array([type(v) in (int, float) for v in column.values], dtype=bool)
+        & column.valid
+    )
+    values = np.full(len(column.values), np.nan)
+    values[is_number] = column.values[is_number].astype(np.float64)
+    return values, is_number
+
+
+def column_value(column, i):
+    """
+    Returns the JSON value of row i of a column, None for NULL
+    """
+    if not column.valid[i]:
+        return None
+    value = column.values[i]
+    return float(value) if column.kind == "number" else value
+
+
+def string_view(column):
+    """
+    Returns the string values of a column and where they are valid strings
+    """
+    if column.kind == "string":
+        return column.values, column.valid
+    is_string = (
+        np.array([type(v) is str for v in column.values], dtype=bool) & column.valid
+    )
+    return column.values, is_string
+
+
+def boolean_view(column):
+    """
+    Returns the boolean values of a column and where they are valid booleans
+    """
+    is_boolean = (
+        np.array([type(v) is bool for v in column.values], dtype=bool) & column.valid
+    )
+    return np.array([v is True for v in column.values], dtype=bool), is_boolean
+
+
+def number_result(values, valid):
+    with np.errstate(all="ignore"):
+        valid = valid & np.isfinite(values)
+    return Column("number", np.where(valid, values, np.nan), valid)
+
+
+def to_varchar(column):
+    def convert(v):
+        if type(v) is str:
+            return v
+        # The values of number columns are numpy floats
+        if isinstance(v, (int, float)) and type(v) is not bool:
+            return str(int(v)) if float(v).is_integer() else repr(float(v))
+        return json.dumps(v)
+
+    values = np.empty(len(column.values), dtype=object)
+    values[:] = [
+        convert(v) if ok else None for v, ok in zip(column.values, column.valid)
+    ]
+    return Column("string", values, column.valid.copy())
+
+
+UNARY_NUMBER_FUNCTIONS = {
+    "ABS": np.abs,
+    "ACOS": np.arccos,
+    "ASIN": np.arcsin,
+    "ATAN": np.arctan,
+    "COS": np.cos,
+    "LN": np.log,
+    "SIN": np.sin,
+    "TAN": np.tan,
+    "TO_DOUBLE": lambda x: x,
+    "TO_BIGINT": np.trunc,
+}
+
+UNARY_STRING_FUNCTIONS = {
+    "LENGTH": lambda s: float(len(s)),
+    "LOWER": str.lower,
+    "UPPER": str.upper,
+}
+
+
+def binary_number_function(name, lhs, rhs):
+    with np.errstate(all="ignore"):
+        if name == "+":
+            return lhs + rhs
+        if name == "-":
+            return lhs - rhs
+        if name == "*":
+            return lhs * rhs
+        if name == "/":
+            return np.where(rhs != 0, lhs / np.where(rhs != 0, rhs, 1), np.nan)
+        if name == "MOD":
+            return np.where(rhs != 0, np.fmod(lhs, np.where(rhs != 0, rhs, 1)), np.nan)
+        if name == "POWER":
+            return np.power(lhs, rhs)
+        if name == "ATAN2":
+            return np.arctan2(lhs, rhs)
+        if name == "LOG":
+            # LOG(base, number)
+            return np.log(rhs) / np.log(lhs)
+        if name == "ROUND":
+            scale = np.power(10.0, np.trunc(rhs))
+            return np.round(lhs * scale) / scale
+    raise QuerySyntaxError("Unknown function {}".format(name))
+
+
+def evaluate(expression, columns, n):
+    """
+    Evaluates an expression on a batch of n documents
+
+    Args:
+        columns: Dictionary path -> Column of the batch
+    """
+    kind = expression[0]
+    if kind == "path":
+        return columns[expression[1]]
+    if kind == "literal":
+        return constant_column(expression[1], n)
+    if kind == "infix":
+        lhs, lhs_valid = number_view(evaluate(expression[2], columns, n))
+        rhs, rhs_valid = number_view(evaluate(expression[3], columns, n))
+        return number_result(
+            binary_number_function(expression[1], lhs, rhs), lhs_valid & rhs_valid
+        )
+    name, args = expression[1], expression[2]
+    if name in UNARY_NUMBER_FUNCTIONS:
+        values, valid = number_view(evaluate(args[0], columns, n))
+        with np.errstate(all="ignore"):
+            return number_result(UNARY_NUMBER_FUNCTIONS[name](values), valid)
+    if name in UNARY_STRING_FUNCTIONS:
+        values, valid = string_view(evaluate(args[0], columns, n))
+        fct = UNARY_STRING_FUNCTIONS[name]
+        result = [fct(v) if ok else None for v, ok in zip(values, valid)]
+        if name == "LENGTH":
+            return number_result(
+                np.array([np.nan if r is None else r for r in result]), valid
+            )
+        column = np.empty(n, dtype=object)
+        column[:] = result
+        return Column("string", column, valid)
+    if name == "TO_VARCHAR":
+        return to_varchar(evaluate(args[0], columns, n))
+    if name == "CONCAT":
+        lhs = to_varchar(evaluate(args[0], columns, n))
+        rhs = to_varchar(evaluate(args[1], columns, n))
+        valid = lhs.valid & rhs.valid
+        column = np.empty(n, dtype=object)
+        column[:] = [
+            a + b if ok else None for a, b, ok in zip(lhs.values, rhs.values, valid)
+        ]
+        return Column("string", column, valid)
+    if len(args) == 2:
+        lhs, lhs_valid = number_view(evaluate(args[0], columns, n))
+        rhs, rhs_valid = number_view(evaluate(args[1], columns, n))
+        return number_result(
+            binary_number_function(name, lhs, rhs), lhs_valid & rhs_valid
+        )
+    raise QuerySyntaxError("Unknown function {}".format(name))
+
+
+def compare(op, lhs, rhs):
+    """
+    Returns where 'lhs op rhs' is true. NULLs and values of different types
+    never compare true.
+    """
+    if lhs.kind == "number" or rhs.kind == "number":
+        return compare_views(op, *number_view(lhs), *number_view(rhs))
+    result = compare_views(op, *string_view(lhs), *string_view(rhs))
+    if lhs.kind == "object" and rhs.kind == "object":
+        # Booleans only compare with booleans, eg in 'flag = TRUE'
+        result |= compare_views(op, *boolean_view(lhs), *boolean_view(rhs))
+    return result
+
+
+def compare_views(op, a, a_valid, b, b_valid):
+    valid = a_valid & b_valid
+    result = np.zeros(len(valid), dtype=bool)
+    if not valid.any():
+        return result
+    a, b = a[valid], b[valid]
+    if op == "=":
+        result[valid] = a == b
+    elif op == "<>":
+        result[valid] = a != b
+    elif op == "<":
+        result[valid] = a < b
+    elif op == "<=":
+        result[valid] = a <= b
+    elif op == ">":
+        result[valid] = a > b
+    elif op == ">=":
+        result[valid] = a >= b
+    return result
+
+
+def evaluate_condition(condition, columns, n):
+    """
+    Returns the mask of the documents for which the condition is true
+    """
+    kind = condition[0]
+    if kind == "and":
+        mask = np.ones(n, dtype=bool)
+        for term in condition[1]:
+            mask &= evaluate_condition(term, columns, n)
+        return mask
+    if kind == "or":
+        mask = np.zeros(n, dtype=bool)
+        for term in condition[1]:
+            mask |= evaluate_condition(term, columns, n)
+        return mask
+    lhs = evaluate(condition[1] if kind != "compare" else condition[2], columns, n)
+    if kind == "compare":
+        return compare(condition[1], lhs, evaluate(condition[3], columns, n))
+    if kind == "between":
+        return compare(">=", lhs, evaluate(condition[2], columns, n)) & compare(
+            "<=", lhs, evaluate(condition[3], columns, n)
+        )
+    if kind == "in":
+        mask = np.zeros(n, dtype=bool)
+        for value in condition[2]:
+            mask |= compare("=", lhs, constant_column(value, n))
+        return mask
+    raise QuerySyntaxError("Unknown condition {}".format(kind))
+
+
+######################################################
+# CHECKSUMS
+######################################################
+
+
+def hash_column(column):
+    """
+    Returns the uint64 hash of every value of a column
+    """
+    hashes = np.full(len(column.valid), NULL_HASH, dtype=np.uint64)
+    numbers, is_number = number_view(column)
+    if is_number.any():
+        values = np.round(numbers[is_number], 6) + 0.0  # -0.0 -> 0.0
+        hashes[is_number] = mix64(values.view(np.uint64))
+    others = np.flatnonzero(column.valid & ~is_number)
+    if len(others) > 0:
+        encoded = [
+            (v if type(v) is str else json.dumps(v, sort_keys=True)).encode("utf8")
+            for v in column.values[others]
+        ]
+        hashes[others] = mix64(
+            np.array(
+                [zlib.crc32(data) | (len(data) << 32) for data in encoded],
+                dtype=np.uint64,
+            )
+            ^ STRING_TAG
+        )
+    return hashes
+
+
+def hash_rows(columns):
+    """
+    Returns the uint64 hash of every row of the projected columns
+    """
+    n = len(columns[0].valid) if len(columns) > 0 else 0
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j, column in enumerate(columns):
+        with np.errstate(over="ignore"):
+            hashes = mix64(hashes ^ mix64(hash_column(column) + np.uint64(j)))
+    return hashes
+
+
+######################################################
+# EVALUATION
+######################################################
+
+
+class QueryState:
+    """
+    Partial result of a query over a part of the data, see merge
+    """
+
+    def __init__(self, query):
+        self.matches = 0
+        self.checksum = 0
+        # Per projection of an aggregate query: count, sum, min, max, None for
+        # the plain projections
+        self.aggregates = None
+        # Values of the plain projections of an aggregate query on the first
+        # matching document
+        self.first = None
+        if query is not None and query.aggregate:
+            self.aggregates = [
+                [0, 0.0, None, None] if query.is_aggregate(p) else None
+                for p in query.projections
+            ]
+
+    def add(self, query, columns, n):
+        mask = (
+            evaluate_condition(query.where, columns, n)
+            if query.where is not None
+            else np.ones(n, dtype=bool)
+        )
+        rows = np.flatnonzero(mask)
+        self.matches += len(rows)
+        if len(rows) == 0:
+            return
+        matching = {path: columns[path].take(rows) for path in query.referenced}
+        if self.aggregates is None:
+            projected = [evaluate(p, matching, len(rows)) for p in query.projections]
+            row_hashes = hash_rows(projected)
+            self.checksum = (
+                self.checksum + int(row_hashes.sum(dtype=np.uint64))
+            ) & MASK64
+            return
+        if self.first is None:
+            first = {path: column.take([0]) for path, column in matching.items()}
+            self.first = [
+                None if state is not None else column_value(evaluate(p, first, 1), 0)
+                for state, p in zip(self.aggregates, query.projections)
+            ]
+        for state, projection in zip(self.aggregates, query.projections):
+            if state is None:
+                continue
+            values, valid = number_view(evaluate(projection[2][0], matching, len(rows)))
+            values = values[valid]
+            if len(values) == 0:
+                continue
+            state[0] += len(values)
+            state[1] += float(values.sum())
+            low, high = float(values.min()), float(values.max())
+            state[2] = low if state[2] is None else min(state[2], low)
+            state[3] = high if state[3] is None else max(state[3], high)
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.checksum = (self.checksum + other.checksum) & MASK64
+        if self.aggregates is not None:
+            # The parts of the data are merged in order
+            if self.first is None:
+                self.first = other.first
+            for state, other_state in zip(self.aggregates, other.aggregates):
+                if state is None:
+                    continue
+                state[0] += other_state[0]
+                state[1] += other_state[1]
+                for i, fct in [(2, min), (3, max)]:
+                    if other_state[i] is not None:
+                        state[i] = (
+                            other_state[i]
+                            if state[i] is None
+                            else fct(state[i], other_state[i])
+                        )
+
+    def result(self, query):
+        """
+        Returns the expected result: matching documents, rows and checksum
+        """
+        limit = query.limit
+        if self.aggregates is not None:
+            row = []
+            for j, (state, projection) in enumerate(
+                zip(self.aggregates, query.projections)
+            ):
+                if state is None:
+                    row.append(None if self.first is None else self.first[j])
+                    continue
+                count, total, low, high = state
+                row.append(
+                    {
+                        "COUNT": count,
+                        "SUM": total if count > 0 else None,
+                        "AVG": total / count if count > 0 else None,
+                        "MIN": low,
+                        "MAX": high,
+                    }[projection[1]]
+                )
+            rows = 1 if limit is None or limit > 0 else 0
+            checksum = (
+                int(hash_rows([make_column([v]) for v in row]).sum()) if rows else 0
+            )
+            return {
+                "matches": self.matches,
+                "rows": rows,
+                "checksum": "{:016x}".format(checksum),
+                "values": row,
+            }
+        if limit is not None and self.matches > limit:
+            return {"matches": self.matches, "rows": limit, "checksum": None}
+        return {
+            "matches": self.matches,
+            "rows": self.matches,
+            "checksum": "{:016x}".format(self.checksum),
+        }
+
+
+def evaluate_range(data_path, queries, start, end, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Evaluates the parsed queries (None for queries that failed to parse) on the
+    documents of a byte range of the data. Returns a QueryState per query.
+    """
+    states = [QueryState(query) for query in queries]
+    paths = set()
+    for query in queries:
+        if query is not None:
+            paths |= query.paths()
+    for lines in iter_line_batches(data_path, start, end, batch_size):
+        documents = [json.loads(line) for line in lines]
+        columns = {
+            path: make_column([get_value(d, path) for d in documents]) for path in paths
+        }
+        for query, state in zip(queries, states):
+            if query is not None:
+                state.add(query, columns, len(documents))
+    return states
+
+
+def _evaluate_range_worker(args):
+    return evaluate_range(*args)
+
+
+def read_queries(path):
+    """
+    Returns the (query id, query) pairs of a query output of the query generator:
+    a directory of .sql files, a .sql file or a .jsonl file
+    """
+    if os.path.isdir(path):
+        queries = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".sql"):
+                with open(os.path.join(path, name), encoding="utf8") as query_file:
+                    queries.append((name[: -len(".sql")], query_file.read()))
+        return queries
+    if os.path.exists(path + INDEX_SUFFIX):
+        # The records of the batched outputs are read through their offset index,
+        # as a query may span several lines
+        with IndexedRecordReader(path) as reader:
+            records = [reader[i].decode("utf8") for i in range(len(reader))]
+    else:
+        with open(path, encoding="utf8") as query_file:
+            records = [line for line in query_file if line.strip()]
+    if path.endswith(".jsonl"):
+        records = [json.loads(record) for record in records]
+        return [(r["query_id"], r["query"]) for r in records]
+    return [(str(i), record.strip()) for i, record in enumerate(records)]
+
+
+def evaluate_queries(data_path, queries, num_proc=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Evaluates (query id, query) pairs on the data
+
+    Returns:
+        A result dictionary per query, see QueryState.result. Queries outside
+        the supported subset get an "error" instead.
+    """
+    parsed, errors = [], []
+    for _, text in queries:
+        try:
+            parsed.append(Query(text))
+            errors.append(None)
+        except QuerySyntaxError as e:
+            parsed.append(None)
+            errors.append(str(e))
+
+    ranges = byte_ranges(data_path, num_proc)
+    jobs = [(data_path, parsed, start, end, batch_size) for start, end in ranges]
+    if num_proc == 1:
+        partial = [_evaluate_range_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(num_proc) as pool:
+            partial = pool.map(_evaluate_range_worker, jobs)
+
+    results = []
+    for i, ((query_id, _), query, error) in enumerate(zip(queries, parsed, errors)):
+        if query is None:
+            results.append({"query_id": query_id, "error": error})
+            continue
+        state = QueryState(query)
+        for states in partial:
+            state.merge(states[i])
+        result = {"query_id": query_id}
+        result.update(state.result(query))
+        results.append(result)
+    return results
+
+
+def getArgParser():
+    parser = argparse.ArgumentParser(
+        prog="json_data_and_query_generator evaluate",
+        description="Compute the expected results of generated queries",
+    )
+    parser.add_argument(
+        "--data", help="Path to the generated JSONL data", required=True
+    )
+    parser.add_argument(
+        "--queries",
+        help="Generated queries: a directory of .sql files, a .sql or a .jsonl file",
+        required=True,
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help='Path of the JSONL file with the expected results. Defaults to "-" (stdout)',
+        default="-",
+    )
+    parser.add_argument(
+        "--num-proc",
+        help="Number of processes scanning the data. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Number of documents evaluated at once. Defaults to {}".format(
+            DEFAULT_BATCH_SIZE
+        ),
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    return parser
+
+
+def write_results(results, output):
+    output_file = sys.stdout if output == "-" else open(output, "w", encoding="utf8")
+    try:
+        for result in results:
+            output_file.write(json.dumps(result) + "\n")
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+def main(arguments):
+    args = getArgParser().parse_args(arguments)
+    if args.num_proc < 1 or args.batch_size < 1:
+        raise RuntimeError("Number of processes and batch size must be positive")
+    results = evaluate_queries(
+        args.data, read_queries(args.queries), args.num_proc, args.batch_size
+    )
+    write_results(results, args.output)
@@ -1,13 +1,35 @@
 import argparse
+import ast
 import json
 import itertools
 import os
 import re
 import copy
 import random
-from jinjasql import JinjaSql
+import sys
+import time
+import numpy as np
 
 from json_data_and_query_generator.feasibility import feasibility_matrix as fsb
+from json_data_and_query_generator.data_generators.faker_generator.arrays import (
+    is_array,
+    unwrap_array,
+)
+from json_data_and_query_generator.data_generators.faker_generator.forced_values import (
+    UNIQUE_VALUE_TYPE,
+)
+from json_data_and_query_generator.data_generators.faker_generator.typed_values import (
+    matrix_types,
+)
+from json_data_and_query_generator.data_generators.faker_generator.value_sample import (
+    ValueSample,
+    count_values,
+)
+from json_data_and_query_generator.query_generator.query_writer import (
+    QUERY_OUTPUT_FORMATS,
+    FileQueryWriter,
+    create_query_writer,
+)
 
 AGGREGATE_FUNCTIONS = ["COUNT", "SUM", "AVG", "MIN", "MAX"]
 UNARY_FUNCTIONS = [
@@ -49,6 +71,268 @@ STANDARD_PLACEHOLDERS = {
     "BINARY_FCT_PREFIX": BINARY_FUNCTIONS_PREFIX,
     "BINARY_FCT_INFIX": BINARY_FUNCTIONS_INFIX,
 }
+# Characters that break the one query per line outputs
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]")
+
+
+def query_seed(seed, query_index):
+    """
+    Seed of the query with the given number
+    """
+    return int(np.random.SeedSequence([seed, query_index]).generate_state(1)[0])
+
+
+def generate_schema_based_queries(
+    generator,
+    output_dir,
+    query_base_name,
+    writer,
+    start=0,
+    stop=None,
+    progress=None,
+    do_print=False,
+    do_print_only=False,
+):
+    """
+    Generates and outputs the queries start..stop-1 of a SchemaBasedGenerator
+
+    Args:
+        generator: SchemaBasedGenerator
+        output_dir: Abs path where to create the queries
+        query_base_name: Base name for the generated queries, query i gets the
+            template id '<query_base_name>_<i>'
+        writer: Query writer (see query_writer)
+    """
+    for i, c in enumerate(generator.iter_configs(start, stop), start):
+        g = StandaloneGenerator(
+            c,
+            output_dir,
+            "{}_{}".format(query_base_name, i),
+            do_print,
+            do_print_only,
+            progress,
+            writer,
+        )
+        g.run()
+
+
+def schema_paths(schema):
+    """
+    Flattens a schema generated by the data generator (see schema.txt) into path
+    info objects like the forcedPaths of the schema config. Arrays get their
+    lengths in their path name as in the schema config (see arrays), eg
+    {"a": {"b": "word"}, "arr": [{"c": "text"}, {"c": "text"}]} ->
+    [{"path": ["a", "b"], "valueType": "word"},
+     {"path": ["arr[2]", "c"], "valueType": "text"}]
+    """
+    paths = []
+
+    def iter_schema(d, path):
+        for k, v in d.items():
+            if is_array(v):
+                lengths, item = unwrap_array(v)
+                key = k + "".join("[{}]".format(length) for length in lengths)
+                if isinstance(item, dict):
+                    iter_schema(item, path + [key])
+                elif item is not None:
+                    paths.append({"path": path + [key], "valueType": item})
+            elif isinstance(v, dict):
+                iter_schema(v, path + [k])
+            else:
+                paths.append({"path": path + [k], "valueType": v})
+
+    iter_schema(schema, [])
+    return paths
+
+
+def has_control_characters(value):
+    """
+    Returns whether a value is a string with line breaks or other control
+    characters, which cannot be written into a single line SQL literal
+    """
+    return isinstance(value, str) and CONTROL_CHARACTERS.search(value) is not None
+
+
+def sql_literal(value):
+    """
+    Returns the SQL literal of a value sampled from the data
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def load_schema(schema_filepath):
+    """
+    Reads a schema.txt written by the data generator
+    """
+    with open(schema_filepath, encoding="utf8") as schema_file:
+        return ast.literal_eval(schema_file.read())
+
+
+class PathRecord:
+    """
+    A path of the schema config with everything the clause builders need,
+    computed once per generator
+    """
+
+    __slots__ = (
+        "index",
+        "path",
+        "type",
+        "expr",
+        "array_depth",
+        "operator",
+        "value",
+        "num",
+        "sampled_values",
+    )
+
+    def __init__(
+        self,
+        index,
+        path,
+        type,
+        expr,
+        array_depth,
+        operator,
+        value,
+        num,
+        sampled_values,
+    ):
+        """
+        Args:
+            index: Position in the pool the record belongs to
+            path: List of field names
+            type: Type as used in the feasibility matrix
+            expr: SQL path expression
+            array_depth: Array nesting depth, 0 if the path is not an array
+            operator, value, num: Operator, value and number of matching
+                documents of the path in the schema config, None if it has none
+            sampled_values: List of (value, count) sampled from the
+                generated data or None
+        """
+        self.index = index
+        self.path = path
+        self.type = type
+        self.expr = expr
+        self.array_depth = array_depth
+        self.operator = operator
+        self.value = value
+        self.num = num
+        self.sampled_values = sampled_values
+
+
+class PathPool:
+    """
+    The paths a query may still use, bucketed by type.
+
+    Each bucket is a virtual array from which paths are removed by swapping them
+    with the last element, as in a Fisher-Yates shuffle. Only the positions
+    changed since the last reset are stored, so reset() does not depend on the
+    size of the pool and drawing or removing a path takes O(number of types).
+    """
+
+    __slots__ = (
+        "_records",
+        "_by_path",
+        "_buckets",
+        "_positions",
+        "_sizes",
+        "_at",
+        "_where",
+        "_removed",
+    )
+
+    def __init__(self, records):
+        """
+        Args:
+            records: PathRecords with index i at position i
+        """
+        self._records = records
+        self._by_path = {tuple(r.path): r for r in records}
+        self._buckets = {}
+        self._positions = []
+        for r in records:
+            bucket = self._buckets.setdefault(r.type, [])
+            self._positions.append(len(bucket))
+            bucket.append(r)
+        self.reset()
+
+    def reset(self):
+        """
+        Makes all paths available again
+        """
+        self._sizes = {t: len(bucket) for t, bucket in self._buckets.items()}
+        self._at = {t: {} for t in self._buckets}  # position -> bucket index
+        self._where = {t: {} for t in self._buckets}  # bucket index -> position
+        self._removed = set()
+
+    def __len__(self):
+        return sum(self._sizes.values())
+
+    def __iter__(self):
+        """
+        Yields the available paths in the order of the records
+        """
+        for r in self._records:
+            if r.index not in self._removed:
+                yield r
+
+    def size(self, type):
+        """
+        Number of available paths of the given type
+        """
+        return self._sizes.get(type, 0)
+
+    def find(self, path):
+        """
+        Returns the available record with the given list of field names or None
+        """
+        record = self._by_path.get(tuple(path))
+        if record is None or record.index in self._removed:
+            return None
+        return record
+
+    def choice(self, rng, type=None):
+        """
+        Returns a random available path, of the given type or list of types if
+        not None
+        """
+        if type is None or isinstance(type, list):
+            types = [
+                t
+                for t in self._sizes
+                if self._sizes[t] > 0 and (type is None or t in type)
+            ]
+            type = rng.choices(types, [self._sizes[t] for t in types])[0]
+        position = rng.randrange(self._sizes[type])
+        return self._buckets[type][self._at[type].get(position, position)]
+
+    def draw(self, rng, type=None):
+        """
+        Removes and returns a random available path, of the given type or list of
+        types if not None
+        """
+        record = self.choice(rng, type)
+        self.remove(record)
+        return record
+
+    def remove(self, record):
+        if record.index in self._removed:
+            raise ValueError("Path {} was already removed".format(record.path))
+        self._removed.add(record.index)
+        at = self._at[record.type]
+        where = self._where[record.type]
+        bucket_index = self._positions[record.index]
+        position = where.get(bucket_index, bucket_index)
+        last = self._sizes[record.type] - 1
+        last_bucket_index = at.get(last, last)
+        at[position] = last_bucket_index
+        where[last_bucket_index] = position
+        self._sizes[record.type] = last
 
 
 class SchemaBasedGenerator:
@@ -57,37 +341,121 @@ class SchemaBasedGenerator:
     Creates a standalone config from a schema config(used by the data generator) and it's own config
     """
 
-    def __init__(self, config, schema_config):
+    def __init__(
+        self,
+        config,
+        schema_config,
+        schema=None,
+        sampled_values=None,
+        exact_sampled_counts=False,
+    ):
         """
         Args:
             config: config
             schema_config: schema config (by data generator)
+            schema: Schema generated by the data generator (see load_schema). If
+                given, all of its paths are used for the queries unless the
+                config sets "path_pool" to "forced". Else only the forcedPaths
+                of the schema config are used.
+            sampled_values: Values sampled from the generated data, a dictionary
+                path tuple -> list of (value, count) (see
+                ValueSample.value_counts). Paths with sampled values get
+                predicates on these values in the where clause. Values with line
+                breaks or other control characters are left out, so every query
+                stays on one line.
+            exact_sampled_counts: Whether the counts of the sampled values are
+                exact (see value_sample.count_values) or estimated
+
+        Each query is annotated with its where clause predicates and the number
+        of documents they match: exact for the forced paths with operator, whose
+        values the data generator plants, exact or estimated for the sampled
+        values.
+
+        With "selectivities" under "where_clause" in the config, the where clause
+        of query i is a single range filter on a forced path of value type
+        "unique_number" that matches the (i mod number of selectivities)-th
+        selectivity exactly. No other predicates are added, since the number of
+        documents matching a combination of predicates is not known.
         """
+        self._sampled_values = {}
+        for path, values in (sampled_values or {}).items():
+            values = [(v, c) for v, c in values if not has_control_characters(v)]
+            if len(values) > 0:
+                self._sampled_values[path] = values
+        self._exact_sampled_counts = exact_sampled_counts
+        self._num_documents = schema_config.get("numSamples")
+        path_infos = schema_config["forcedPaths"]
+        if schema is not None and config.get("path_pool", "schema") == "schema":
+            path_infos = self._merge_schema_paths(path_infos, schema_paths(schema))
         self._cfg = {
             "projection_pool": [
-                x
-                for x in schema_config["forcedPaths"]
-                if self.config_to_matrix_type(x) != "array"
+                x for x in path_infos if self.config_to_matrix_type(x) != "array"
             ],
             "where_clause_pool": [
                 x
-                for x in schema_config["forcedPaths"]
-                if "operator" in x and self.config_to_matrix_type(x) != "array"
+                for x in path_infos
+                if ("operator" in x or tuple(x["path"]) in self._sampled_values)
+                and self.config_to_matrix_type(x) != "array"
+            ],
+            "selectivity_pool": [
+                x
+                for x in path_infos
+                if x["valueType"] == UNIQUE_VALUE_TYPE
+                and self.config_to_matrix_type(x) != "array"
             ],
         }
         self._cfg.update(config)
         self.insert_config_default_values()
         self.validate_config()
         self._feasibility_matrix = self.load_feasibility_matrix()
+        self._build_feasibility_index()
+        self._projection_pool = PathPool(
+            self._create_path_records(self._cfg["projection_pool"])
+        )
+        self._where_clause_pool = PathPool(
+            self._create_path_records(self._cfg["where_clause_pool"])
+        )
+        self._selectivity_paths = self._create_path_records(
+            self._cfg["selectivity_pool"]
+        )
+        self._rng = random.Random(self._cfg["seed"])
+
+    @property
+    def seed(self):
+        return self._cfg["seed"]
+
+    def _merge_schema_paths(self, forced_paths, generated_paths):
+        """
+        Returns the forced paths followed by the other paths of the generated schema
+        """
+        forced = set(tuple(x["path"]) for x in forced_paths)
+        return list(forced_paths) + [
+            x for x in generated_paths if tuple(x["path"]) not in forced
+        ]
 
     def run(self):
         """
         Returns a list of configs for the standalone generator
         """
-        standalone_configs = []
+        return list(self.iter_configs())
 
-        for _ in range(self._cfg["number_of_different_queries"]):
+    def iter_configs(self, start=0, stop=None):
+        """
+        Yields the configs for the standalone generator one by one
+
+        Query i is built with its own random generator seeded with
+        query_seed(seed, i), so it is the same no matter which range is generated.
+
+        Args:
+            start, stop: Range of query numbers to generate, defaults to all
+        """
+        if stop is None:
+            stop = self._cfg["number_of_different_queries"]
+        for i in range(start, stop):
+            self._rng = random.Random(query_seed(self._cfg["seed"], i))
+            self._query_index = i
             self._placeholder_count = 0  # Reset placeholder names
+            self._predicates = []
             placeholders = {}
 
             project = []
@@ -116,10 +484,42 @@ class SchemaBasedGenerator:
                 "template": template,
                 "combinations": self._cfg["combinations_per_query"],
                 "placeholders": placeholders,
+                "seed": self._rng.randrange(2**32),
+                "annotation": self._create_annotation(),
             }
-            standalone_configs.append(standalone_cfg)
+            yield standalone_cfg
 
-        return standalone_configs
+    def _create_annotation(self):
+        """
+        Returns the predicates of the where clause with the number of documents
+        they match and the number of documents matching the whole where clause if
+        it is known exactly
+        """
+        matches = None
+        if len(self._predicates) == 0:
+            matches = self._num_documents
+        elif len(self._predicates) == 1 and self._predicates[0]["exact"]:
+            matches = self._predicates[0]["matches"]
+        for predicate in self._predicates:
+            predicate["selectivity"] = (
+                predicate["matches"] / float(self._num_documents)
+                if self._num_documents
+                else None
+            )
+        return {
+            "documents": self._num_documents,
+            "matches": matches,
+            "predicates": self._predicates,
+        }
+
+    def _add_predicate(self, predicate, matches, exact, **extra):
+        """
+        Records a predicate of the where clause for the annotation and returns it
+        """
+        self._predicates.append(
+            dict({"predicate": predicate, "matches": matches, "exact": exact}, **extra)
+        )
+        return predicate
 
     def _should_generate_where_clause(self):
         forced_paths_in_where_clause = (
@@ -130,14 +530,21 @@ class SchemaBasedGenerator:
             "number_total"
         ][1]
 
-        if forced_paths_in_where_clause or max_random_in_where_clause > 0:
-            return random.random() <= self._cfg["where_clause"]["probability"]
+        if (
+            forced_paths_in_where_clause
+            or max_random_in_where_clause > 0
+            or len(self._cfg["where_clause"]["selectivities"]) > 0
+        ):
+            return self._rng.random() <= self._cfg["where_clause"]["probability"]
         else:
             return False
 
     def _generate_where_clause(self):
         """ """
-        paths_pool = copy.deepcopy(self._cfg["where_clause_pool"])
+        if len(self._cfg["where_clause"]["selectivities"]) > 0:
+            return self._create_selectivity_filter()
+        paths_pool = self._where_clause_pool
+        paths_pool.reset()
         filters = []  # list of filter strings
 
         if (
@@ -151,7 +558,8 @@ class SchemaBasedGenerator:
 
         random_filters, _ = self._generate_where_clause_random_paths(paths_pool)
         filters += random_filters
-        operator = random.choice(self._cfg["where_clause"]["operators"])
+
+        operator = self._rng.choice(self._cfg["where_clause"]["operators"])
         return " {} ".format(operator).join(filters)
 
     def _generate_where_clause_forced_paths(self, paths_pool):
@@ -160,21 +568,15 @@ class SchemaBasedGenerator:
 
         for path_info in self._cfg["where_clause"]["forced"]:
             obj = self._get_forced_path_obj(path_info, paths_pool)
-            if not "operator" in obj:
+            if obj.operator is None:
                 raise RuntimeError(
                     "Specified where clause path is not viable as where clause: {}".format(
                         path_info
                     )
                 )
 
-            op = self.schema_cfg_op_to_str(obj["operator"])
-            lhs = self._create_path_expr(self._cfg["collection"], obj["path"])
-            rhs = obj["value"]
             paths_pool.remove(obj)
-            format_str = (
-                "{}{}'{}'" if self.config_to_matrix_type(obj) == "string" else "{}{}{}"
-            )
-            filters.append(format_str.format(lhs, op, rhs))
+            filters.append(self._create_forced_filter(obj))
 
         return filters, paths_pool
 
@@ -186,22 +588,73 @@ class SchemaBasedGenerator:
 
         selected_fields = []
         for _ in range(number_total):
-            obj = random.choice(paths_pool)
-            paths_pool.remove(obj)
-            op = self.schema_cfg_op_to_str(obj["operator"])
-            lhs = self._create_path_expr(self._cfg["collection"], obj["path"])
-            rhs = obj["value"]
-            format_str = (
-                "{}{}'{}'" if self.config_to_matrix_type(obj) == "string" else "{}{}{}"
-            )
-            selected_fields.append(format_str.format(lhs, op, rhs))
+            obj = paths_pool.draw(self._rng)
+            if obj.operator is None:
+                selected_fields.append(self._create_sampled_value_filter(obj))
+                continue
+            selected_fields.append(self._create_forced_filter(obj))
 
         return selected_fields, paths_pool
 
+    def _create_forced_filter(self, obj):
+        """
+        Creates the filter of a forced path with operator, which matches the
+        "num" documents the data generator planted
+        """
+
+        def literal(value):
+            return sql_literal(int(value) if obj.type == "number" else value)
+
+        if obj.operator == "between":
+            low, high = obj.value
+            predicate = "{} BETWEEN {} AND {}".format(
+                obj.expr, literal(low), literal(high)
+            )
+        else:
+            predicate = "{}{}{}".format(
+                obj.expr, self.schema_cfg_op_to_str(obj.operator), literal(obj.value)
+            )
+        return self._add_predicate(predicate, obj.num, True)
+
+    def _create_selectivity_filter(self):
+        """
+        Creates a range filter on a random path with unique values, which holds a
+        permutation of the document numbers, matching the target selectivity of
+        the query
+        """
+        selectivities = self._cfg["where_clause"]["selectivities"]
+        target = selectivities[self._query_index % len(selectivities)]
+        obj = self._rng.choice(self._selectivity_paths)
+        matches = max(1, int(round(target * self._num_documents)))
+        low = self._rng.randrange(self._num_documents - matches + 1)
+        predicate = "{} BETWEEN {} AND {}".format(obj.expr, low, low + matches - 1)
+        return self._add_predicate(predicate, matches, True, target_selectivity=target)
+
+    def _create_sampled_value_filter(self, obj):
+        """
+        Creates a point lookup or IN list filter on values sampled from the data,
+        so the filter matches at least one document
+        """
+        n = self.randint_from_range(
+            self._cfg["where_clause"]["in_list_size"], len(obj.sampled_values)
+        )
+        sampled = self._rng.sample(obj.sampled_values, n)
+        values = [v for v, _ in sampled]
+        if n == 1:
+            predicate = "{}={}".format(obj.expr, sql_literal(values[0]))
+        else:
+            predicate = "{} IN ({})".format(
+                obj.expr, ", ".join(sql_literal(v) for v in values)
+            )
+        return self._add_predicate(
+            predicate, sum(c for _, c in sampled), self._exact_sampled_counts
+        )
+
     def _generate_projection_clause(self, project):
         """ """
         placeholders = {}
-        paths_pool = copy.deepcopy(self._cfg["projection_pool"])
+        paths_pool = self._projection_pool
+        paths_pool.reset()
         projections = project  # list of projection strings
 
         if (
@@ -238,17 +691,13 @@ class SchemaBasedGenerator:
         number_left = number_total
         # print('Number total: {}'.format(number_total))
         fct_types = ["UNARY", "BINARY", "AGGREGATE"]
-        random.shuffle(fct_types)
+        self._rng.shuffle(fct_types)
         for fct_type in fct_types:
             # print(fct_type)
             if fct_type == "AGGREGATE":
-                viable_paths = [
-                    x for x in paths_pool if self.config_to_matrix_type(x) == "number"
-                ]
+                number_viable = paths_pool.size("number")
                 upper_bound = (
-                    len(viable_paths)
-                    if len(viable_paths) < number_left
-                    else number_left
+                    number_viable if number_viable < number_left else number_left
                 )
                 nr = self.randint_from_range(
                     self._cfg["projection"]["random"]["number_aggregate_fct"],
@@ -257,27 +706,28 @@ class SchemaBasedGenerator:
                 number_left -= nr
                 # print('Aggregate fct nr: {}'.format(nr))
                 for _ in range(nr):
-                    obj = random.choice(viable_paths)
-                    path = self._create_path_expr(self._cfg["collection"], obj["path"])
+                    obj = paths_pool.draw(self._rng, "number")
+                    path = obj.expr
                     p_name = self._get_next_placeholder_name()
                     s = "{{" + p_name + "}}" + "({})".format(path)
                     projections.append(s)
                     placeholders.update({p_name: AGGREGATE_FUNCTIONS})
-                    paths_pool.remove(obj)
-                    viable_paths.remove(obj)
             if fct_type == "UNARY":
+                # Paths of types without feasible unary functions, eg boolean
+                # in the default matrix, are left for the other projections
+                unary_types = [t for t, fcts in self._feasible_unary.items() if fcts]
                 nr = self.randint_from_range(
-                    self._cfg["projection"]["random"]["number_unary_fct"], number_left
+                    self._cfg["projection"]["random"]["number_unary_fct"],
+                    min(number_left, sum(paths_pool.size(t) for t in unary_types)),
                 )
                 number_left -= nr
                 # print('Unary fct nr: {}'.format(nr))
                 for _ in range(nr):
-                    obj = random.choice(paths_pool)
-                    paths_pool.remove(obj)
-                    obj_type = self.config_to_matrix_type(obj)
+                    obj = paths_pool.draw(self._rng, unary_types)
+                    obj_type = obj.type
                     feasible_fcts = self._find_feasible_unary_functions(obj_type)
                     assert len(feasible_fcts) > 0
-                    path = self._create_path_expr(self._cfg["collection"], obj["path"])
+                    path = obj.expr
                     p_name = self._get_next_placeholder_name()
                     s = "{{" + p_name + "}}" + "({})".format(path)
                     projections.append(s)
@@ -289,71 +739,53 @@ class SchemaBasedGenerator:
                 )
                 # print('Binary fct nr: {}'.format(nr))
                 for _ in range(nr):
-                    viable = []
-                    for lhs, rhs in itertools.product(paths_pool, paths_pool):
-                        lhs_t = self.config_to_matrix_type(lhs)
-                        rhs_t = self.config_to_matrix_type(rhs)
-                        viable_prefix_nr = len(
-                            self._find_feasible_binary_prefix_functions(lhs_t, rhs_t)
-                        )
-                        viable_infix_nr = len(
-                            self._find_feasible_binary_infix_functions(lhs_t, rhs_t)
-                        )
-                        if viable_prefix_nr > 0 or viable_infix_nr > 0:
-                            viable.append([lhs, rhs, viable_prefix_nr, viable_infix_nr])
-
-                    if len(viable) == 0:
+                    lhs_and_rhs = self._choose_viable_path_pair(paths_pool)
+                    if lhs_and_rhs is None:
                         print(
                             "WARNING: No viable path combination for binary function found"
                         )
                         break
                     number_left -= 1
 
-                    lhs_and_rhs = random.choice(viable)
-                    lhs_obj = lhs_and_rhs[0]
-                    rhs_obj = lhs_and_rhs[1]
+                    lhs_obj, rhs_obj = lhs_and_rhs
                     if lhs_obj is rhs_obj:
                         paths_pool.remove(lhs_obj)
                     else:
                         paths_pool.remove(lhs_obj)
                         paths_pool.remove(rhs_obj)
 
-                    lhs_type = self.config_to_matrix_type(lhs_obj)
-                    rhs_type = self.config_to_matrix_type(rhs_obj)
+                    lhs_type = lhs_obj.type
+                    rhs_type = rhs_obj.type
 
-                    use_infix = random.random() < float(
-                        len(BINARY_FUNCTIONS_INFIX)
-                    ) / len(BINARY_FUNCTIONS_INFIX) + len(BINARY_FUNCTIONS_PREFIX)
-                    if use_infix:
-                        feasible_fcts = self._find_feasible_binary_infix_functions(
-                            lhs_type, rhs_type
-                        )
-                    else:
-                        feasible_fcts = self._find_feasible_binary_prefix_functions(
-                            lhs_type, rhs_type
-                        )
-
-                    path_lhs = self._create_path_expr(
-                        self._cfg["collection"], lhs_obj["path"]
+                    # The pair is viable, so at least one of the lists is not
+                    # empty, eg only CONCAT is feasible for two strings
+                    feasible_infix_fcts = self._find_feasible_binary_infix_functions(
+                        lhs_type, rhs_type
+                    )
+                    feasible_prefix_fcts = self._find_feasible_binary_prefix_functions(
+                        lhs_type, rhs_type
                     )
-                    path_rhs = self._create_path_expr(
-                        self._cfg["collection"], rhs_obj["path"]
+                    use_infix = self._rng.random() < len(feasible_infix_fcts) / (
+                        len(feasible_infix_fcts) + len(feasible_prefix_fcts)
                     )
+
+                    path_lhs = lhs_obj.expr
+                    path_rhs = rhs_obj.expr
                     p_name = self._get_next_placeholder_name()
                     if use_infix:
                         s = path_lhs + "{{" + p_name + "}}" + path_rhs
-
+                        feasible_fcts = feasible_infix_fcts
                     else:
-                        s = path_lhs + "{{" + p_name + "}}" + path_rhs
+                        s = "{{" + p_name + "}}" + "({},{})".format(path_lhs, path_rhs)
+                        feasible_fcts = feasible_prefix_fcts
 
                     projections.append(s)
                     placeholders.update({p_name: feasible_fcts})
 
         # Projection with no function applied
         for _ in range(number_left):
-            obj = random.choice(paths_pool)
-            paths_pool.remove(obj)
-            path = self._create_path_expr(self._cfg["collection"], obj["path"])
+            obj = paths_pool.draw(self._rng)
+            path = obj.expr
             projections.append(path)
 
         return projections, placeholders, paths_pool
@@ -408,11 +840,11 @@ class SchemaBasedGenerator:
                     )
                 )
             lhs_obj = self._get_forced_path_obj(forced_path_info["path"][0], paths_pool)
-            lhs_type = self.config_to_matrix_type(lhs_obj)
-            lhs_path = self._create_path_expr(self._cfg["collection"], lhs_obj["path"])
+            lhs_type = lhs_obj.type
+            lhs_path = lhs_obj.expr
             rhs_obj = self._get_forced_path_obj(forced_path_info["path"][1], paths_pool)
-            rhs_type = self.config_to_matrix_type(rhs_obj)
-            rhs_path = self._create_path_expr(self._cfg["collection"], rhs_obj["path"])
+            rhs_type = rhs_obj.type
+            rhs_path = rhs_obj.expr
 
             # Single function specified: The function is fixed
             if type(forced_path_info["fct"]) is str:
@@ -482,8 +914,8 @@ class SchemaBasedGenerator:
         # Single path specified: It is a unary function
         elif type(forced_path_info["path"][0]) is str:
             obj = self._get_forced_path_obj(forced_path_info["path"], paths_pool)
-            obj_type = self.config_to_matrix_type(obj)
-            obj_path = self._create_path_expr(self._cfg["collection"], obj["path"])
+            obj_type = obj.type
+            obj_path = obj.expr
 
             # No function specified: Plain projection
             if forced_path_info["fct"] is None:
@@ -541,11 +973,11 @@ class SchemaBasedGenerator:
         # Two paths specified: It is a binary function
         if type(forced_path_info["path"][0]) is list:
             lhs_obj = self._get_forced_path_obj(forced_path_info["path"][0], paths_pool)
-            lhs_type = self.config_to_matrix_type(lhs_obj)
-            lhs_path = self._create_path_expr(self._cfg["collection"], lhs_obj["path"])
+            lhs_type = lhs_obj.type
+            lhs_path = lhs_obj.expr
             rhs_obj = self._get_forced_path_obj(forced_path_info["path"][1], paths_pool)
-            rhs_type = self.config_to_matrix_type(rhs_obj)
-            rhs_path = self._create_path_expr(self._cfg["collection"], rhs_obj["path"])
+            rhs_type = rhs_obj.type
+            rhs_path = rhs_obj.expr
 
             feasible_prefix_fcts = self._find_feasible_binary_prefix_functions(
                 lhs_type, rhs_type
@@ -557,7 +989,7 @@ class SchemaBasedGenerator:
                 raise RuntimeError(
                     "No feasible function for forced path {}".format(forced_path_info)
                 )
-            use_infix = random.random() <= len(feasible_infix_fcts) / (
+            use_infix = self._rng.random() <= len(feasible_infix_fcts) / (
                 len(feasible_infix_fcts) + len(feasible_prefix_fcts)
             )
 
@@ -576,8 +1008,8 @@ class SchemaBasedGenerator:
         # Single path specified: It's a unary function
         elif type(forced_path_info["path"][0]) is str:
             obj = self._get_forced_path_obj(forced_path_info["path"], paths_pool)
-            obj_type = self.config_to_matrix_type(obj)
-            obj_path = self._create_path_expr(self._cfg["collection"], obj["path"])
+            obj_type = obj.type
+            obj_path = obj.expr
             # Find feasible functions
             feasible_fcts = self._find_feasible_unary_functions(obj_type)
             if len(feasible_fcts) == 0:
@@ -718,64 +1150,125 @@ class SchemaBasedGenerator:
         """
         original_length = len(array)
         while len(array) < desired_length:
-            array.append(random.choice(array[:original_length]))
+            array.append(self._rng.choice(array[:original_length]))
 
         return array
 
     def _find_feasible_paths_for_unary_fct(self, f, paths_pool):
-        feasible_objs = [
-            p
-            for p in paths_pool
-            if self._is_feasible_unary(f, self.config_to_matrix_type(p))
-        ]
-        feasible_paths = [
-            self._create_path_expr(self._cfg["collection"], x["path"])
-            for x in feasible_objs
-        ]
-        return feasible_paths
+        return [x.expr for x in paths_pool if self._is_feasible_unary(f, x.type)]
 
     def _find_feasible_paths_for_binary_fct(self, f, paths_pool):
-        product = [x for x in itertools.product(paths_pool, paths_pool)]
-        feasible_objs = [
-            [x, y]
-            for (x, y) in product
-            if self._is_feasible_binary(
-                f, self.config_to_matrix_type(x), self.config_to_matrix_type(y)
-            )
-        ]
-        feasible_paths_lhs = [
-            self._create_path_expr(self._cfg["collection"], x["path"])
-            for (x, y) in feasible_objs
+        """
+        Returns the lhs and rhs path expressions of all feasible (lhs, rhs) pairs
+        of paths_pool, in the order of itertools.product(paths_pool, paths_pool).
+        The feasible rhs paths only depend on the type of lhs, so they are
+        collected once per type instead of testing every pair.
+        """
+        records = list(paths_pool)
+        exprs = [x.expr for x in records]
+        types = [x.type for x in records]
+        feasible_rhs_by_type = {}
+        feasible_paths_lhs = []
+        feasible_paths_rhs = []
+        for lhs_expr, lhs_t in zip(exprs, types):
+            if lhs_t not in feasible_rhs_by_type:
+                feasible_rhs_by_type[lhs_t] = [
+                    rhs_expr
+                    for rhs_expr, rhs_t in zip(exprs, types)
+                    if self._is_feasible_binary(f, lhs_t, rhs_t)
+                ]
+            feasible_rhs = feasible_rhs_by_type[lhs_t]
+            feasible_paths_lhs.extend([lhs_expr] * len(feasible_rhs))
+            feasible_paths_rhs.extend(feasible_rhs)
+
+        return feasible_paths_lhs, feasible_paths_rhs
+
+    def _choose_viable_path_pair(self, paths_pool):
+        """
+        Draws an ordered (lhs, rhs) pair uniformly from the pairs of paths_pool
+        that have at least one feasible binary function, or returns None if there
+        is none. A type pair is drawn weighted by its number of path pairs, then
+        one path of each type.
+        """
+        type_pairs = [
+            (lhs_t, rhs_t)
+            for (lhs_t, rhs_t) in self._viable_type_pairs
+            if paths_pool.size(lhs_t) > 0 and paths_pool.size(rhs_t) > 0
         ]
-        feasible_paths_rhs = [
-            self._create_path_expr(self._cfg["collection"], y["path"])
-            for (x, y) in feasible_objs
+        if len(type_pairs) == 0:
+            return None
+        weights = [
+            paths_pool.size(lhs_t) * paths_pool.size(rhs_t)
+            for (lhs_t, rhs_t) in type_pairs
         ]
+        lhs_t, rhs_t = self._rng.choices(type_pairs, weights)[0]
+        return (
+            paths_pool.choice(self._rng, lhs_t),
+            paths_pool.choice(self._rng, rhs_t),
+        )
 
-        return feasible_paths_lhs, feasible_paths_rhs
+    def _build_feasibility_index(self):
+        """
+        Precomputes the feasible functions of every type and type pair of the
+        feasibility matrix and the type pairs with any feasible binary function
+        """
+        types = set(self._feasibility_matrix[UNARY_FUNCTIONS[0].lower()].keys())
+        # Paths of mixed value types have composite types, eg "number|string"
+        types = sorted(
+            types.union(
+                self.config_to_matrix_type(x)
+                for x in self._cfg["projection_pool"] + self._cfg["where_clause_pool"]
+            )
+        )
+        self._feasible_unary = {
+            t: [f for f in UNARY_FUNCTIONS if self._is_feasible_unary(f, t)]
+            for t in types
+        }
+        self._feasible_infix = {}
+        self._feasible_prefix = {}
+        for lhs_t, rhs_t in itertools.product(types, types):
+            self._feasible_infix[(lhs_t, rhs_t)] = [
+                f
+                for f in BINARY_FUNCTIONS_INFIX
+                if self._is_feasible_binary(f, lhs_t, rhs_t)
+            ]
+            self._feasible_prefix[(lhs_t, rhs_t)] = [
+                f
+                for f in BINARY_FUNCTIONS_PREFIX
+                if self._is_feasible_binary(f, lhs_t, rhs_t)
+            ]
+        self._viable_type_pairs = [
+            pair
+            for pair in self._feasible_infix
+            if len(self._feasible_infix[pair]) > 0
+            or len(self._feasible_prefix[pair]) > 0
+        ]
 
     def _find_feasible_unary_functions(self, t):
-        return [f for f in UNARY_FUNCTIONS if self._is_feasible_unary(f, t)]
+        return list(self._feasible_unary[t])
 
     def _find_feasible_binary_infix_functions(self, lhs_t, rhs_t):
-        return [
-            f
-            for f in BINARY_FUNCTIONS_INFIX
-            if self._is_feasible_binary(f, lhs_t, rhs_t)
-        ]
+        return list(self._feasible_infix[(lhs_t, rhs_t)])
 
     def _find_feasible_binary_prefix_functions(self, lhs_t, rhs_t):
-        return [
-            f
-            for f in BINARY_FUNCTIONS_PREFIX
-            if self._is_feasible_binary(f, lhs_t, rhs_t)
-        ]
+        return list(self._feasible_prefix[(lhs_t, rhs_t)])
 
     def _is_feasible_unary(self, unary_fct, t):
-        return self._feasibility_matrix[unary_fct.lower()][t] == "SUCCESS"
+        """
+        A function is feasible for a composite type like "number|string" if it is
+        feasible for each of its types
+        """
+        return all(
+            self._feasibility_matrix[unary_fct.lower()][x] == "SUCCESS"
+            for x in t.split("|")
+        )
 
     def _is_feasible_binary(self, binary_fct, lhs_t, rhs_t):
-        return self._feasibility_matrix[binary_fct.lower()][lhs_t][rhs_t] == "SUCCESS"
+        return all(
+            self._feasibility_matrix[binary_fct.lower()][x][y] == "SUCCESS"
+            for x in lhs_t.split("|")
+            for y in rhs_t.split("|")
+        )
 
     def _is_unary_fct(self, name):
         return name.upper() in UNARY_FUNCTIONS
@@ -796,16 +1289,40 @@ class SchemaBasedGenerator:
 
     def _get_forced_path_obj(self, path_list, pool):
         """
-        Finds the object from the schema config describing a forced path by the list of it's path names
+        Finds the record of a forced path in the pool by the list of it's path names
         """
-        for x in pool:
-            if x["path"] == path_list:
-                return x
-        raise RuntimeError(
-            "Path list {} specified as forced path in config is not in schema config {}".format(
-                path_list, pool
+        record = pool.find(path_list)
+        if record is None:
+            raise RuntimeError(
+                "Path list {} specified as forced path in config is not in schema config".format(
+                    path_list
+                )
             )
-        )
+        return record
+
+    def _create_path_records(self, paths):
+        """
+        Creates the catalog records of the schema config path info objects
+        """
+        records = []
+        for i, path_info in enumerate(paths):
+            path_type = self.config_to_matrix_type(path_info)
+            records.append(
+                PathRecord(
+                    i,
+                    path_info["path"],
+                    path_type,
+                    self._create_path_expr(self._cfg["collection"], path_info["path"]),
+                    self._get_array_nesting_depth(path_info)
+                    if path_type == "array"
+                    else 0,
+                    path_info.get("operator"),
+                    path_info.get("value"),
+                    path_info.get("num"),
+                    self._sampled_values.get(tuple(path_info["path"])),
+                )
+            )
+        return records
 
     def _create_path_expr(self, collection, path):
         """
@@ -829,8 +1346,7 @@ class SchemaBasedGenerator:
         assert self.config_to_matrix_type(path_info) == "array"
         depth = 0
         for p in path_info["path"]:
-            if "[" in p:
-                depth += 1
+            depth += p.count("[")
 
         return depth
 
@@ -843,20 +1359,17 @@ class SchemaBasedGenerator:
             if "[" in p:
                 return "array"
 
-        s = path_info["valueType"]
-        if "random_number" in s:
-            return "number"
-        # elif 'word' in s or 'name' in s:
-        else:
-            return "string"
-            # raise RuntimeError('Unknown value type: {}'.format(s))
+        # Paths whose values have several types, eg mixed(random_number:0.7,
+        # word:0.3), get the composite type "number|string"
+        return "|".join(matrix_types(path_info["valueType"]))
 
     def schema_cfg_op_to_str(self, op):
         """
         Converts the name of the operators used in the schema config to the actual symbol
         """
-        if op == "eq":
-            return "="
+        symbols = {"eq": "=", "ne": "<>", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+        if op in symbols:
+            return symbols[op]
         else:
             raise RuntimeError("Unknown operator {}".format(op))
 
@@ -882,7 +1395,7 @@ class SchemaBasedGenerator:
         )
         if max < min:
             min = 1
-        return random.randint(min, max)
+        return self._rng.randint(min, max)
 
     def insert_config_default_values(self):
         if "random" in self._cfg["projection"]:
@@ -902,10 +1415,20 @@ class SchemaBasedGenerator:
                 cfg_where["probability"] = 1
             if "random" not in cfg_where:
                 cfg_where["random"] = {"number_total": [0, 0]}
+            if "in_list_size" not in cfg_where:
+                cfg_where["in_list_size"] = [1, 1]
+            if "selectivities" not in cfg_where:
+                cfg_where["selectivities"] = []
 
         if "limit" not in self._cfg:
             self._cfg["limit"] = None
 
+        if "path_pool" not in self._cfg:
+            self._cfg["path_pool"] = "schema"
+
+        if self._cfg.get("seed") is None:
+            self._cfg["seed"] = random.SystemRandom().randrange(2**32)
+
     def validate_config(self):
         assert type(self._cfg["collection"]) is str
         assert (
@@ -919,6 +1442,13 @@ class SchemaBasedGenerator:
             type(self._cfg["combinations_per_query"]) is str
             and self._cfg["combinations_per_query"] == "all"
         )
+        assert (
+            type(self._cfg["seed"]) is int and self._cfg["seed"] >= 0
+        ), '"seed" must be a non negative integer'
+        assert self._cfg["path_pool"] in [
+            "schema",
+            "forced",
+        ], '"path_pool" must be "schema" or "forced"'
         assert self._has_forced_with_at_least_one_item_or_random(
             self._cfg["projection"]
         )
@@ -970,6 +1500,23 @@ class SchemaBasedGenerator:
                 assert self._is_a_range(
                     self._cfg["where_clause"]["random"]["number_total"]
                 )
+            assert (
+                self._is_a_range(self._cfg["where_clause"]["in_list_size"])
+                and self._cfg["where_clause"]["in_list_size"][0] >= 1
+            ), '"where_clause"."in_list_size" must be a range of positive integers'
+            selectivities = self._cfg["where_clause"]["selectivities"]
+            assert type(selectivities) is list and all(
+                [type(x) in [int, float] and 0 < x <= 1 for x in selectivities]
+            ), '"where_clause"."selectivities" must be a list of numbers in (0, 1]'
+            if len(selectivities) > 0:
+                assert (
+                    len(self._cfg["selectivity_pool"]) > 0
+                ), 'Selectivities need a forced path of value type "{}"'.format(
+                    UNIQUE_VALUE_TYPE
+                )
+                assert (
+                    type(self._num_documents) is int and self._num_documents > 0
+                ), 'Selectivities need "numSamples" in the schema config'
 
     def _is_probability(self, x):
         return x >= 0 and x <= 1
@@ -1008,8 +1555,7 @@ class SchemaBasedGenerator:
                 while s[i] != close:
                     i += 1
                 i += 1
-                if not i < len(s):
-                    break
+                continue
             ret += s[i]
             i += 1
         return ret
@@ -1023,19 +1569,58 @@ class SchemaBasedGenerator:
         return new_matrix
 
 
+class ProgressReporter:
+    """
+    Counts generated queries and prints the count and rate every `every` queries
+    """
+
+    def __init__(self, every=100000):
+        self._every = every
+        self._start = time.perf_counter()
+        self.count = 0
+
+    def update(self, n=1):
+        before = self.count
+        self.count += n
+        if self.count // self._every > before // self._every:
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self._start
+        print(
+            "### generated {} queries ({:.0f} queries/s)".format(
+                self.count, self.count / elapsed if elapsed > 0 else 0.0
+            )
+        )
+
+
 class StandaloneGenerator:
     """
     Takes a standalone config, instantiates the template and outputs the queries
     """
 
     def __init__(
-        self, config, output_dir, query_base_name, do_print=True, do_print_only=False
+        self,
+        config,
+        output_dir,
+        query_base_name,
+        do_print=True,
+        do_print_only=False,
+        progress=None,
+        writer=None,
+        seed=None,
     ):
         """
         Args:
             config: Standalone config
             output_dir: Abs path where to create the queries
             query_base_name: Base name for the generated queries, eg 'query' -> 'query_0.sql', 'query_1.sql', ...
+            do_print: Print the generated queries to the console
+            do_print_only: Print the generated queries without writing them
+            progress: ProgressReporter counting the generated queries
+            writer: Query writer (see query_writer), defaults to one file per query
+            seed: Seed of the random combinations, overrides "seed" of the config.
+                Random if neither is given.
         """
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -1047,47 +1632,49 @@ class StandaloneGenerator:
         self._output_dir = output_dir
         self._query_base_name = query_base_name
         self._do_print = do_print or do_print_only
-        self._do_print = False
         self._do_output = not do_print_only
+        self._progress = progress
+        self._writer = writer if writer is not None else FileQueryWriter(output_dir)
+        self._rng = random.Random(seed if seed is not None else config.get("seed"))
+        self._annotation = config.get("annotation")
 
     def _instantiate_and_output_queries(
         self, template, substitute_data, file_name_base
     ):
+        """
+        Args:
+            template: CompiledTemplate
+            substitute_data: Iterable of value tuples, one value per template slot
+            file_name_base: Base name of the output files, identifies the template
+        """
+        placeholders = template.unique_slots()
         for i, data in enumerate(substitute_data):
-            output_file_name = file_name_base + "{}.sql".format(i)
-            output_file_path = os.path.join(self._output_dir, output_file_name)
-            jinja = JinjaSql()
-            query, bind_params = jinja.prepare_query(template, data)
-            query = query % tuple(bind_params)
+            query = template.render(data)
             if self._do_print:
-                print("{} :\n{}\n\n".format(output_file_name, query))
+                print("{}{} :\n{}\n\n".format(file_name_base, i, query))
             if self._do_output:
-                with open(output_file_path, "w", encoding="utf8") as output_file:
-                    output_file.write(query)
-                    output_file.flush()
+                self._writer.write(
+                    file_name_base, i, query, placeholders, data, self._annotation
+                )
+            if self._progress is not None:
+                self._progress.update()
 
     def run(self):
-        (
-            self._template,
-            placeholders,
-            placeholders_original,
-        ) = self._make_placeholders_unique(self._template, self._placeholder_dict)
+        template = CompiledTemplate(self._template, self._placeholder_dict.keys())
+        placeholders_original = template.slots
 
         if self._combinations == "all":
             data = self._create_cartesian_product(
-                placeholders, placeholders_original, self._placeholder_dict
+                placeholders_original, self._placeholder_dict
             )
         else:
             data = self._create_n_random_combinations(
-                placeholders,
                 placeholders_original,
                 self._placeholder_dict,
                 int(self._combinations),
             )
 
-        self._instantiate_and_output_queries(
-            self._template, data, self._query_base_name
-        )
+        self._instantiate_and_output_queries(template, data, self._query_base_name)
 
     def _load_config(self, config):
         if "template" not in config:
@@ -1099,83 +1686,112 @@ class StandaloneGenerator:
             placeholder_dict.update(config["placeholders"])
         return config["template"], placeholder_dict, config["combinations"]
 
-    def _create_cartesian_product(
-        self, placeholders, placeholders_original, placeholder_dict
-    ):
+    def _create_cartesian_product(self, placeholders_original, placeholder_dict):
         """
-        Creates all possible combinations for a given template
+        Lazily creates all possible combinations for a given template. Each
+        combination is a tuple with one value per placeholder occurrence.
         """
         lists = [placeholder_dict[x] for x in placeholders_original]
-        cartesian_product = [x for x in itertools.product(*lists)]
-        return [
-            {p: v for (p, v) in zip(placeholders, combination)}
-            for combination in cartesian_product
-        ]
+        return itertools.product(*lists)
 
-    def _create_n_random_combinations(
-        self, placeholders, placeholders_original, placeholder_dict, N
-    ):
+    def _create_n_random_combinations(self, placeholders_original, placeholder_dict, N):
         """
         Create N random combinations for a given template
+
+        The combinations are drawn as distinct indices into the cartesian product.
+        Only the drawn indices are decoded, so the product itself is never built.
         """
-        all_combinations = self._create_cartesian_product(
-            placeholders, placeholders_original, placeholder_dict
-        )
-        return (
-            random.sample(all_combinations, N)
-            if N < len(all_combinations)
-            else all_combinations
-        )
+        lists = [placeholder_dict[x] for x in placeholders_original]
+        product_size = 1
+        for values in lists:
+            product_size *= len(values)
 
-    def _make_placeholders_unique(self, template, placeholder_dict):
+        if N >= product_size:
+            return self._create_cartesian_product(
+                placeholders_original, placeholder_dict
+            )
+
+        if product_size <= sys.maxsize:
+            indices = self._rng.sample(range(product_size), N)
+        else:
+            # range() is too large for random.sample, collisions are negligible
+            indices = []
+            drawn = set()
+            while len(indices) < N:
+                index = self._rng.randrange(product_size)
+                if index not in drawn:
+                    drawn.add(index)
+                    indices.append(index)
+
+        return [self._decode_combination(index, lists) for index in indices]
+
+    def _decode_combination(self, index, lists):
         """
-        Make the used placeholders distinct so each can be substituted on it's own
-        Args:
-            template: The query template
-        Returns:
-            A tuple containing: template, placeholders, placeholders_original
-
-        Given a template: SELECT {{AGGREGATE_FCT}}(x1), {{AGGREGATE_FCT}}(x2) FROM y
-        Creates a template: SELECT {{AGGREGATE_FCT_0}}(x1), {{AGGREGATE_FCT_1}}(x2) FROM y
-        Otherwise jinja will replace both placeholders with the same value, not allowing distinct combinations
-
-        Returns a modified template string, a list containing updated placeholder names, a list containing the original placeholder names, eg
-        SELECT {{AGGREGATE_FCT_0}}(x1),
-        {{AGGREGATE_FCT_1}}(x2) FROM y, ['AGGREGATE_FCT_0', 'AGGREGATE_FCT_1'],
-        ['AGGREGATE_FCT', 'AGGREGATE_FCT']
-        """
-
-        def nth_repl(s, sub, repl, n):
-            """
-            https://stackoverflow.com/questions/35091557/replace-nth-occurrence-of-substring-in-string
-            """
-            find = s.find(sub)
-            # If find is not -1 we have found at least one match for the substring
-            i = find != -1
-            # loop util we find the nth or we find no match
-            while find != -1 and i != n:
-                # find + 1 means we start searching from after the last match
-                find = s.find(sub, find + 1)
-                i += 1
-            # If i is equal to n we found nth match so replace
-            if i == n:
-                return s[:find] + repl + s[find + len(sub) :]
-            return s
-
-        original_placeholders = re.findall(
-            r"""(?<={{)(""" + "|".join(placeholder_dict.keys()) + r""")(?=}})""",
-            template,
-        )
-        placeholder_counts = {p: 0 for p in list(set(original_placeholders))}
-        new_placeholders = []
+        Decodes an index into the cartesian product of lists (in itertools.product
+        order) as a mixed radix number, the last list being the lowest digit
+        """
+        combination = [None] * len(lists)
+        for i in range(len(lists) - 1, -1, -1):
+            index, digit = divmod(index, len(lists[i]))
+            combination[i] = lists[i][digit]
+        return tuple(combination)
 
-        for p in original_placeholders:
-            repl = p + "_{}".format(placeholder_counts[p])
-            template = nth_repl(template, p, repl, placeholder_counts[p] + 1)
-            new_placeholders.append(repl)
-            placeholder_counts[p] += 1
 
-        return template, new_placeholders, original_placeholders
+class CompiledTemplate:
+    """
+    A query template tokenized once into literal segments and placeholder slots.
+
+    Given a template: SELECT {{AGGREGATE_FCT}}(x1), {{AGGREGATE_FCT}}(x2) FROM y
+    the slots are ['AGGREGATE_FCT', 'AGGREGATE_FCT']. Every occurrence of a
+    placeholder is a slot of its own, so each can be substituted on it's own.
+    Rendering a query is a single string formatting of the literal segments with one
+    value per slot.
+    """
+
+    __slots__ = ("slots", "_format")
+
+    def __init__(self, template, placeholder_names):
+        """
+        Args:
+            template: Template string, placeholders are written as {{NAME}}
+            placeholder_names: Names of the known placeholders. Other text in double
+                braces is kept as is
+        """
+        names = sorted(placeholder_names, key=len, reverse=True)
+        pattern = re.compile(
+            r"{{(" + "|".join(re.escape(n) for n in names) + r")}}"
+            if len(names) > 0
+            else r"(?!)"
+        )
+        segments = []
+        self.slots = []
+        position = 0
+        for match in pattern.finditer(template):
+            segments.append(template[position : match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        segments.append(template[position:])
+        self._format = "%s".join(segment.replace("%", "%%") for segment in segments)
+
+    def unique_slots(self):
+        """
+        Returns a distinct name per slot, eg ['AGGREGATE_FCT_0', 'AGGREGATE_FCT_1']
+        """
+        counts = {}
+        names = []
+        for slot in self.slots:
+            names.append("{}_{}".format(slot, counts.get(slot, 0)))
+            counts[slot] = counts.get(slot, 0) + 1
+        return names
+
+    def render(self, values):
+        """
+        Args:
+            values: Tuple with one value per slot
+        Returns:
+            The instantiated query
+        """
+        return self._format % tuple(values)
 
 
 if __name__ == "__main__":
@@ -1195,11 +1811,38 @@ if __name__ == "__main__":
         help='Path to the schema config file. Only in mode "schema"',
         default=None,
     )
+    parser.add_argument(
+        "--schema",
+        help='Path to the schema.txt written by the data generator. Its paths are used for the queries in mode "schema", else only the forced paths of the schema config',
+        default=None,
+    )
+    parser.add_argument(
+        "--values",
+        help='Path to the values.json with the values sampled by the data generator. Used for where clause predicates in mode "schema". The annotations carry estimated counts of these values unless --data is given',
+        default=None,
+    )
+    parser.add_argument(
+        "--data",
+        help="Path to the generated data the values were sampled from. The sampled values are counted exactly in one pass over it",
+        default=None,
+    )
     parser.add_argument(
         "--query-base-name",
         help='Base name of the generated queries. Defaults to "query"',
         default="query",
     )
+    parser.add_argument(
+        "--output-format",
+        help='"files": one .sql file per query, "sql": all queries in one .sql file, "jsonl": all queries in one .jsonl file with query id, template id and parameters. Defaults to "files"',
+        choices=QUERY_OUTPUT_FORMATS,
+        default="files",
+    )
+    parser.add_argument(
+        "--seed",
+        help='Seed of the query generation, overrides "seed" of the config. Runs with the same seed and configs produce the same queries. Defaults to a random seed',
+        type=int,
+        default=None,
+    )
     parser.add_argument(
         "--print", help="Print generated queries to console", action="store_true"
     )
@@ -1217,6 +1860,12 @@ if __name__ == "__main__":
     if args.schema_config is not None:
         args.schema_config = os.path.abspath(args.schema_config)
 
+    writer = None
+    if not args.print_only:
+        writer = create_query_writer(
+            args.output_format, os.path.abspath(args.output), args.query_base_name
+        )
+
     if args.mode == "standalone":
         with open(os.path.abspath(args.config), encoding="utf8") as cfg_file:
             sa_cfg = json.load(cfg_file)
@@ -1226,6 +1875,8 @@ if __name__ == "__main__":
                 args.query_base_name,
                 args.print,
                 args.print_only,
+                writer=writer,
+                seed=args.seed,
             )
             g.run()
     else:
@@ -1235,14 +1886,35 @@ if __name__ == "__main__":
             ) as schema_cfg_file:
                 cfg = json.load(cfg_file)
                 schema_cfg = json.load(schema_cfg_file)
-                x = SchemaBasedGenerator(cfg, schema_cfg)
-                sa_cfgs = x.run()
-                for i, c in enumerate(sa_cfgs):
-                    g = StandaloneGenerator(
-                        c,
-                        os.path.abspath(args.output),
-                        "{}_{}".format(args.query_base_name, i),
-                        args.print,
-                        args.print_only,
-                    )
-                    g.run()
+                if args.seed is not None:
+                    cfg["seed"] = args.seed
+                schema = None
+                if args.schema is not None:
+                    schema = load_schema(os.path.abspath(args.schema))
+                sampled_values = None
+                if args.values is not None:
+                    sampled_values = ValueSample.read(
+                        os.path.abspath(args.values)
+                    ).value_counts()
+                    if args.data is not None:
+                        sampled_values = count_values(
+                            os.path.abspath(args.data), sampled_values
+                        )
+                x = SchemaBasedGenerator(
+                    cfg, schema_cfg, schema, sampled_values, args.data is not None
+                )
+                print("Query seed: {}".format(x.seed))
+                progress = ProgressReporter()
+                generate_schema_based_queries(
+                    x,
+                    os.path.abspath(args.output),
+                    args.query_base_name,
+                    writer,
+                    progress=progress,
+                    do_print=args.print,
+                    do_print_only=args.print_only,
+                )
+                progress.report()
+
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,164 @@
+"""
+Output formats of the generated queries
+"""
+import json
+import os
+import shutil
+
+from json_data_and_query_generator.offset_index import (
+    INDEX_SUFFIX,
+    OffsetIndexWriter,
+    read_offsets,
+)
+
+QUERY_OUTPUT_FORMATS = ["files", "sql", "jsonl"]
+
+# File extension of the batched formats
+QUERY_FILE_EXTENSIONS = {"sql": ".sql", "jsonl": ".jsonl"}
+
+
+class FileQueryWriter:
+    """
+    Writes each query into a file of its own, eg 'query_0' -> 'query_00.sql', 'query_01.sql', ...
+    """
+
+    def __init__(self, output_dir):
+        self._output_dir = output_dir
+
+    def write(self, template_id, index, query, placeholders, values, annotation=None):
+        output_file_path = os.path.join(
+            self._output_dir, template_id + "{}.sql".format(index)
+        )
+        with open(output_file_path, "w", encoding="utf8") as output_file:
+            output_file.write(query)
+
+    def close(self):
+        pass
+
+
+class BatchQueryWriter:
+    """
+    Writes all queries of a run into a single file and the offset of each query into
+    an index file next to it (see offset_index), so queries can be read by number
+    without scanning the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._index = OffsetIndexWriter(path + INDEX_SUFFIX)
+        self._offset = 0
+
+    def write(self, template_id, index, query, placeholders, values, annotation=None):
+        """
+        Args:
+            annotation: Expected result of the query, eg the number of matching
+                documents (see SchemaBasedGenerator), or None
+        """
+        record = self._format(
+            "{}_{}".format(template_id, index),
+            template_id,
+            query,
+            placeholders,
+            values,
+            annotation,
+        ).encode("utf8")
+        self._index.add(self._offset)
+        self._file.write(record)
+        self._offset += len(record)
+
+    def close(self):
+        self._file.close()
+        self._index.close(self._offset)
+
+    def _format(self, query_id, template_id, query, placeholders, values, annotation):
+        raise NotImplementedError
+
+
+class SqlQueryWriter(BatchQueryWriter):
+    """
+    One query per statement, each terminated by ';' and a line break
+    """
+
+    def _format(self, query_id, template_id, query, placeholders, values, annotation):
+        query = query.rstrip()
+        if not query.endswith(";"):
+            query += ";"
+        return query + "\n"
+
+
+class JsonlQueryWriter(BatchQueryWriter):
+    """
+    One JSON object per line with query id, template id, query, parameters and
+    the annotation of the query if it has one
+    """
+
+    def _format(self, query_id, template_id, query, placeholders, values, annotation):
+        record = {
+            "query_id": query_id,
+            "template_id": template_id,
+            "query": query,
+            "params": dict(zip(placeholders, values)),
+        }
+        if annotation is not None:
+            record["annotation"] = annotation
+        return json.dumps(record) + "\n"
+
+
+def create_query_writer(output_format, output_dir, query_base_name):
+    """
+    Args:
+        output_format: One of QUERY_OUTPUT_FORMATS
+        output_dir: Directory of the output
+        query_base_name: Name of the output file for the batched formats, eg
+            'query' -> 'query.sql' and 'query.sql.idx'
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print('Created output directory "{}"'.format(output_dir))
+    if output_format == "files":
+        return FileQueryWriter(output_dir)
+    if output_format == "sql":
+        return SqlQueryWriter(
+            os.path.join(output_dir, query_base_name + QUERY_FILE_EXTENSIONS["sql"])
+        )
+    if output_format == "jsonl":
+        return JsonlQueryWriter(
+            os.path.join(output_dir, query_base_name + QUERY_FILE_EXTENSIONS["jsonl"])
+        )
+    raise ValueError("Unknown query output format {}".format(output_format))
+
+
+def shard_name(query_base_name, shard):
+    """
+    Base name of the output of one query generator process
+    """
+    return "{}.part{}".format(query_base_name, shard)
+
+
+def merge_query_shards(output_format, output_dir, query_base_name, num_shards):
+    """
+    Concatenates the batched outputs written by the query generator processes (see
+    shard_name) in shard order and merges their offset indexes. Queries written as
+    files need no merging.
+    """
+    if output_format == "files":
+        return
+    extension = QUERY_FILE_EXTENSIONS[output_format]
+    path = os.path.join(output_dir, query_base_name + extension)
+    index = OffsetIndexWriter(path + INDEX_SUFFIX)
+    offset = 0
+    with open(path, "wb") as output_file:
+        for shard in range(num_shards):
+            shard_path = os.path.join(
+                output_dir, shard_name(query_base_name, shard) + extension
+            )
+            shard_offsets = read_offsets(shard_path + INDEX_SUFFIX)
+            index.extend_array(shard_offsets[:-1], offset)
+            with open(shard_path, "rb") as shard_file:
+                shutil.copyfileobj(shard_file, output_file)
+            offset += int(shard_offsets[-1])
+            del shard_offsets
+            os.remove(shard_path)
+            os.remove(shard_path + INDEX_SUFFIX)
+    index.close(offset)
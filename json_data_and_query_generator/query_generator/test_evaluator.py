@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+from json_data_and_query_generator.query_generator.evaluator import (
+    Query,
+    QuerySyntaxError,
+    evaluate_queries,
+    read_queries,
+)
+from json_data_and_query_generator.query_generator.query_writer import (
+    SqlQueryWriter,
+)
+
+DOCUMENTS = [
+    {"a": 1, "b": "x", "c": {"d": 2.5}},
+    {"a": 2, "b": "y", "c": {"d": -1}},
+    {"a": 3, "b": "x", "c": {}},
+    {"a": None, "b": "it's", "c": {"d": 4}},
+]
+
+MULTI_LINE_QUERY = (
+    """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."t"='first\nsecond';"""
+)
+SINGLE_LINE_QUERY = """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."a"=2;"""
+
+
+def write_documents(tmp_path, documents):
+    data_path = str(tmp_path / "mycol.json")
+    with open(data_path, "w") as data_file:
+        for document in documents:
+            data_file.write(json.dumps(document) + "\n")
+    return data_path
+
+
+def evaluate(tmp_path, queries, documents=DOCUMENTS, **kwargs):
+    data_path = write_documents(tmp_path, documents)
+    return evaluate_queries(
+        data_path, [(str(i), q) for i, q in enumerate(queries)], **kwargs
+    )
+
+
+def test_parse_query():
+    query = Query(
+        """SELECT "mycol"."a", TAN("mycol"."c"."d") FROM "mycol" WHERE "mycol"."b"='x' AND "mycol"."a">1 LIMIT 5;"""
+    )
+
+    assert len(query.projections) == 2
+    assert query.limit == 5
+    assert not query.aggregate
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "SELECT FROM",
+        """SELECT "mycol"."a" FROM "mycol" LIMIT -1;""",
+        """SELECT "mycol"."a" FROM "mycol" "mycol";""",
+        """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."a" ~ 1;""",
+    ],
+)
+def test_syntax_errors(text):
+    with pytest.raises(QuerySyntaxError):
+        Query(text)
+
+
+def test_matches_and_rows(tmp_path):
+    results = evaluate(
+        tmp_path,
+        [
+            """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."b"='x';""",
+            """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."b"='x' LIMIT 1;""",
+            """SELECT "mycol"."a" FROM "mycol" WHERE "mycol"."c"."d">0 OR "mycol"."a"=2;""",
+            """SELECT "mycol"."b" FROM "mycol" WHERE "mycol"."b"='it''s';""",
+            """SELECT "mycol"."b" FROM "mycol";""",
+        ],
+    )
+
+    assert [(r["matches"], r["rows"]) for r in results] == [
+        (2, 2),
+        (2, 1),
+        (3, 3),
+        (1, 1),
+        (4, 4),
+    ]
+    # A result cut by LIMIT has no defined rows
+    assert results[1]["checksum"] is None
+
+
+def test_checksum_is_independent_of_order_and_num_proc(tmp_path):
+    queries = ["""SELECT "mycol"."a", "mycol"."b" FROM "mycol";"""]
+    expected = evaluate(tmp_path, queries)
+
+    assert evaluate(tmp_path, queries, documents=DOCUMENTS[::-1]) == expected
+    assert evaluate(tmp_path, queries, num_proc=2, batch_size=1) == expected
+    assert evaluate(tmp_path, ["""SELECT "mycol"."b" FROM "mycol";"""]) != expected
+
+
+def test_aggregates(tmp_path):
+    results = evaluate(
+        tmp_path,
+        [
+            """SELECT COUNT("mycol"."a"), SUM("mycol"."a"), MIN("mycol"."a"), MAX("mycol"."a"), AVG("mycol"."a") FROM "mycol";"""
+        ],
+        num_proc=2,
+        batch_size=1,
+    )
+
+    assert results[0]["matches"] == 4
+    assert results[0]["rows"] == 1
+    assert results[0]["values"] == [3, 6.0, 1.0, 3.0, 2.0]
+
+
+def test_plain_projections_of_aggregate_query_take_the_first_match(tmp_path):
+    query = """SELECT COUNT("mycol"."a"), "mycol"."b", "mycol"."c"."d" FROM "mycol" WHERE "mycol"."a">1;"""
+    no_match = (
+        """SELECT MAX("mycol"."a"), "mycol"."b" FROM "mycol" WHERE "mycol"."a">5;"""
+    )
+
+    for num_proc, batch_size in [(1, 10), (2, 1)]:
+        results = evaluate(
+            tmp_path, [query, no_match], num_proc=num_proc, batch_size=batch_size
+        )
+
+        assert results[0]["matches"] == 2
+        assert results[0]["rows"] == 1
+        assert results[0]["values"] == [2, "y", -1.0]
+        assert results[1]["values"] == [None, None]
+
+    reversed_results = evaluate(tmp_path, [query], documents=DOCUMENTS[::-1])
+    assert reversed_results[0]["values"] == [2, "x", None]
+
+
+def test_concat_formats_integers_without_fraction(tmp_path):
+    results = evaluate(
+        tmp_path,
+        [
+            """SELECT CONCAT("mycol"."b","mycol"."a") FROM "mycol" WHERE "mycol"."a"=2;""",
+            """SELECT CONCAT("mycol"."b",'2') FROM "mycol" WHERE "mycol"."a"=2;""",
+        ],
+    )
+
+    assert results[0]["checksum"] == results[1]["checksum"]
+
+
+def test_unsupported_query_gets_an_error(tmp_path):
+    results = evaluate(tmp_path, ["""SELECT "mycol"."a" FROM "mycol" ORDER BY 1;"""])
+
+    assert "error" in results[0]
+
+
+def test_read_sql_queries_with_multi_line_literal(tmp_path):
+    path = str(tmp_path / "query.sql")
+    writer = SqlQueryWriter(path)
+    writer.write("query_0", 0, MULTI_LINE_QUERY, [], [])
+    writer.write("query_1", 0, SINGLE_LINE_QUERY, [], [])
+    writer.close()
+
+    assert read_queries(path) == [("0", MULTI_LINE_QUERY), ("1", SINGLE_LINE_QUERY)]
+
+
+def test_evaluate_multi_line_literal(tmp_path):
+    data_path = str(tmp_path / "mycol.json")
+    with open(data_path, "w") as data_file:
+        for document in [
+            {"a": 1, "t": "first\nsecond"},
+            {"a": 2, "t": "first"},
+            {"a": 3, "t": "first\nsecond"},
+        ]:
+            data_file.write(json.dumps(document) + "\n")
+    path = str(tmp_path / "query.sql")
+    writer = SqlQueryWriter(path)
+    writer.write("query_0", 0, MULTI_LINE_QUERY, [], [])
+    writer.write("query_1", 0, SINGLE_LINE_QUERY, [], [])
+    writer.close()
+
+    results = evaluate_queries(data_path, read_queries(path))
+
+    assert [(r["query_id"], r["matches"]) for r in results] == [("0", 2), ("1", 1)]
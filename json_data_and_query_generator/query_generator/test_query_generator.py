@@ -0,0 +1,87 @@
+from collections import Counter
+
+from json_data_and_query_generator.query_generator.query_generator import (
+    BINARY_FUNCTIONS_INFIX,
+    BINARY_FUNCTIONS_PREFIX,
+    SchemaBasedGenerator,
+    generate_schema_based_queries,
+)
+
+NUM_TEMPLATES = 40
+COMBINATIONS = 2
+
+SCHEMA_CONFIG = {
+    "numSamples": 10,
+    "forcedPaths": [
+        {"path": ["a"], "valueType": "word"},
+        {"path": ["b"], "valueType": "word"},
+        {"path": ["c", "d"], "valueType": "word"},
+        {"path": ["c", "e"], "valueType": "word"},
+        {"path": ["n"], "valueType": "random_number(3)"},
+    ],
+}
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.queries = Counter()
+
+    def write(self, template_id, index, query, placeholders, values, annotation=None):
+        self.queries[template_id] += 1
+
+    def close(self):
+        pass
+
+
+def binary_query_config(seed):
+    return {
+        "collection": "mycol",
+        "number_of_different_queries": NUM_TEMPLATES,
+        "combinations_per_query": COMBINATIONS,
+        "seed": seed,
+        "projection": {
+            "forced": [],
+            "random": {"number_total": [2, 2], "number_binary_fct": [1, 1]},
+        },
+        "where_clause": {"probability": 0},
+    }
+
+
+def requested_combinations(config):
+    """
+    Number of queries a standalone config asks for: its combinations, at most
+    all the combinations of its placeholders
+    """
+    product_size = 1
+    for values in config["placeholders"].values():
+        product_size *= len(values)
+    return min(config["combinations"], product_size)
+
+
+def test_every_binary_template_yields_its_combinations(tmp_path):
+    for seed in range(3):
+        generator = SchemaBasedGenerator(binary_query_config(seed), SCHEMA_CONFIG)
+        expected = {
+            "query_{}".format(i): requested_combinations(c)
+            for i, c in enumerate(generator.run())
+        }
+        writer = RecordingWriter()
+        generate_schema_based_queries(generator, str(tmp_path), "query", writer)
+        assert dict(writer.queries) == expected
+        assert all(n > 0 for n in expected.values())
+
+
+def test_binary_functions_are_rendered_by_their_notation():
+    generator = SchemaBasedGenerator(binary_query_config(0), SCHEMA_CONFIG)
+    num_prefix = 0
+    for c in generator.run():
+        for name, values in c["placeholders"].items():
+            slot = "{{" + name + "}}"
+            if set(values) <= set(BINARY_FUNCTIONS_PREFIX):
+                # eg CONCAT("mycol"."a","mycol"."b")
+                assert slot + "(" in c["template"]
+                num_prefix += 1
+            else:
+                assert set(values) <= set(BINARY_FUNCTIONS_INFIX)
+                assert slot + "(" not in c["template"]
+    assert num_prefix > 0
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from json_data_and_query_generator.offset_index import (
+    IndexedRecordReader,
+    OffsetIndexWriter,
+    build_index,
+    concat_indexes,
+    iter_line_offsets,
+    line_offsets,
+    read_offsets,
+)
+
+LINES = [b'{"a": 1}\n', b"\n", b'{"b": "x\\ny"}\n', b'{"c": [1, 2, 3]}\n']
+
+
+def write_lines(path, lines):
+    with open(path, "wb") as f:
+        f.write(b"".join(lines))
+
+
+def test_writer_round_trip(tmp_path):
+    path, index_path = str(tmp_path / "data.json"), str(tmp_path / "data.idx")
+    write_lines(path, LINES)
+    index = OffsetIndexWriter(index_path, buffer_size=2)
+    offset = 0
+    for i, line in enumerate(LINES):
+        if i % 2 == 0:
+            index.add(offset)
+        else:
+            index.extend([offset])
+        offset += len(line)
+    index.close(offset)
+
+    assert read_offsets(index_path).tolist() == [0, 9, 10, 24, 41]
+    with IndexedRecordReader(path, index_path) as reader:
+        assert len(reader) == len(LINES)
+        assert [reader[i] for i in range(len(reader))] == LINES
+        assert reader[-1] == LINES[-1]
+        with pytest.raises(IndexError):
+            reader[len(LINES)]
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 1 << 24])
+def test_line_offsets(tmp_path, block_size):
+    path = str(tmp_path / "data.json")
+    write_lines(path, LINES + [b'{"last": "no newline"}'])
+
+    assert line_offsets(path, block_size=block_size).tolist() == [0, 9, 10, 24, 41]
+    assert line_offsets(path, 24, block_size=block_size).tolist() == [0, 9, 10]
+    assert line_offsets(path, 25, block_size=block_size).tolist() == [0, 9, 10, 24]
+
+
+def test_build_and_concat_indexes(tmp_path):
+    paths = [str(tmp_path / "part{}.json".format(i)) for i in range(3)]
+    parts = [LINES[:2], [], LINES[2:]]
+    for path, lines in zip(paths, parts):
+        write_lines(path, lines)
+        build_index(path, path + ".idx")
+    write_lines(str(tmp_path / "all.json"), LINES)
+
+    concat_indexes([p + ".idx" for p in paths], str(tmp_path / "all.json.idx"))
+
+    build_index(str(tmp_path / "all.json"), str(tmp_path / "expected.idx"))
+    assert (
+        read_offsets(str(tmp_path / "all.json.idx")).tolist()
+        == read_offsets(str(tmp_path / "expected.idx")).tolist()
+    )
+    with IndexedRecordReader(str(tmp_path / "all.json")) as reader:
+        assert [reader[i] for i in range(len(reader))] == LINES
+
+
+def test_reader_rejects_an_index_of_another_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_lines(path, LINES)
+    build_index(path, path + ".idx")
+    write_lines(path, LINES[:2])
+
+    with pytest.raises(RuntimeError):
+        IndexedRecordReader(path)
+
+
+def memory_mapped(offsets, tmp_path):
+    # Memory mapped offsets like those of a shard index
+    path = str(tmp_path / "shard.idx")
+    offsets.astype("<u8").tofile(path)
+    return read_offsets(path)
+
+
+def test_extend_array_in_blocks_with_shift(tmp_path):
+    index_path = str(tmp_path / "data.idx")
+    offsets = np.arange(0, 1000, 7, dtype=np.uint64)
+    index = OffsetIndexWriter(index_path, buffer_size=3)
+    index.add(1)
+    index.extend_array(offsets, 10, block_size=16)
+    index.add(5000)
+    index.extend_array(memory_mapped(offsets, tmp_path), block_size=1000)
+    index.close(6000)
+
+    assert read_offsets(index_path).tolist() == (
+        [1] + (offsets + 10).tolist() + [5000] + offsets.tolist() + [6000]
+    )
+
+
+def test_iter_line_offsets_yields_per_block(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_lines(path, LINES)
+
+    blocks = list(iter_line_offsets(path, block_size=10))
+
+    assert len(blocks) == 6
+    assert np.concatenate(blocks).tolist() == [0, 9, 10, 24]
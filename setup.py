@@ -21,9 +21,6 @@ setup(
     package_data={'json_data_and_query_generator.examples.hello_data': ['*.json']},
     install_requires=[
       'faker',
-      'jinjasql',
       'numpy',
-      'MarkupSafe',
-      'jinja2==3.0.1',
     ]
 )